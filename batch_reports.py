@@ -0,0 +1,167 @@
+"""
+지역 × 업종(대분류, 소분류) 조합마다 맞춤 리포트(인사이트 JSON + 차트)를 미리 만들어 저장하는 명령줄 도구
+
+    python batch_reports.py --out reports --workers 8
+    python batch_reports.py --regions pochun --charts png
+
+페이지 03(맞춤 리포트)과 같은 계산(report_utils)을 Streamlit 없이 프로세스 풀에서 나눠 실행한다.
+조합마다 <out>/<지역>/<이름>.json 과 <out>/<지역>/<이름>/<차트 id>.<형식>으로 저장하며,
+JSON은 차트를 모두 쓴 뒤 마지막에 쓰므로 중단된 실행을 다시 시작하면 JSON이 있는 조합은 건너뛴다.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from data_utils import REGION_MAPPING, ingest_region, region_data_version
+from dataset_utils import RegionDataset, open_dataset, save_dataset
+from report_utils import build_report_figures, compute_report, report_summary
+
+# 차트 저장 형식 (png는 kaleido 필요)
+CHART_FORMATS = ("json", "html", "png")
+
+# 작업 프로세스가 여는 지역 데이터 파일 위치
+# (실행 중인 앱이 메모리 매핑하는 REGION_DATASET_DIR의 파일을 덮어쓰지 않도록 따로 둠)
+BATCH_DATASET_DIR = os.getenv("BATCH_DATASET_DIR", os.path.join(".cache", "batch_datasets"))
+
+# 작업 프로세스마다 한 번만 여는 지역 데이터 (메모리 매핑이라 프로세스끼리 페이지를 공유)
+_datasets = {}
+
+
+def report_name(nm_1, nm_2):
+    """업종 조합의 파일 이름 (파일 시스템에서 못 쓰는 문자는 바꾸고, 겹치지 않게 해시를 붙임)"""
+    digest = hashlib.sha1(f"{nm_1}\0{nm_2}".encode("utf-8")).hexdigest()[:8]
+    safe = re.sub(r'[\\/:*?"<>|\s]+', "_", f"{nm_1}__{nm_2}")
+    return f"{safe}_{digest}"
+
+
+def _write_atomic(path, write):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _write_chart(fig, path, chart_format):
+    if chart_format == "json":
+        def write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(fig.to_json())
+    elif chart_format == "html":
+        def write(tmp_path):
+            fig.write_html(tmp_path, include_plotlyjs="cdn")
+    else:
+        def write(tmp_path):
+            fig.write_image(tmp_path, format=chart_format)
+    _write_atomic(path, write)
+
+
+def build_reports(region, pairs, out_dir, chart_format="json", dataset_dir=BATCH_DATASET_DIR):
+    """
+    작업 프로세스에서 실행: 한 지역의 업종 조합 묶음에 대해 리포트를 만들어 저장하고 만든 개수를 돌려준다.
+    """
+    if region not in _datasets:
+        _datasets[region] = open_dataset(region, dataset_dir)
+    cube = _datasets[region].cube
+
+    region_dir = os.path.join(out_dir, region)
+    written = 0
+    for nm_1, nm_2 in pairs:
+        name = report_name(nm_1, nm_2)
+        json_path = os.path.join(region_dir, f"{name}.json")
+        if os.path.exists(json_path):
+            continue
+
+        report = compute_report(cube, nm_1, nm_2)
+        if report is None:
+            summary = {"nm_1": nm_1, "nm_2": nm_2, "empty": True}
+        else:
+            chart_dir = os.path.join(region_dir, name)
+            os.makedirs(chart_dir, exist_ok=True)
+            charts = {}
+            for chart_id, fig in build_report_figures(report).items():
+                _write_chart(fig, os.path.join(chart_dir, f"{chart_id}.{chart_format}"), chart_format)
+                charts[chart_id] = f"{name}/{chart_id}.{chart_format}"
+            summary = report_summary(report)
+            summary["charts"] = charts
+        summary["region"] = region
+
+        def write_summary(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False)
+
+        _write_atomic(json_path, write_summary)
+        written += 1
+    return written
+
+
+def prepare_region(region, dataset_dir=BATCH_DATASET_DIR):
+    """지역 데이터를 읽어(Parquet 캐시가 있으면 캐시에서) 작업 프로세스가 메모리 매핑으로 열 수 있게 저장"""
+    sample, cube, failed = ingest_region(region)
+    if failed:
+        print(f"[{region}] 불러오지 못한 월: {sorted(failed)}", file=sys.stderr)
+    version = None if failed else region_data_version(region)
+    save_dataset(RegionDataset(region, sample, cube, failed, version=version), dataset_dir)
+    return cube
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def run(regions, out_dir, workers=None, chart_format="json", chunk_size=None, dataset_dir=BATCH_DATASET_DIR):
+    """모든 지역 × 업종 조합의 리포트를 만들고 (만든 개수, 실패한 작업 수)를 돌려주는 함수"""
+    workers = workers or os.cpu_count() or 1
+    written, failures = 0, 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for region in regions:
+            started = time.time()
+            cube = prepare_region(region, dataset_dir)
+            pairs = list(cube.pairs)
+            region_dir = os.path.join(out_dir, region)
+            os.makedirs(region_dir, exist_ok=True)
+            pending = [pair for pair in pairs
+                       if not os.path.exists(os.path.join(region_dir, f"{report_name(*pair)}.json"))]
+            print(f"[{region}] 업종 조합 {len(pairs)}개 중 {len(pairs) - len(pending)}개는 이미 있음")
+
+            # 작업 하나가 너무 작으면 프로세스 간 통신 비용이 커지므로 조합을 묶어서 보냄
+            size = chunk_size or max(1, len(pending) // (workers * 4))
+            futures = [executor.submit(build_reports, region, chunk, out_dir, chart_format, dataset_dir)
+                       for chunk in _chunks(pending, size)]
+            done = 0
+            for future in as_completed(futures):
+                try:
+                    count = future.result()
+                except Exception as e:
+                    failures += 1
+                    print(f"[{region}] 작업 실패: {e}", file=sys.stderr)
+                    continue
+                written += count
+                done += count
+                print(f"[{region}] {done}/{len(pending)}")
+            print(f"[{region}] 완료 ({time.time() - started:.1f}초)")
+    return written, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="지역 × 업종 조합별 맞춤 리포트 일괄 생성")
+    parser.add_argument("--regions", nargs="+", default=list(REGION_MAPPING.values()),
+                        help="지역 영문명 (기본: 전체 지역)")
+    parser.add_argument("--out", default="reports", help="결과 저장 디렉터리")
+    parser.add_argument("--workers", type=int, default=None, help="작업 프로세스 수 (기본: CPU 코어 수)")
+    parser.add_argument("--charts", choices=CHART_FORMATS, default="json", help="차트 저장 형식")
+    parser.add_argument("--chunk-size", type=int, default=None, help="작업 하나에 넣을 업종 조합 수")
+    parser.add_argument("--dataset-dir", default=BATCH_DATASET_DIR, help="작업 프로세스가 여는 지역 데이터 파일 위치")
+    args = parser.parse_args(argv)
+
+    written, failures = run(args.regions, args.out, args.workers, args.charts, args.chunk_size, args.dataset_dir)
+    print(f"리포트 {written}개 생성")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,10 @@
+"""
+성능 측정 도구 모음
+
+- synthetic: 실제 카드 데이터와 같은 스키마/카디널리티의 합성 지역 데이터 생성기
+- run: 페이지 단계별(수집, 샘플링, 필터, 집계, 차트) 시간과 최대 메모리를 재서 JSON으로 저장
+- compare: 두 실행 결과를 비교해 느려진 단계를 찾음
+- csv_parse: pandas.read_csv와 Arrow CSV 리더의 파싱 속도(행/초) 비교
+- fake_services: 오프라인 실행용 가짜 S3 버킷과 가짜 OpenAI 서버
+- loadtest: 가상 사용자 여러 명이 페이지를 돌아다니는 동시 접속 부하 테스트
+"""
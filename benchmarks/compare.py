@@ -0,0 +1,48 @@
+"""
+두 benchmarks.run 결과를 비교해 느려진 단계를 찾는 도구
+
+    python -m benchmarks.compare old.json new.json --threshold 0.2
+
+단계별 중앙값(--stat min이면 최솟값) 시간이 threshold(비율) 넘게, 그리고 min_ms 넘게 늘었으면 회귀로 보고 종료 코드 1을 돌려준다.
+"""
+import argparse
+import json
+import sys
+
+
+def load_stages(path):
+    with open(path, encoding="utf-8") as f:
+        return {stage["name"]: stage for stage in json.load(f)["stages"]}
+
+
+def compare(old, new, threshold=0.2, min_ms=1.0, stat="median"):
+    """(단계, 이전 ms, 이후 ms, 비율, 회귀 여부) 목록 (stat: 비교할 값, median 또는 min)"""
+    rows = []
+    for name in old.keys() & new.keys():
+        before, after = old[name][stat] * 1000, new[name][stat] * 1000
+        ratio = after / before if before else float("inf")
+        regressed = ratio > 1 + threshold and after - before > min_ms
+        rows.append((name, before, after, ratio, regressed))
+    return sorted(rows, key=lambda row: list(new).index(row[0]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="성능 측정 결과 비교")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.2, help="회귀로 볼 시간 증가 비율")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="회귀로 볼 최소 시간 증가 (ms)")
+    parser.add_argument("--stat", choices=("median", "min"), default="median",
+                        help="비교할 값 (잡음이 많은 환경에서는 min)")
+    args = parser.parse_args(argv)
+
+    rows = compare(load_stages(args.old), load_stages(args.new), args.threshold, args.min_ms, args.stat)
+    for name, before, after, ratio, regressed in rows:
+        print(f"{name:<40} {before:10.2f} -> {after:10.2f} ms  x{ratio:5.2f}{'  회귀' if regressed else ''}")
+    regressions = [row for row in rows if row[4]]
+    print(f"회귀 {len(regressions)}개 / 단계 {len(rows)}개")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
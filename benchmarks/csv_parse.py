@@ -0,0 +1,119 @@
+"""
+CSV 파싱 방식 비교 (행/초, MB/초)
+
+    python -m benchmarks.csv_parse --rows 10000000 --repeat 3
+    python -m benchmarks.csv_parse --base-url /data/bucket --region pochun --months 1 2
+
+같은 월별 CSV를 pandas.read_csv(청크, 타입 추론)와 data_utils.iter_csv_batches(Arrow 멀티스레드, 타입 지정)로
+각각 끝까지 읽어 DataFrame으로 바꾸는 시간을 잰다. 전체 컬럼과 페이지가 쓰는 컬럼(CARD_COLUMNS)만 읽는 경우를 모두 잰다.
+결과는 JSON으로 저장한다.
+"""
+import argparse
+import datetime
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+
+from benchmarks.run import _git_commit, measure
+from benchmarks.synthetic import write_region
+from data_utils import (
+    CARD_COLUMNS, CHUNK_SIZE, CSV_BLOCK_BYTES, FILE_NAME_TEMPLATE, MONTHS, YEAR, batch_to_frame, iter_csv_batches,
+)
+
+
+def read_pandas(paths, columns=None):
+    """예전 방식: pd.read_csv를 CHUNK_SIZE 행씩 (타입 추론, 문자열은 object)"""
+    usecols = None if columns is None else (lambda col: col in columns)
+    rows = 0
+    for path in paths:
+        for chunk in pd.read_csv(path, encoding="utf-8", chunksize=CHUNK_SIZE, usecols=usecols):
+            rows += len(chunk)
+    return rows
+
+
+def read_arrow(paths, columns=None, block_bytes=CSV_BLOCK_BYTES):
+    """지금 방식: Arrow 멀티스레드 리더 + 타입 지정 + to_pandas(split_blocks)"""
+    rows = 0
+    for path in paths:
+        for batch in iter_csv_batches(path, columns, block_bytes):
+            rows += len(batch_to_frame(batch))
+    return rows
+
+
+def run(paths, repeat=3, memory=True, threads=None):
+    """각 방식을 측정해 결과 dict를 돌려주는 함수"""
+    if threads:
+        pa.set_cpu_count(threads)
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+    columns = set(CARD_COLUMNS)
+    readers = {
+        "pandas.all": lambda: read_pandas(paths),
+        "pandas.columns": lambda: read_pandas(paths, columns),
+        "arrow.all": lambda: read_arrow(paths),
+        "arrow.columns": lambda: read_arrow(paths, columns),
+    }
+    stages = []
+    for name, func in readers.items():
+        stage, rows = measure(name, func, repeat, memory)
+        stage["rows"] = rows
+        stage["rows_per_sec"] = rows / stage["median"]
+        stage["mb_per_sec"] = total_bytes / 1024 ** 2 / stage["median"]
+        stages.append(stage)
+        print(f"{name:16s} {stage['median']:8.3f}s {stage['rows_per_sec']:14,.0f} 행/초 "
+              f"{stage['mb_per_sec']:8.1f} MB/초")
+
+    return {
+        "meta": {
+            "files": len(paths),
+            "bytes": total_bytes,
+            "repeat": repeat,
+            "block_bytes": CSV_BLOCK_BYTES,
+            "arrow_threads": pa.cpu_count(),
+            "cpu_count": os.cpu_count(),
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "pandas": pd.__version__,
+            "pyarrow": pa.__version__,
+        },
+        "stages": stages,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CSV 파싱 방식 비교")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="합성 데이터 행 수 (--base-url이 없을 때)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--base-url", default=None, help="월별 CSV가 있는 로컬 디렉터리")
+    parser.add_argument("--region", default="bench")
+    parser.add_argument("--months", type=int, nargs="*", default=list(MONTHS))
+    parser.add_argument("--data-dir", default=os.path.join(".cache", "bench_data"),
+                        help="합성 데이터를 두는 디렉터리 (행 수/seed별로 한 번만 만듦)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=None, help="Arrow 파싱 스레드 수 (기본: CPU 수)")
+    parser.add_argument("--no-memory", action="store_true", help="최대 메모리 측정 생략")
+    parser.add_argument("--out", default=None, help="결과 JSON 경로 (기본: .cache/bench/csv-<시각>.json)")
+    args = parser.parse_args(argv)
+
+    base_url = args.base_url
+    if base_url is None:
+        base_url = os.path.join(args.data_dir, f"{args.region}-{args.rows}-{args.seed}")
+        if not os.path.exists(base_url):
+            print(f"합성 데이터 생성: {args.rows:,}행 -> {base_url}")
+            write_region(base_url + ".tmp", args.region, args.rows, args.seed)
+            os.replace(base_url + ".tmp", base_url)
+    paths = [os.path.join(base_url, FILE_NAME_TEMPLATE.format(year=YEAR, month=month, region=args.region))
+             for month in args.months]
+
+    results = run(paths, args.repeat, not args.no_memory, args.threads)
+
+    out = args.out or os.path.join(".cache", "bench", f"csv-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"결과: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+부하 테스트/오프라인 실행용 가짜 외부 서비스
+
+- FakeBucket: 디렉터리의 파일을 S3 버킷처럼 HTTP로 내주는 서버
+  (지연, 대역폭 제한, ETag/Last-Modified 조건부 요청, Range/If-Range, gzip 압축, 전송 중 끊기 흉내)
+- FakeOpenAI: OpenAI Chat Completions API(스트리밍 포함)를 흉내 내는 서버 (첫 토큰 지연, 토큰 간격 조절)
+
+둘 다 127.0.0.1의 빈 포트에서 데몬 스레드로 돌며, url 속성을 CARD_DATA_BASE_URL / OPENAI_BASE_URL로 쓰면 된다.
+
+    with FakeBucket(".cache/bench_bucket", latency=0.2) as bucket, FakeOpenAI() as llm:
+        os.environ["CARD_DATA_BASE_URL"] = bucket.url
+        os.environ["OPENAI_BASE_URL"] = llm.url
+"""
+import email.utils
+import gzip
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+class _FakeServer:
+    """ThreadingHTTPServer를 데몬 스레드로 띄우고 요청 수를 세는 공통 부분"""
+
+    handler_class = None
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self.handler_class)
+        self._server.daemon_threads = True
+        self._server.owner = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name):
+        with self._lock:
+            self.requests[name] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def owner(self):
+        return self.server.owner
+
+    def setup(self):
+        super().setup()
+        self.owner.count("connections")  # keep-alive로 재사용되면 늘지 않음
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _BucketHandler(_QuietHandler):
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body):
+        bucket = self.owner
+        bucket.count(self.command)
+        bucket.wait_latency()
+
+        path = bucket.resolve(self.path)
+        if path is None:
+            bucket.count("404")
+            self.send_error(404)
+            return
+
+        stat = os.stat(path)
+        etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+        last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+        if self._not_modified(etag, stat.st_mtime):
+            bucket.count("304")
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end, status = 0, stat.st_size - 1, 200
+        match = _RANGE_PATTERN.match(self.headers.get("Range", ""))
+        if_range = self.headers.get("If-Range")
+        if if_range is not None and if_range not in (etag, last_modified):
+            match = None  # 원본이 바뀌었으면 Range를 무시하고 전체를 보냄
+        if match and stat.st_size > 0 and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), end) if match.group(2) else end
+            else:
+                start = max(stat.st_size - int(match.group(2)), 0)
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{stat.st_size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+
+        body = None
+        if bucket.gzip and status == 200 and "gzip" in self.headers.get("Accept-Encoding", ""):
+            with open(path, "rb") as f:
+                body = gzip.compress(f.read(), compresslevel=1)
+
+        self.send_response(status)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(body) if body is not None else end - start + 1))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.send_header("Accept-Ranges", "bytes")
+        if body is not None:
+            self.send_header("Content-Encoding", "gzip")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{stat.st_size}")
+        self.end_headers()
+        if not send_body:
+            return
+        if body is not None:
+            bucket.count("gzip")
+            self.wfile.write(body)
+            return
+        length = end - start + 1
+        limit = bucket.take_drop(path)
+        bucket.send_file(self.wfile, path, start, min(length, limit) if limit is not None else length)
+        if limit is not None and limit < length:
+            bucket.count("dropped")
+            self.close_connection = True
+            self.connection.shutdown(2)
+
+    def _not_modified(self, etag, mtime):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(mtime) <= since
+        return False
+
+
+class FakeBucket(_FakeServer):
+    """
+    root 디렉터리를 S3 버킷처럼 내주는 HTTP 서버
+    latency: 요청마다 응답 전에 기다리는 시간(초), jitter: 그 위에 더하는 0~jitter초의 임의 지연
+    bandwidth: 연결 하나의 전송 속도 상한(바이트/초, None이면 제한 없음)
+    gzip: 클라이언트가 받겠다고 하면 전체 응답(200)을 gzip으로 압축해서 보냄
+    drop_after: 파일마다 처음 drop_count번의 GET은 이만큼(바이트)만 보내고 연결을 끊음 (이어 받기 시험용)
+    """
+
+    handler_class = _BucketHandler
+
+    def __init__(self, root, latency=0.0, jitter=0.0, bandwidth=None, gzip=False, drop_after=None, drop_count=1,
+                 host="127.0.0.1", port=0):
+        super().__init__(host, port)
+        self.root = os.path.abspath(root)
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.gzip = gzip
+        self.drop_after = drop_after
+        self.drop_count = drop_count
+        self.bytes_sent = 0
+        self._drops = Counter()
+
+    def take_drop(self, path):
+        """이번 GET에서 보낼 최대 바이트 수 (끊지 않으면 None)"""
+        if self.drop_after is None:
+            return None
+        with self._lock:
+            if self._drops[path] >= self.drop_count:
+                return None
+            self._drops[path] += 1
+            return self.drop_after
+
+    def resolve(self, url_path):
+        name = os.path.basename(url_path.split("?", 1)[0])
+        path = os.path.join(self.root, name)
+        return path if name and os.path.isfile(path) else None
+
+    def wait_latency(self):
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def send_file(self, wfile, path, start, length, block_size=64 * 1024):
+        with open(path, "rb") as f:
+            f.seek(start)
+            while length > 0:
+                block = f.read(min(block_size, length))
+                if not block:
+                    break
+                try:
+                    wfile.write(block)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                length -= len(block)
+                with self._lock:
+                    self.bytes_sent += len(block)
+                if self.bandwidth:
+                    time.sleep(len(block) / self.bandwidth)
+
+
+class _OpenAIHandler(_QuietHandler):
+    def do_POST(self):
+        llm = self.owner
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            llm.count("404")
+            self.send_error(404)
+            return
+        llm.count("chat.completions")
+        time.sleep(llm.first_token_delay)
+
+        text = llm.reply(body)
+        model = body.get("model", "fake")
+        if not body.get("stream"):
+            payload = json.dumps({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for start in range(0, len(text), llm.token_chars):
+                chunk = {
+                    "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": text[start:start + llm.token_chars]},
+                                 "finish_reason": None}],
+                }
+                self._write_chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                if llm.token_interval:
+                    time.sleep(llm.token_interval)
+            self._write_chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+class FakeOpenAI(_FakeServer):
+    """
+    OpenAI Chat Completions API(/v1/chat/completions)를 흉내 내는 서버
+    프롬프트의 숫자 하나(요청한 정보 개수)만큼 번호 붙은 문장을 돌려주며, 스트리밍이면 token_chars 글자씩 나눠 보낸다.
+    """
+
+    handler_class = _OpenAIHandler
+
+    def __init__(self, first_token_delay=0.3, token_interval=0.02, token_chars=4, host="127.0.0.1", port=0):
+        super().__init__(host, port)
+        self.first_token_delay = first_token_delay
+        self.token_interval = token_interval
+        self.token_chars = token_chars
+
+    @property
+    def url(self):
+        return super().url + "/v1"
+
+    def reply(self, body):
+        prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []) if m.get("role") == "user")
+        match = re.search(r"(\d+)개", prompt)
+        count = int(match.group(1)) if match else 1
+        return "\n".join(f"{i}. 오프라인 테스트용 지역 정보 {i}번입니다." for i in range(1, count + 1))
@@ -0,0 +1,385 @@
+"""
+동시 접속자 부하 테스트 (완전히 오프라인)
+
+    python -m benchmarks.loadtest --users 20 --sessions 60 --rows 300000
+    python -m benchmarks.loadtest --users 50 --bucket-latency 0.3 --bandwidth 5000000 --metrics
+
+가짜 S3 버킷(FakeBucket, 합성 데이터), 가짜 OpenAI(FakeOpenAI)를 띄우고 이 프로세스 하나를 서버로 삼아
+가상 사용자(Streamlit AppTest 세션)들이 메인 -> 페이지 01 -> 02 -> 03을 임의의 지역/업종을 골라 돌아다닌다.
+모든 세션은 같은 프로세스의 st.cache_resource(지역/차트 캐시)를 공유하므로 실제 서버 한 대와 같은 조건이다.
+
+단계별 지연 시간 백분위수, 처리량, 시간에 따른 메모리(RSS)를 출력하고 JSON으로 저장한다.
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.fake_services import FakeBucket, FakeOpenAI
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGE_SCRIPTS = {
+    "page01": "01_어떤_사업이_잘될까.py",
+    "page02": "02_이_사업_자세히_보기.py",
+    "page03": "03_맞춤_리포트.py",
+}
+PERCENTILES = (50, 90, 95, 99)
+
+
+def configure_environment(bucket_url, openai_url, work_dir, metrics=False):
+    """
+    앱이 가짜 서비스와 임시 캐시 디렉터리를 쓰도록 환경 변수를 설정하는 함수
+    앱 모듈(data_utils, openai_utils, main 등)은 import할 때 환경 변수를 읽으므로 그 전에 호출해야 한다.
+    """
+    os.environ.update({
+        "CARD_DATA_BASE_URL": bucket_url,
+        "CARD_CACHE_DIR": os.path.join(work_dir, "card_data"),
+        "REGION_DATASET_DIR": os.path.join(work_dir, "datasets"),
+        "RESULT_STORE_DIR": os.path.join(work_dir, "results"),
+        "REGION_INFO_CACHE_DIR": os.path.join(work_dir, "region_info"),
+        "REGION_INFO_BACKEND": "openai",
+        "OPENAI_BASE_URL": openai_url,
+        "OPENAI_API_KEY": "loadtest",
+    })
+    if metrics:
+        os.environ["APP_METRICS"] = "1"
+
+
+class Recorder:
+    """단계별 지연 시간, 오류, 시간에 따른 메모리를 모으는 객체 (여러 스레드에서 기록)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(list)
+        self.memory = []
+        self.sessions_done = 0
+        self._lock = threading.Lock()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def step(self, name, at, run):
+        """AppTest 한 번 실행(run)의 시간을 재고, 스크립트 예외가 있으면 오류로 기록"""
+        started = time.perf_counter()
+        try:
+            run()
+        except Exception as e:
+            self.error(name, f"{type(e).__name__}: {e}")
+            return False
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self.latencies[name].append(seconds)
+        exceptions = [e.message for e in at.exception]
+        if exceptions:
+            self.error(name, exceptions[0])
+            return False
+        return True
+
+    def error(self, name, message):
+        with self._lock:
+            self.errors[name].append(message)
+
+    def session_done(self):
+        with self._lock:
+            self.sessions_done += 1
+
+    def sample_memory(self):
+        from metrics_utils import process_memory
+
+        memory = process_memory()
+        with self._lock:
+            steps = sum(len(values) for values in self.latencies.values())
+            self.memory.append({
+                "t": round(self.elapsed(), 2),
+                "rss": memory["rss"],
+                "max_rss": memory["max_rss"],
+                "steps": steps,
+                "sessions": self.sessions_done,
+                "threads": threading.active_count(),
+            })
+
+
+@contextlib.contextmanager
+def shared_app_runtime():
+    """
+    AppTest는 한 번에 하나만 실행된다고 가정하고 프로세스 전역 상태를 실행마다 바꿔 쓴다.
+    여러 세션을 동시에 돌리는 동안에는 다음 두 가지를 고정해 둔다.
+    - Runtime 싱글턴: 모든 실행이 같은 가짜 Runtime을 봄 (먼저 끝난 실행이 지워 다른 실행이 죽는 것을 막음)
+    - 페이지 목록 캐시: 시작 스크립트별로 따로 둠 (다른 세션이 연 페이지 스크립트가 대신 실행되는 것을 막음)
+    """
+    from unittest import mock
+
+    from streamlit import source_util
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+    runtime = mock.MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+
+    get_pages = source_util.get_pages
+    pages_by_script = {}
+
+    def get_pages_by_script(main_script_path):
+        with source_util._pages_cache_lock:
+            if main_script_path not in pages_by_script:
+                saved, source_util._cached_pages = source_util._cached_pages, None
+                try:
+                    pages_by_script[main_script_path] = get_pages(main_script_path)
+                finally:
+                    source_util._cached_pages = saved
+            return pages_by_script[main_script_path]
+
+    with mock.patch.object(Runtime, "instance", classmethod(lambda cls: runtime)), \
+            mock.patch.object(Runtime, "exists", classmethod(lambda cls: True)), \
+            mock.patch.object(source_util, "get_pages", get_pages_by_script):
+        yield runtime
+
+
+def _page_path(page):
+    return os.path.join(REPO_DIR, "pages", PAGE_SCRIPTS[page])
+
+
+def _choose(rng, widget):
+    options = list(widget.options)
+    return rng.choice(options) if options else None
+
+
+def simulate_session(rng, region_labels, recorder, think_time=0.0, timeout=300):
+    """
+    가상 사용자 한 명: 메인에서 지역을 고르고 페이지 01~03을 차례로 열어 업종을 바꿔 본다.
+    각 단계(스크립트 실행 한 번)의 시간을 recorder에 기록한다.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    def think():
+        if think_time:
+            time.sleep(rng.uniform(0, think_time))
+
+    # 메인: 첫 화면(기본 지역) 후 지역 선택
+    at = AppTest.from_file(os.path.join(REPO_DIR, "main.py"), default_timeout=timeout)
+    if not recorder.step("main.open", at, at.run):
+        return
+    if not at.sidebar.selectbox:
+        recorder.error("main.open", "지역 선택 위젯이 없음")
+        return
+    label = rng.choice(region_labels)
+    region_select = at.sidebar.selectbox[0]
+    if region_select.value != label:
+        think()
+        if not recorder.step("main.select_region", at, lambda: region_select.set_value(label).run()):
+            return
+    region = at.session_state["region_url"]
+
+    # 페이지 01: 대분류 바꾸기
+    think()
+    at = AppTest.from_file(_page_path("page01"), default_timeout=timeout)
+    at.session_state["region_url"] = region
+    if recorder.step("page01.open", at, at.run) and at.selectbox:
+        think()
+        choice = _choose(rng, at.selectbox[0])
+        recorder.step("page01.select", at, lambda: at.selectbox[0].set_value(choice).run())
+
+    # 페이지 02: 대분류와 비교할 소분류 바꾸기
+    think()
+    at = AppTest.from_file(_page_path("page02"), default_timeout=timeout)
+    at.session_state["region_url"] = region
+    if recorder.step("page02.open", at, at.run) and at.selectbox:
+        think()
+        choice = _choose(rng, at.selectbox[0])
+        if recorder.step("page02.select", at, lambda: at.selectbox[0].set_value(choice).run()) and at.multiselect:
+            options = list(at.multiselect[0].options)
+            picked = rng.sample(options, min(len(options), rng.randint(1, 3))) if options else []
+            recorder.step("page02.compare", at, lambda: at.multiselect[0].set_value(picked).run())
+
+    # 페이지 03: 대분류/소분류를 골라 리포트 보기
+    think()
+    at = AppTest.from_file(_page_path("page03"), default_timeout=timeout)
+    at.session_state["region_url"] = region
+    if recorder.step("page03.open", at, at.run) and at.sidebar.selectbox:
+        think()
+        choice = _choose(rng, at.sidebar.selectbox[0])
+        if recorder.step("page03.select", at, lambda: at.sidebar.selectbox[0].set_value(choice).run()) \
+                and len(at.sidebar.selectbox) > 1:
+            choice = _choose(rng, at.sidebar.selectbox[1])
+            recorder.step("page03.report", at, lambda: at.sidebar.selectbox[1].set_value(choice).run())
+    recorder.session_done()
+
+
+def _stats(values):
+    values = np.asarray(values)
+    stats = {"count": int(len(values)), "mean": float(values.mean()), "max": float(values.max())}
+    for p in PERCENTILES:
+        stats[f"p{p}"] = float(np.percentile(values, p))
+    return stats
+
+
+def summarize(recorder):
+    """Recorder를 결과 dict(단계별 백분위수, 처리량, 메모리 추이)로 정리"""
+    elapsed = recorder.elapsed()
+    steps = {name: _stats(values) for name, values in sorted(recorder.latencies.items())}
+    total_steps = sum(stats["count"] for stats in steps.values())
+    rss = [sample["rss"] for sample in recorder.memory if sample["rss"]]
+    return {
+        "elapsed": elapsed,
+        "sessions": recorder.sessions_done,
+        "steps": steps,
+        "errors": {name: {"count": len(messages), "examples": sorted(set(messages))[:3]}
+                   for name, messages in recorder.errors.items()},
+        "throughput": {
+            "steps_per_second": total_steps / elapsed if elapsed else 0.0,
+            "sessions_per_second": recorder.sessions_done / elapsed if elapsed else 0.0,
+        },
+        "memory": {
+            "peak_rss": max(rss) if rss else None,
+            "median_rss": statistics.median(rss) if rss else None,
+            "timeline": recorder.memory,
+        },
+    }
+
+
+def run(region_labels, users, sessions, ramp_up=0.0, think_time=0.0, memory_interval=1.0, seed=0, timeout=300):
+    """
+    가상 사용자 users명이 동시에 세션을 모두 sessions번 돌리는 부하 테스트 (configure_environment 다음에 호출)
+    사용자는 ramp_up초에 걸쳐 나눠 들어오며, memory_interval초마다 RSS를 기록한다.
+    """
+    # 페이지들이 import하는 main 모듈을 미리 올려 둠 (실제 서버에서는 첫 접속 때 이미 올라가 있으며,
+    # 페이지 실행 중에 처음 import되면 main의 사이드바 위젯이 set_page_config보다 먼저 그려져 오류가 남)
+    import main  # noqa: F401
+
+    recorder = Recorder()
+    stop = threading.Event()
+
+    def sample_memory():
+        while not stop.wait(memory_interval):
+            recorder.sample_memory()
+
+    sampler = threading.Thread(target=sample_memory, name="loadtest-memory", daemon=True)
+    sampler.start()
+    recorder.sample_memory()
+
+    def session(index):
+        if ramp_up and index < users:
+            time.sleep(ramp_up * index / users)
+        try:
+            simulate_session(random.Random(seed + index), region_labels, recorder, think_time, timeout)
+        except Exception:
+            recorder.error("session", traceback.format_exc(limit=3))
+
+    try:
+        with shared_app_runtime(), \
+                ThreadPoolExecutor(max_workers=users, thread_name_prefix="loadtest-user") as executor:
+            list(executor.map(session, range(sessions)))
+    finally:
+        stop.set()
+        sampler.join()
+        recorder.sample_memory()
+
+    results = summarize(recorder)
+    if os.getenv("APP_METRICS") == "1":
+        from metrics_utils import snapshot
+
+        metrics = snapshot()
+        results["metrics"] = {"counters": metrics["counters"], "spans": metrics["spans"]}
+    return results
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+
+
+def print_report(results):
+    print(f"\n{results['sessions']}개 세션, {results['elapsed']:.1f}초")
+    header = f"{'단계':<20}{'횟수':>6}" + "".join(f"{f'p{p}':>10}" for p in PERCENTILES) + f"{'최대':>10}"
+    print(header)
+    for name, stats in results["steps"].items():
+        print(f"{name:<20}{stats['count']:>6}"
+              + "".join(f"{stats[f'p{p}'] * 1000:>8.0f}ms" for p in PERCENTILES)
+              + f"{stats['max'] * 1000:>8.0f}ms")
+    throughput = results["throughput"]
+    print(f"처리량: 단계 {throughput['steps_per_second']:.2f}/초, 세션 {throughput['sessions_per_second']:.3f}/초")
+    memory = results["memory"]
+    if memory["peak_rss"]:
+        print(f"메모리: 최대 RSS {format_bytes(memory['peak_rss'])}, 중앙값 {format_bytes(memory['median_rss'])}")
+    for name, error in results["errors"].items():
+        print(f"오류 [{name}] {error['count']}건: {error['examples'][0]}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="동시 접속자 부하 테스트 (가짜 S3/OpenAI, 오프라인)")
+    parser.add_argument("--users", type=int, default=10, help="동시 사용자 수")
+    parser.add_argument("--sessions", type=int, default=None, help="전체 세션 수 (기본: 사용자 수)")
+    parser.add_argument("--regions", type=int, default=3, help="쓸 지역 수 (REGION_MAPPING 앞에서부터, 모자라면 합성 지역을 더함)")
+    parser.add_argument("--rows", type=int, default=200_000, help="지역별 합성 데이터 행 수")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="사용자가 모두 들어오는 데 걸리는 시간(초)")
+    parser.add_argument("--think-time", type=float, default=1.0, help="단계 사이 최대 대기 시간(초)")
+    parser.add_argument("--bucket-latency", type=float, default=0.1, help="버킷 요청마다 응답 전 지연(초)")
+    parser.add_argument("--bucket-jitter", type=float, default=0.05, help="버킷 지연에 더하는 최대 임의 지연(초)")
+    parser.add_argument("--bandwidth", type=float, default=None, help="버킷 연결당 전송 속도(바이트/초)")
+    parser.add_argument("--llm-delay", type=float, default=0.5, help="가짜 OpenAI 첫 토큰 지연(초)")
+    parser.add_argument("--llm-token-interval", type=float, default=0.02, help="가짜 OpenAI 토큰 간격(초)")
+    parser.add_argument("--memory-interval", type=float, default=1.0, help="메모리 기록 간격(초)")
+    parser.add_argument("--timeout", type=float, default=300, help="스크립트 실행 한 번의 제한 시간(초)")
+    parser.add_argument("--metrics", action="store_true", help="앱 계측(APP_METRICS) 켜고 결과에 포함")
+    parser.add_argument("--data-dir", default=os.path.join(".cache", "bench_data"),
+                        help="합성 데이터를 두는 디렉터리 (행 수/seed별로 한 번만 만듦)")
+    parser.add_argument("--out", default=None, help="결과 JSON 경로 (기본: .cache/bench/loadtest-<시각>.json)")
+    args = parser.parse_args(argv)
+
+    bucket_dir = os.path.join(args.data_dir, f"loadtest-{args.regions}-{args.rows}-{args.seed}")
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as work_dir, \
+            FakeBucket(bucket_dir, args.bucket_latency, args.bucket_jitter, args.bandwidth) as bucket, \
+            FakeOpenAI(args.llm_delay, args.llm_token_interval) as llm:
+        configure_environment(bucket.url, llm.url, work_dir, args.metrics)
+
+        # 환경 변수를 설정한 뒤에 앱 모듈을 import
+        from benchmarks.synthetic import write_region
+        from data_utils import REGION_MAPPING
+
+        # 지역 전환까지 시험할 수 있도록 REGION_MAPPING이 모자라면 이 프로세스 안에서만 합성 지역을 더함
+        for i in range(len(REGION_MAPPING), args.regions):
+            REGION_MAPPING[f"합성지역{i}"] = f"synthetic{i}"
+        labels = list(REGION_MAPPING)[:args.regions]
+        if not os.path.exists(bucket_dir):
+            print(f"합성 데이터 생성: 지역 {len(labels)}개 × {args.rows:,}행 -> {bucket_dir}")
+            for i, label in enumerate(labels):
+                write_region(bucket_dir + ".tmp", REGION_MAPPING[label], args.rows, args.seed + i)
+            os.replace(bucket_dir + ".tmp", bucket_dir)
+
+        print(f"가상 사용자 {args.users}명, 세션 {args.sessions or args.users}개, 지역 {', '.join(labels)}")
+        results = run(labels, args.users, args.sessions or args.users, args.ramp_up, args.think_time,
+                      args.memory_interval, args.seed, args.timeout)
+        results["config"] = vars(args)
+        results["requests"] = {"bucket": dict(bucket.requests), "bucket_bytes": bucket.bytes_sent,
+                               "openai": dict(llm.requests)}
+
+    print_report(results)
+    out = args.out or os.path.join(".cache", "bench", f"loadtest-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"결과: {out}")
+    return 1 if results["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
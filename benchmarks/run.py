@@ -0,0 +1,206 @@
+"""
+페이지 단계별 성능 측정
+
+    python -m benchmarks.run --rows 10000000 --repeat 3 --out results.json
+    python -m benchmarks.run --base-url /data/bucket --region pochun
+
+합성 데이터(--rows, 없으면 만듦)나 기존 버킷(--base-url)으로 각 단계를 repeat번 실행해 시간을 재고,
+한 번 더 실행하면서 tracemalloc으로 최대 메모리를 잰다. 결과는 JSON으로 저장하며 benchmarks.compare로 비교한다.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import write_region
+from chart_utils import (
+    CATEGORY_CHART_IDS, SUBCATEGORY_CHART_IDS, build_category_figure, build_subcategory_figure, figure_to_json,
+)
+from data_utils import add_time_columns, ingest_region, ingest_region_blocks
+from metrics_utils import process_memory
+from report_utils import CHART_IDS, build_report_figures, compute_report
+
+# 페이지별로 그리는 집계 (pages/의 sales_cube.aggregate 호출과 같은 축)
+PAGE_AGGREGATES = {
+    "page01": [("month",), ("sex",), ("sex", "age"), ("day",), ("hour",)],
+    "page02": [("month", "card_tpbuz_nm_2"), ("sex", "card_tpbuz_nm_2"), ("age", "card_tpbuz_nm_2"),
+               ("hour", "card_tpbuz_nm_2"), ("day", "card_tpbuz_nm_2")],
+}
+
+
+def measure(name, func, repeat=3, memory=True, warmup=True):
+    """
+    func를 repeat번 실행한 시간(초)과, memory면 한 번 더 실행한 최대 메모리(바이트)를 재는 함수
+    warmup이면 처음 한 번(모듈 import, 캐시 준비 등)은 재지 않고 먼저 실행한다.
+    """
+    seconds = []
+    result = func() if warmup else None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - started)
+
+    peak_bytes = None
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    stage = {
+        "name": name,
+        "seconds": seconds,
+        "median": statistics.median(seconds),
+        "min": min(seconds),
+        "peak_bytes": peak_bytes,
+    }
+    print(f"{name:<40} {stage['median'] * 1000:10.2f} ms"
+          + (f" {peak_bytes / 1024 ** 2:10.1f} MB" if peak_bytes is not None else ""))
+    return stage, result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run(region, base_url, repeat=3, memory=True, sample_frac=0.01):
+    """모든 단계를 측정해 결과 dict를 돌려주는 함수"""
+    stages = []
+
+    def add(name, func, warmup=True):
+        stage, result = measure(name, func, repeat, memory, warmup)
+        stages.append(stage)
+        return result
+
+    work_dir = tempfile.mkdtemp(prefix="bench-")
+    try:
+        # 1. 수집: Parquet 캐시가 없을 때(CSV 파싱 + 캐시 기록)와 있을 때
+        def ingest_cold():
+            cache_dir = tempfile.mkdtemp(dir=work_dir)
+            try:
+                return ingest_region(region, base_url=base_url, cache_dir=cache_dir, sample_frac=sample_frac)
+            finally:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+
+        warm_dir = os.path.join(work_dir, "warm")
+        add("ingest.cold", ingest_cold, warmup=False)
+        ingest_region(region, base_url=base_url, cache_dir=warm_dir, sample_frac=sample_frac)
+        sample, cube, failed = add("ingest.warm", lambda: ingest_region(
+            region, base_url=base_url, cache_dir=warm_dir, sample_frac=sample_frac), warmup=False)
+        if failed:
+            raise RuntimeError(f"불러오지 못한 월: {failed}")
+
+        # 2. 샘플링: 원본에서 블록 표본(미리보기, 베르누이 샘플은 위 수집 단계에 포함)
+        add("sample.blocks", lambda: ingest_region_blocks(region, 0.01, base_url=base_url), warmup=False)
+
+        # 2-1. 시간 파생 컬럼: 예전 페이지가 재실행마다 하던 날짜 파싱과, 수집 때 한 번 만들어 둔 컬럼 읽기
+        raw_ymd = pd.Series(sample["ta_ymd"].dt.strftime("%Y%m%d").astype(np.int64))
+        add("time_columns.per_rerun", lambda: pd.to_datetime(raw_ymd, format="%Y%m%d").dt.month)
+        add("time_columns.ingest_once", lambda: add_time_columns(sample[["ta_ymd", "hour"]].copy()))
+        add("time_columns.precomputed", lambda: sample["month"].to_numpy())
+
+        # 3. 필터: 큐브의 업종 색인 만들기와 대분류별 위치 찾기 (페이지의 업종 목록/집계가 쓰는 경로)
+        def build_index():
+            cube._index = None
+            return cube.index
+
+        add("filter.index", build_index)
+        mains = cube.main_categories()
+        add("filter.locate", lambda: [cube.index.locate(nm_1) for nm_1 in mains])
+
+        # 4. 집계: 페이지마다 그리는 집계 (가장 큰 대분류 기준)
+        nm_1 = max(mains, key=lambda main: cube.total(nm_1=main)["rows"])
+        nm_2 = cube.subcategories(nm_1)[:3]
+        for page, aggregates in PAGE_AGGREGATES.items():
+            selected = dict(nm_1=nm_1) if page == "page01" else dict(nm_1=nm_1, nm_2=nm_2)
+            for by in aggregates:
+                add(f"groupby.{page}.{'+'.join(by)}", lambda by=by, selected=selected: cube.aggregate(by, **selected))
+        report = add("groupby.page03.report", lambda: compute_report(cube, nm_1, nm_2[0]))
+
+        # 5. 차트: 페이지마다 그리는 차트 만들기(집계 포함)와 직렬화
+        for chart_id in CATEGORY_CHART_IDS:
+            fig = add(f"figure.page01.{chart_id}",
+                      lambda chart_id=chart_id: build_category_figure(cube, chart_id, nm_1))
+            add(f"figure.serialize.page01.{chart_id}", lambda fig=fig: figure_to_json(fig))
+        for chart_id in SUBCATEGORY_CHART_IDS:
+            fig = add(f"figure.page02.{chart_id}",
+                      lambda chart_id=chart_id: build_subcategory_figure(cube, chart_id, nm_1, nm_2))
+            add(f"figure.serialize.page02.{chart_id}", lambda fig=fig: figure_to_json(fig))
+        # 리포트 차트의 단계 이름은 예전 결과와 비교할 수 있도록 그대로 둠
+        for chart_id in CHART_IDS:
+            figures = add(f"figure.page03.{chart_id}", lambda chart_id=chart_id: build_report_figures(report, [chart_id]))
+            if chart_id in figures:
+                add(f"figure.serialize.{chart_id}", lambda fig=figures[chart_id]: figure_to_json(fig))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "region": region,
+            "base_url": base_url,
+            "rows": int(cube.total()["rows"]),
+            "pairs": len(cube.pairs),
+            "sample_rows": len(sample),
+            "repeat": repeat,
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            # 프로세스 전체 최대 RSS (resource 모듈이 없는 윈도우는 None)
+            "max_rss_bytes": process_memory()["max_rss"],
+        },
+        "stages": stages,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="페이지 단계별 성능 측정")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="합성 데이터 행 수 (--base-url이 없을 때)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--base-url", default=None, help="기존 데이터 버킷 (로컬 디렉터리나 URL)")
+    parser.add_argument("--region", default="bench")
+    parser.add_argument("--data-dir", default=os.path.join(".cache", "bench_data"),
+                        help="합성 데이터를 두는 디렉터리 (행 수/seed별로 한 번만 만듦)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="최대 메모리 측정 생략")
+    parser.add_argument("--out", default=None, help="결과 JSON 경로 (기본: .cache/bench/results-<시각>.json)")
+    args = parser.parse_args(argv)
+
+    base_url = args.base_url
+    if base_url is None:
+        base_url = os.path.join(args.data_dir, f"{args.region}-{args.rows}-{args.seed}")
+        if not os.path.exists(base_url):
+            print(f"합성 데이터 생성: {args.rows:,}행 -> {base_url}")
+            write_region(base_url + ".tmp", args.region, args.rows, args.seed)
+            os.replace(base_url + ".tmp", base_url)
+
+    results = run(args.region, base_url, args.repeat, not args.no_memory)
+
+    out = args.out or os.path.join(".cache", "bench", f"results-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"결과: {out}")
+
+
+if __name__ == "__main__":
+    main()
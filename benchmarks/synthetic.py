@@ -0,0 +1,134 @@
+"""
+실제 카드 데이터(tbsh_gyeonggi_day_YYYYMM_<지역>.csv)와 같은 스키마/카디널리티의 합성 데이터 생성기
+
+    python -m benchmarks.synthetic --rows 10000000 --region bench --out .cache/bench_bucket
+
+월별 CSV 12개를 만들며, 행은 chunk_rows씩 만들어 바로 파일에 이어 쓰므로 수천만 행도 메모리에 다 올리지 않는다.
+같은 seed면 같은 데이터가 나온다.
+"""
+import argparse
+import calendar
+import datetime
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+from data_utils import FILE_NAME_TEMPLATE, MONTHS, YEAR
+
+# 업종 대분류 -> 대표 소분류 (실제 데이터처럼 대분류 10여 개, 업종 쌍 100개 남짓이 되도록 번호 붙은 소분류를 더함)
+CATEGORIES = {
+    "음식": ["한식", "중식", "일식", "양식", "카페", "제과점", "패스트푸드", "주점"],
+    "소매": ["편의점", "슈퍼마켓", "대형마트", "정육점", "과일", "농수산물"],
+    "서비스": ["미용", "세탁", "사진", "인테리어", "이사"],
+    "의료": ["일반병원", "치과", "한의원", "약국", "동물병원"],
+    "교육": ["학원", "독서실", "서점", "문구"],
+    "여가/오락": ["노래방", "PC방", "헬스", "골프", "영화"],
+    "숙박": ["호텔", "모텔", "펜션"],
+    "자동차": ["주유소", "정비", "세차", "부품"],
+    "패션/잡화": ["의류", "신발", "가방", "안경", "시계/귀금속"],
+    "생활": ["가구", "가전", "철물", "꽃집", "애완용품"],
+}
+EXTRA_SUBCATEGORIES = 6  # 대분류마다 더하는 "기타NN" 소분류 수
+
+# 실제 데이터의 값 범위 (연령대/요일 1~7, 시간대 코드 1~10)
+SEXES = ["M", "F"]
+AGES = np.arange(1, 8)
+HOURS = np.arange(1, 11)
+HOUR_WEIGHTS = np.array([4, 5, 8, 13, 13, 11, 12, 14, 12, 8], dtype=float)
+AGE_WEIGHTS = np.array([1, 4, 14, 20, 22, 21, 18], dtype=float)
+
+# 원본 CSV의 컬럼 순서 (앱이 쓰지 않는 지역/업종 코드 컬럼도 그대로 넣음)
+COLUMNS = ["ta_ymd", "cty_rgn_no", "admi_cty_no", "card_tpbuz_cd", "card_tpbuz_nm_1", "card_tpbuz_nm_2",
+           "hour", "sex", "age", "day", "amt", "cnt"]
+
+
+def category_pairs():
+    """(대분류, 소분류) 목록과 업종 쌍별 비중 (인기 업종에 행이 몰리는 Zipf 분포)"""
+    pairs = []
+    for main, subs in CATEGORIES.items():
+        subs = subs + [f"기타{i:02d}" for i in range(1, EXTRA_SUBCATEGORIES + 1)]
+        pairs.extend((main, sub) for sub in subs)
+    weights = 1.0 / np.arange(1, len(pairs) + 1) ** 0.8
+    return pairs, weights / weights.sum()
+
+
+def generate_chunk(rng, month, rows, pairs, pair_weights):
+    """한 달치 합성 데이터 rows행을 pyarrow Table로 만드는 함수"""
+    days_in_month = calendar.monthrange(YEAR, month)[1]
+    dom = rng.integers(1, days_in_month + 1, rows)
+    first_weekday = datetime.date(YEAR, month, 1).isoweekday()  # 1=월 ~ 7=일
+    pair_codes = rng.choice(len(pairs), rows, p=pair_weights)
+
+    nm_1 = pa.array([main for main, _ in pairs])
+    nm_2 = pa.array([sub for _, sub in pairs])
+    codes = pa.array(pair_codes)
+    cnt = rng.poisson(2.0, rows) + 1
+    # 건당 금액은 업종마다 다른 로그정규 분포
+    mean_amt = 9.0 + (pair_codes % 7) * 0.35
+    amt = np.rint(np.exp(rng.normal(mean_amt, 0.8)) * cnt).astype(np.int64)
+
+    columns = {
+        "ta_ymd": YEAR * 10000 + month * 100 + dom,
+        "cty_rgn_no": np.full(rows, 41650),
+        "admi_cty_no": np.full(rows, 4165000000),
+        "card_tpbuz_cd": pa.array([f"A{code:03d}" for code in range(len(pairs))]).take(codes),
+        "card_tpbuz_nm_1": nm_1.take(codes),
+        "card_tpbuz_nm_2": nm_2.take(codes),
+        "hour": rng.choice(HOURS, rows, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum()),
+        "sex": pa.array(SEXES).take(pa.array(rng.integers(0, 2, rows))),
+        "age": rng.choice(AGES, rows, p=AGE_WEIGHTS / AGE_WEIGHTS.sum()),
+        "day": (first_weekday - 1 + dom - 1) % 7 + 1,
+        "amt": amt,
+        "cnt": cnt,
+    }
+    return pa.table({name: columns[name] for name in COLUMNS})
+
+
+def write_region(out_dir, region, rows, seed=0, chunk_rows=1_000_000, months=MONTHS):
+    """
+    합성 지역 데이터를 월별 CSV로 쓰는 함수 (data_utils의 FILE_NAME_TEMPLATE 이름 사용)
+    rows는 12개월 전체 행 수이며, 달마다 같은 비율로 나눈다. 만든 파일 경로 목록을 돌려준다.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    pairs, pair_weights = category_pairs()
+    months = list(months)
+    paths = []
+    for month in months:
+        rng = np.random.default_rng([seed, month])
+        month_rows = rows // len(months) + (1 if month <= rows % len(months) else 0)
+        path = os.path.join(out_dir, FILE_NAME_TEMPLATE.format(year=YEAR, month=month, region=region))
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            # 원본처럼 따옴표 없는 헤더를 직접 쓰고, 본문은 청크마다 이어 씀
+            f.write((",".join(COLUMNS) + "\n").encode("utf-8"))
+            writer = None
+            for start in range(0, month_rows, chunk_rows):
+                table = generate_chunk(rng, month, min(chunk_rows, month_rows - start), pairs, pair_weights)
+                if writer is None:
+                    write_options = pa_csv.WriteOptions(include_header=False, quoting_style="none")
+                    writer = pa_csv.CSVWriter(f, table.schema, write_options=write_options)
+                writer.write_table(table)
+            if writer is not None:
+                writer.close()
+        os.replace(tmp_path, path)
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="합성 카드 데이터 생성")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="12개월 전체 행 수")
+    parser.add_argument("--region", default="bench", help="파일 이름에 쓸 지역 영문명")
+    parser.add_argument("--out", default=os.path.join(".cache", "bench_bucket"), help="CSV를 쓸 디렉터리")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000, help="한 번에 만들어 쓰는 행 수")
+    args = parser.parse_args(argv)
+
+    for path in write_region(args.out, args.region, args.rows, args.seed, args.chunk_rows):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
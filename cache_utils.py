@@ -0,0 +1,96 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    메모리 예산(바이트) 안에서 가장 오래 안 쓴 항목부터 내보내는 스레드 안전 캐시
+    sizeof(value)로 항목 크기를 재고, 적중/실패/내보냄 횟수를 센다.
+    예산보다 큰 항목 하나는 다른 항목을 모두 내보낸 뒤 그대로 보관한다.
+    """
+
+    def __init__(self, max_bytes, sizeof):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._items = OrderedDict()  # key -> (value, 크기)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.current_bytes = 0
+
+    def get(self, key, default=None):
+        """캐시에서 꺼내는 함수 (적중/실패 횟수에 반영)"""
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._items.move_to_end(key)
+            return self._items[key][0]
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._items:
+                self.current_bytes -= self._items.pop(key)[1]
+            self._items[key] = (value, size)
+            self.current_bytes += size
+            self._evict()
+
+    def _evict(self):
+        # 방금 넣은(가장 최근) 항목은 남긴다
+        while self.current_bytes > self.max_bytes and len(self._items) > 1:
+            _, (_, size) = self._items.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        """
+        캐시에 있으면 바로 돌려주고, 없으면 loader()로 만들어 넣은 뒤 돌려주는 함수
+        같은 키를 여러 스레드가 동시에 요청해도 loader는 한 번만 실행된다.
+        """
+        with self._lock:
+            if key in self._items:
+                self.hits += 1
+                self._items.move_to_end(key)
+                return self._items[key][0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                # 기다리는 동안 다른 스레드가 이미 로드했을 수 있음
+                if key in self._items:
+                    self.hits += 1
+                    self._items.move_to_end(key)
+                    return self._items[key][0]
+                self.misses += 1
+            try:
+                value = loader()
+                self.put(key, value)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """캐시 상태 (dict)"""
+        with self._lock:
+            return {
+                "keys": list(self._items),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
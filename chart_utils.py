@@ -0,0 +1,278 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+
+# 작은 차트 모드: 실수 값의 소수점 자리수, WebGL(scattergl)로 바꿀 최소 점 개수
+CHART_COMPACT = os.getenv("CHART_COMPACT", "1") != "0"
+CHART_DECIMALS = 2
+WEBGL_MIN_POINTS = 1000
+
+# 숫자 값이 들어가는 trace 속성
+_VALUE_ATTRS = ("x", "y", "z", "values")
+
+# 페이지별 차트 id (화면에 그리는 순서)
+CATEGORY_CHART_IDS = ("monthly", "gender", "gender_age", "weekday", "hourly")  # 01 업종 대분류 분석
+SUBCATEGORY_CHART_IDS = ("monthly", "gender", "age", "hourly", "weekday")  # 02 업종 소분류 비교
+
+# 요일 코드 (1=월 ~ 7=일)와 연령대 코드
+DAY_LABELS = {1: '월', 2: '화', 3: '수', 4: '목', 5: '금', 6: '토', 7: '일'}
+AGE_LABELS = {
+    1: '10대 이하', 2: '10대', 3: '20대', 4: '30대', 5: '40대',
+    6: '50대', 7: '60대 이상'
+}
+
+
+def compact_figure(fig, decimals=CHART_DECIMALS, webgl_min_points=WEBGL_MIN_POINTS):
+    """
+    브라우저로 보내는 차트 크기를 줄인 복사본을 만드는 함수
+    - 템플릿은 layout 부분만 남김 (trace별 기본 스타일은 용량의 절반 이상이지만 Streamlit 테마가 덮어씀)
+    - 실수 값은 소수점 decimals 자리로 반올림
+    - 점이 webgl_min_points개 이상인 scatter는 WebGL(scattergl)로 그림
+    """
+    fig = go.Figure(fig)
+    fig.layout.template = go.layout.Template(layout=fig.layout.template.layout)
+
+    traces = []
+    for trace in fig.data:
+        for attr in _VALUE_ATTRS:
+            values = getattr(trace, attr, None) if attr in trace else None
+            if values is None:
+                continue
+            values = np.asarray(values)
+            if values.dtype.kind == "f":
+                trace[attr] = np.round(values, decimals)
+        if trace.type == "scatter" and trace.x is not None and len(trace.x) >= webgl_min_points:
+            spec = trace.to_plotly_json()
+            spec.pop("type", None)
+            trace = go.Scattergl(spec, skip_invalid=True)
+        traces.append(trace)
+    fig.data = []
+    fig.add_traces(traces)
+    return fig
+
+
+def figure_to_json(fig, compact=CHART_COMPACT):
+    """차트를 캐시에 넣을 JSON 문자열로 직렬화 (compact면 compact_figure를 거침)"""
+    return (compact_figure(fig) if compact else fig).to_json()
+
+
+def figure_from_json(fig_json):
+    """
+    figure_to_json으로 만든 JSON을 Figure로 되돌리는 함수
+    이미 한 번 검증된 차트이므로 속성 검증을 건너뛴다 (검증이 복원 비용의 대부분).
+    """
+    return go.Figure(json.loads(fig_json), _validate=False)
+
+
+def build_category_figure(cube, chart_id, nm_1):
+    """업종 대분류 분석 페이지(01)의 차트 하나를 매출 큐브로 만드는 함수 (chart_id는 CATEGORY_CHART_IDS 중 하나)"""
+    # 1. 월별 총 매출 금액 추이 ->성수기,비수기 파악 ,시간 순서대로 연결되어 상승,하락 쉽게 식별 가능
+    if chart_id == "monthly":
+        monthly_sales = cube.aggregate(["month"], nm_1=nm_1)[["month", "amt"]]
+        return px.line(
+            monthly_sales,
+            x="month",
+            y="amt",
+            title="월별 총 매출 금액 추이",
+            labels={"month": "월", "amt": "매출 금액"},
+            markers=True
+        )
+
+    # 2. 성별 매출 비율 ->남성과 여성 소비비율 한번에 보여줌
+    if chart_id == "gender":
+        gender_sales = cube.aggregate(["sex"], nm_1=nm_1)[["sex", "amt"]]
+        return px.pie(
+            gender_sales,
+            values="amt",
+            names="sex",
+            title="성별 매출 비율",
+            color_discrete_map={'M': 'blue', 'F': 'pink'},
+            category_orders={"sex": ["M", "F"]}  # 색상 순서를 강제
+        )
+
+    # 3. 성별 및 연령대별 매출 집계 ->연령대별 성별에 따라 소비패턴 파악
+    if chart_id == "gender_age":
+        sales_by_gender_age = cube.aggregate(['sex', 'age'], nm_1=nm_1)[['sex', 'age', 'amt']]
+        return px.bar(
+            sales_by_gender_age,
+            x='age',
+            y='amt',
+            color='sex',
+            barmode='group',  # 그룹형 막대그래프
+            labels={'amt': '매출 금액', 'age': '연령대', 'sex': '성별'},
+            title='성별 & 연령대별 매출 비교',
+            color_discrete_map={'M': 'lightblue', 'F': 'lightpink'}  # 성별 색상 지정
+        )
+
+    # 4. 요일별 매출 및 소비 건수 집계 -> 서로 다른 두개의 데이터 비교 (이중 Y축)
+    if chart_id == "weekday":
+        weekday_data = (
+            cube.aggregate(["day"], nm_1=nm_1)
+            .rename(columns={"amt": "total_amount", "cnt": "total_count"})
+        )
+        weekday_data["day_name"] = weekday_data["day"].map(DAY_LABELS)
+
+        fig = go.Figure()
+        # 소비 금액 (첫 번째 Y축)
+        fig.add_trace(
+            go.Scatter(
+                x=weekday_data['day_name'],
+                y=weekday_data['total_amount'],
+                mode='lines+markers',
+                name='소비 금액',
+                line=dict(color='#1f77b4'),
+                marker=dict(size=8),
+                yaxis='y1'
+            )
+        )
+        # 소비 건수 (두 번째 Y축)
+        fig.add_trace(
+            go.Scatter(
+                x=weekday_data['day_name'],
+                y=weekday_data['total_count'],
+                mode='lines+markers',
+                name='소비 건수',
+                line=dict(color='#ff7f0e'),
+                marker=dict(size=8),
+                yaxis='y2'
+            )
+        )
+        fig.update_layout(
+            title="요일별 소비 패턴 분석",
+            xaxis=dict(title="요일"),
+            yaxis=dict(
+                title="소비 금액",
+                titlefont=dict(color='#1f77b4'),
+                tickfont=dict(color='#1f77b4')
+            ),
+            yaxis2=dict(
+                title="소비 건수",
+                titlefont=dict(color='#ff7f0e'),
+                tickfont=dict(color='#ff7f0e'),
+                overlaying='y',
+                side='right'
+            ),
+            legend=dict(title="항목", x=0.8, y=1.2),
+            template="plotly_white"
+        )
+        return fig
+
+    # 5. 시간대별 데이터 집계 (선과 막대) -> 서로 다른 두가지 데이터 비교
+    if chart_id == "hourly":
+        hourly_data = (
+            cube.aggregate(["hour"], nm_1=nm_1)
+            .rename(columns={"amt": "total_amount", "cnt": "total_count"})
+        )
+
+        fig = go.Figure()
+        # 소비 금액 (막대 그래프)
+        fig.add_trace(
+            go.Bar(
+                x=hourly_data['hour'],
+                y=hourly_data['total_amount'],
+                name='소비 금액',
+                marker_color='#008080',
+                yaxis='y1'
+            )
+        )
+        # 소비 건수 (라인 그래프)
+        fig.add_trace(
+            go.Scatter(
+                x=hourly_data['hour'],
+                y=hourly_data['total_count'],
+                name='소비 건수',
+                marker_color='#f4a261',
+                yaxis='y2',
+                mode='lines+markers'
+            )
+        )
+        fig.update_layout(
+            title="시간대별 소비 패턴 분석",
+            xaxis=dict(title="시간대"),
+            yaxis=dict(
+                title="소비 금액",
+                titlefont=dict(color='#008080'),
+                tickfont=dict(color='#008080'),
+            ),
+            yaxis2=dict(
+                title="소비 건수",
+                titlefont=dict(color='#f4a261'),
+                tickfont=dict(color='#f4a261'),
+                overlaying='y',
+                side='right'
+            ),
+            legend=dict(x=0.1, y=1.1, orientation="h"),
+            bargap=0.2,
+            template="plotly_white"
+        )
+        return fig
+
+    raise ValueError(f"알 수 없는 차트: {chart_id}")
+
+
+def build_subcategory_figure(cube, chart_id, nm_1, nm_2):
+    """업종 소분류 비교 페이지(02)의 차트 하나를 매출 큐브로 만드는 함수 (chart_id는 SUBCATEGORY_CHART_IDS 중 하나)"""
+    selected_filter = dict(nm_1=nm_1, nm_2=list(nm_2))
+
+    # 1. 월별 총 매출 금액 추이 비교
+    if chart_id == "monthly":
+        monthly_sales = cube.aggregate(['month', 'card_tpbuz_nm_2'], **selected_filter)
+        return px.line(
+            monthly_sales, x='year_month', y='amt', color='card_tpbuz_nm_2',
+            title="월별 매출 금액 추이",
+            labels={'year_month': '년-월', 'amt': '매출 금액', 'card_tpbuz_nm_2': '업종 소분류'}
+        )
+
+    # 2. 성별 매출 비율
+    if chart_id == "gender":
+        gender_sales = cube.aggregate(['sex', 'card_tpbuz_nm_2'], **selected_filter)
+        return px.pie(
+            gender_sales, names='sex', values='amt', color='sex',
+            facet_col='card_tpbuz_nm_2',
+            title="성별 매출 비율",
+            color_discrete_map={'M': 'blue', 'F': 'pink'}
+        )
+
+    # 3. 연령대별 매출 비율
+    if chart_id == "age":
+        age_sales = cube.aggregate(['age', 'card_tpbuz_nm_2'], **selected_filter)
+        age_sales['age_group'] = age_sales['age'].map(AGE_LABELS)
+        return px.pie(
+            age_sales,
+            names='age_group',
+            values='amt',
+            color='age_group',
+            title="연령대별 매출 비율",
+            facet_col='card_tpbuz_nm_2',
+            labels={'age_group': '연령대', 'amt': '매출 금액', 'card_tpbuz_nm_2': '업종 소분류'},
+        )
+
+    # 4. 시간대별 매출 비교
+    if chart_id == "hourly":
+        hourly_data = cube.aggregate(['hour', 'card_tpbuz_nm_2'], **selected_filter)
+        return px.bar(
+            hourly_data, x='hour', y='amt', color='card_tpbuz_nm_2',
+            title="시간대별 매출 비교",
+            labels={'hour': '시간대', 'amt': '매출 금액', 'card_tpbuz_nm_2': '업종 소분류'}
+        )
+
+    # 5. 요일별 매출 비교
+    if chart_id == "weekday":
+        weekday_sales = cube.aggregate(['day', 'card_tpbuz_nm_2'], **selected_filter)
+        weekday_sales['weekday'] = weekday_sales['day'].map(DAY_LABELS)
+        weekday_order = ['월', '화', '수', '목', '금', '토', '일']
+        weekday_sales['weekday'] = pd.Categorical(weekday_sales['weekday'], categories=weekday_order, ordered=True)
+        weekday_sales = weekday_sales.sort_values('weekday')
+        return px.bar(
+            weekday_sales, x='weekday', y='amt', color='weekday',
+            title="요일별 매출 비교",
+            labels={'weekday': '요일', 'amt': '매출 금액', 'card_tpbuz_nm_2': '업종 소분류'},
+            facet_col='card_tpbuz_nm_2'
+        )
+
+    raise ValueError(f"알 수 없는 차트: {chart_id}")
@@ -0,0 +1,343 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from metrics_utils import count
+
+
+# 큐브 축: 컬럼명 -> 값 목록 (업종 쌍 축은 데이터에 나온 (대분류, 소분류) 조합으로 따로 관리)
+DIMENSIONS = {
+    "month": list(range(1, 13)),
+    "day": list(range(1, 8)),
+    "hour": list(range(1, 11)),
+    "sex": ["M", "F"],
+    "age": list(range(1, 8)),
+}
+
+# 축 값을 읽어오는 컬럼 (수집 단계에서 만든 파생 컬럼, 없으면 축 이름과 같은 컬럼)
+DIMENSION_SOURCES = {"month": "month", "hour": "hour_band"}
+
+# 큐브에 합계로 쌓는 값과 타입 (rows는 원본 행 수, 평균 매출 계산용)
+# 표본 큐브는 scaled()로 전체 규모까지 곱하므로 모두 int64로 둠
+MEASURE_DTYPES = {"amt": np.int64, "cnt": np.int64, "rows": np.int64}
+MEASURES = tuple(MEASURE_DTYPES)
+
+CATEGORY_COLUMNS = ["card_tpbuz_nm_1", "card_tpbuz_nm_2"]
+
+_SHAPE = tuple(len(values) for values in DIMENSIONS.values())
+_CELLS = int(np.prod(_SHAPE))
+# 월(가장 바깥 축) 하나에 해당하는 칸 수
+_MONTH_CELLS = _CELLS // _SHAPE[0]
+
+
+def _dimension_codes(df):
+    """각 축의 값을 0부터 시작하는 위치로 바꾸고, 축 범위를 벗어난 행은 -1로 표시"""
+    codes = []
+    for col, values in DIMENSIONS.items():
+        series = df[DIMENSION_SOURCES.get(col, col)]
+        codes.append(pd.Index(values).get_indexer(np.asarray(series)).astype(np.int64))
+    return codes
+
+
+class CategoryIndex:
+    """
+    (대분류, 소분류) 순서로 늘어선 위치(큐브의 업종 쌍 축이나 정렬된 샘플의 행)에 대한 색인
+    대분류, (대분류, 소분류)를 위치 구간(slice)이나 위치 배열로 바로 찾아주고
+    정렬된 업종 목록도 미리 만들어 둔다. 찾는 비용은 전체 크기가 아니라 고른 구간 크기에 비례한다.
+    """
+
+    def __init__(self, nm_1, nm_2):
+        positions = pd.Series(np.arange(len(nm_1)))
+        keys = [np.asarray(nm_1, dtype=object), np.asarray(nm_2, dtype=object)]
+        self._pairs = {
+            key: self._compact(group.to_numpy())
+            for key, group in positions.groupby(keys, sort=True, dropna=True)
+        }
+        self._mains = {
+            key: self._compact(group.to_numpy())
+            for key, group in positions.groupby(keys[0], sort=True, dropna=True)
+        }
+        self._subs = {}
+        for main, sub in self._pairs:
+            self._subs.setdefault(main, []).append(sub)
+        self.size = len(nm_1)
+
+    @staticmethod
+    def _compact(positions):
+        """연속된 위치면 slice(복사 없이 자를 수 있음), 아니면 위치 배열 그대로"""
+        if len(positions) and positions[-1] - positions[0] + 1 == len(positions):
+            return slice(int(positions[0]), int(positions[-1]) + 1)
+        return positions
+
+    def main_categories(self):
+        """업종 대분류 목록 (정렬)"""
+        return list(self._mains)
+
+    def subcategories(self, nm_1):
+        """해당 대분류에 속하는 업종 소분류 목록 (정렬)"""
+        return list(self._subs.get(nm_1, []))
+
+    def locate(self, nm_1=None, nm_2=None):
+        """
+        고른 업종의 위치를 slice 또는 위치 배열로 돌려주는 함수
+        nm_1만 주면 대분류 전체, nm_2(하나 또는 목록)까지 주면 해당 소분류들만 찾는다.
+        """
+        if nm_2 is None:
+            if nm_1 is None:
+                return slice(0, self.size)
+            return self._mains.get(nm_1, slice(0, 0))
+
+        nm_2 = [nm_2] if isinstance(nm_2, str) else list(nm_2)
+        keys = [(nm_1, sub) for sub in nm_2] if nm_1 is not None else [
+            pair for pair in self._pairs if pair[1] in nm_2
+        ]
+        found = [self._pairs[key] for key in sorted(keys) if key in self._pairs]
+        if not found:
+            return slice(0, 0)
+        if len(found) == 1:
+            return found[0]
+        return np.concatenate([np.arange(f.start, f.stop) if isinstance(f, slice) else f for f in found])
+
+
+class CubeAccumulator:
+    """
+    카드 데이터 청크를 받는 대로 매출 큐브 합계를 제자리에서 더해 가는 누적기 (스레드 안전)
+    업종 쌍은 처음 나올 때 번호를 붙이고 모자라면 배열을 두 배로 늘리며,
+    월 축은 데이터에 나온 달만 잡으므로 한 달치 파일이면 달 하나 크기만 쓴다.
+    청크마다 큐브를 새로 만들지 않고, 다 더한 뒤 to_cube()로 SalesCube를 한 번만 만든다.
+    """
+
+    def __init__(self, year=2023, capacity=64):
+        self.year = year
+        self._pair_ids = {}  # (대분류, 소분류) -> 번호
+        self._capacity = capacity
+        self._months = {}  # 월 위치 -> {measure: ndarray (capacity, _MONTH_CELLS)}
+        self.dropped = 0  # 업종이 없거나 축 범위를 벗어나 더하지 않은 행 수
+        self._lock = threading.Lock()
+
+    def _ids(self, pairs):
+        """업종 쌍 목록의 번호 (처음 나온 쌍은 새 번호, 락을 잡고 호출)"""
+        ids = np.empty(len(pairs), dtype=np.int64)
+        for i, pair in enumerate(pairs):
+            ids[i] = self._pair_ids.setdefault(pair, len(self._pair_ids))
+        if len(self._pair_ids) > self._capacity:
+            capacity = max(len(self._pair_ids), self._capacity * 2)
+            for block in self._months.values():
+                for measure, arr in block.items():
+                    grown = np.zeros((capacity, _MONTH_CELLS), dtype=arr.dtype)
+                    grown[:self._capacity] = arr
+                    block[measure] = grown
+            self._capacity = capacity
+        return ids
+
+    def _block(self, month):
+        block = self._months.get(month)
+        if block is None:
+            block = self._months[month] = {
+                m: np.zeros((self._capacity, _MONTH_CELLS), dtype=dtype) for m, dtype in MEASURE_DTYPES.items()
+            }
+        return block
+
+    def add(self, df):
+        """
+        apply_card_schema를 거친 카드 데이터 DataFrame(청크)의 합계를 더함
+        업종이 없거나 축 범위를 벗어난 행(날짜/성별/연령대/시간대 이상)은 더하지 않고 dropped에 센다.
+        """
+        if df.empty:
+            return
+        total = len(df)
+        df = df.dropna(subset=CATEGORY_COLUMNS)
+        if df.empty:
+            self._drop(total)
+            return
+        pair_codes, pairs = pd.MultiIndex.from_arrays([df[col].astype(str) for col in CATEGORY_COLUMNS]).factorize()
+        codes = _dimension_codes(df)
+        valid = np.ones(len(df), dtype=bool)
+        for dim_codes in codes:
+            valid &= dim_codes >= 0
+        self._drop(total - int(valid.sum()))
+        # 월을 뺀 나머지 축의 1차원 위치
+        cells = np.zeros(int(valid.sum()), dtype=np.int64)
+        for dim_codes, size in zip(codes[1:], _SHAPE[1:]):
+            cells = cells * size + dim_codes[valid]
+        months = codes[0][valid]
+        values = {m: df[m].to_numpy(dtype=np.float64)[valid] for m in MEASURES if m != "rows"}
+
+        with self._lock:
+            flat = self._ids(list(pairs))[pair_codes[valid]] * _MONTH_CELLS + cells
+            length = len(self._pair_ids) * _MONTH_CELLS
+            present = np.unique(months)
+            for month in present:
+                # 한 달치 파일이면 보통 달이 하나뿐이라 행을 고르지 않음
+                rows = None if len(present) == 1 else months == month
+                month_flat = flat if rows is None else flat[rows]
+                block = self._block(int(month))
+                for measure in MEASURES:
+                    if measure == "rows":
+                        sums = np.bincount(month_flat, minlength=length)
+                    else:
+                        weights = values[measure] if rows is None else values[measure][rows]
+                        sums = np.rint(np.bincount(month_flat, weights=weights, minlength=length))
+                    target = block[measure][:len(self._pair_ids)]
+                    target += sums.astype(target.dtype).reshape(target.shape)
+
+    def _drop(self, n):
+        if n:
+            count("cube.dropped_rows", n)
+            with self._lock:
+                self.dropped += n
+
+    def update(self, other):
+        """다른 누적기(예: 다른 달)의 합계를 더함"""
+        with other._lock:
+            dropped = other.dropped
+            pairs = list(other._pair_ids)
+            blocks = {month: {m: arr[:len(pairs)] for m, arr in block.items()}
+                      for month, block in other._months.items()}
+        with self._lock:
+            self.dropped += dropped
+            ids = self._ids(pairs)
+            for month, block in blocks.items():
+                target = self._block(month)
+                for measure, arr in block.items():
+                    target[measure][ids] += arr
+
+    def to_cube(self):
+        """지금까지 더한 합계로 SalesCube를 만듦 (업종 쌍은 정렬)"""
+        with self._lock:
+            if not self._pair_ids:
+                return SalesCube.zero(self.year)
+            pairs = pd.MultiIndex.from_tuples(list(self._pair_ids), names=CATEGORY_COLUMNS)
+            order = pairs.argsort()
+            data = {m: np.zeros((len(pairs),) + _SHAPE, dtype=dtype) for m, dtype in MEASURE_DTYPES.items()}
+            for month, block in self._months.items():
+                for measure, arr in block.items():
+                    data[measure].reshape(len(pairs), _SHAPE[0], _MONTH_CELLS)[:, month] = arr[:len(pairs)][order]
+            return SalesCube(pairs[order], data, self.year)
+
+
+class SalesCube:
+    """
+    (대분류, 소분류) × 월 × 요일 × 시간대 × 성별 × 연령대별 amt/cnt/행 수 합계를 담는 조밀 큐브
+    원본 행을 다시 훑지 않고 축을 골라 합치는 것만으로 페이지의 집계를 만든다.
+    """
+
+    def __init__(self, pairs, data, year=2023):
+        self.pairs = pairs  # (대분류, 소분류) MultiIndex
+        self.data = data  # {measure: ndarray (업종 쌍 수, *_SHAPE)}
+        self.year = year
+        self._index = None
+
+    @classmethod
+    def zero(cls, year=2023):
+        """업종 쌍이 하나도 없는 빈 큐브"""
+        return cls(pd.MultiIndex.from_tuples([], names=CATEGORY_COLUMNS),
+                   {m: np.zeros((0,) + _SHAPE, dtype=dtype) for m, dtype in MEASURE_DTYPES.items()}, year)
+
+    @classmethod
+    def from_frame(cls, df, year=2023):
+        """apply_card_schema를 거친 카드 데이터 DataFrame으로 큐브를 만드는 함수 (청크를 이어 더할 때는 CubeAccumulator)"""
+        accumulator = CubeAccumulator(year)
+        accumulator.add(df)
+        return accumulator.to_cube()
+
+    @classmethod
+    def merge(cls, cubes, year=2023):
+        """여러 큐브(예: 월별/청크별)를 업종 쌍을 맞춰 더하는 함수"""
+        cubes = [cube for cube in cubes if len(cube.pairs)]
+        if not cubes:
+            return cls.zero(year)
+
+        pairs = cubes[0].pairs
+        for cube in cubes[1:]:
+            pairs = pairs.union(cube.pairs, sort=False)
+        pairs = pairs.sort_values()
+
+        data = {m: np.zeros((len(pairs),) + _SHAPE, dtype=dtype) for m, dtype in MEASURE_DTYPES.items()}
+        for cube in cubes:
+            positions = pairs.get_indexer(cube.pairs)  # 큐브 안에서 업종 쌍은 중복되지 않음
+            for measure in MEASURES:
+                data[measure][positions] += cube.data[measure]
+        return cls(pairs, data, year)
+
+    def scaled(self, factor):
+        """모든 합계에 factor를 곱한 큐브 (표본으로 만든 큐브를 전체 규모로 추정할 때 사용)"""
+        data = {
+            m: np.rint(self.data[m] * factor).astype(MEASURE_DTYPES[m]) for m in MEASURES
+        }
+        return SalesCube(self.pairs, data, self.year)
+
+    @property
+    def empty(self):
+        return len(self.pairs) == 0
+
+    @property
+    def nbytes(self):
+        return sum(arr.nbytes for arr in self.data.values())
+
+    @property
+    def index(self):
+        """업종 쌍 축의 CategoryIndex (처음 쓸 때 한 번만 만듦)"""
+        if self._index is None:
+            self._index = CategoryIndex(self.pairs.get_level_values(0), self.pairs.get_level_values(1))
+        return self._index
+
+    def main_categories(self):
+        """업종 대분류 목록 (정렬)"""
+        return self.index.main_categories()
+
+    def subcategories(self, nm_1):
+        """해당 대분류에 속하는 업종 소분류 목록 (정렬)"""
+        return self.index.subcategories(nm_1)
+
+    def aggregate(self, by=(), nm_1=None, nm_2=None):
+        """
+        by에 준 축별로 amt/cnt/rows 합계를 DataFrame으로 돌려주는 함수
+        by에는 DIMENSIONS의 축 이름과 card_tpbuz_nm_1/card_tpbuz_nm_2를 쓸 수 있고,
+        nm_1/nm_2(소분류는 목록도 가능)로 업종을 먼저 거른다. 행 수가 0인 칸은 빠진다.
+        by에 month가 있으면 '2023-01' 형식의 year_month 컬럼도 함께 돌려준다.
+        """
+        by = list(by)
+        selection = self.index.locate(nm_1, nm_2)
+        keep_pairs = any(col in CATEGORY_COLUMNS for col in by)
+        dim_names = list(DIMENSIONS)
+        sum_axes = tuple(1 + i for i, name in enumerate(dim_names) if name not in by)
+        if not keep_pairs:
+            sum_axes = (0,) + sum_axes
+
+        # 업종이 연속 구간이면 복사 없이 잘라서 합산
+        sums = {m: self.data[m][selection].sum(axis=sum_axes) for m in MEASURES}
+
+        levels, names = [], []
+        if keep_pairs:
+            levels.append(np.arange(len(self.pairs[selection])))
+            names.append("_pair")
+        for name in dim_names:
+            if name in by:
+                levels.append(DIMENSIONS[name])
+                names.append(name)
+        index = pd.MultiIndex.from_product(levels, names=names) if levels else pd.RangeIndex(1)
+
+        result = pd.DataFrame({m: np.ravel(sums[m]) for m in MEASURES}, index=index).reset_index()
+        result = result[result["rows"] > 0]
+        if keep_pairs:
+            selected = self.pairs[selection]
+            for level, col in enumerate(CATEGORY_COLUMNS):
+                result[col] = selected.get_level_values(level)[result["_pair"].to_numpy()]
+            result = result.drop(columns="_pair")
+            if not set(CATEGORY_COLUMNS) <= set(by):
+                # 대분류/소분류 중 하나만 요청했으면 그 기준으로 다시 합침
+                result = result.groupby(by, sort=True)[list(MEASURES)].sum().reset_index()
+        if "index" in result.columns:
+            result = result.drop(columns="index")
+        result = result[by + list(MEASURES)].reset_index(drop=True)
+        if "month" in by:
+            # 월 축에는 표시용 '연-월' 컬럼을 붙여 줌
+            result["year_month"] = [f"{self.year}-{month:02d}" for month in result["month"]]
+        return result
+
+    def total(self, nm_1=None, nm_2=None):
+        """선택한 업종의 amt/cnt/rows 전체 합계 (dict)"""
+        selection = self.index.locate(nm_1, nm_2)
+        return {m: int(self.data[m][selection].sum()) for m in MEASURES}
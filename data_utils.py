@@ -0,0 +1,845 @@
+import hashlib
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+
+from cube_utils import CubeAccumulator, SalesCube
+from dataset_utils import RegionDataset
+import http_utils
+from metrics_utils import count, span, timed_iter
+
+# .env 파일 로드
+load_dotenv()
+
+
+# 카드 데이터 버킷 주소 (로컬 디렉터리나 http://localhost:8000 같은 대체 버킷도 가능)
+DATA_BASE_URL = os.getenv(
+    "CARD_DATA_BASE_URL",
+    "https://woori-fisa-bucket.s3.ap-northeast-2.amazonaws.com/fisa04-card",
+)
+
+# 한글 지역명과 URL에 사용될 영문명을 매핑한 딕셔너리
+REGION_MAPPING = {
+    "포천시": "pochun",
+#     "수원시": "suwon",
+#     '광명시' : 'kwangmyeong',
+# '부천시':'bucheon',
+
+# '시흥시' : 'siheung',
+# '안산시' : 'ansan',
+# '용인시' : 'yongin',
+# '포천시' : 'pochun',
+# '하남시' : 'hanam',
+# '화성시' : 'hwasung'
+}
+
+# 데이터 연도(기본값, 함수마다 year 인자로 바꿀 수 있음)와 월별 파일명 템플릿
+YEAR = int(os.getenv("CARD_DATA_YEAR", 2023))
+FILE_NAME_TEMPLATE = "tbsh_gyeonggi_day_{year}{month:02d}_{region}.csv"
+
+MONTHS = range(1, 13)
+
+# 한 번에 읽어 들이는 행 수 (메모리 사용량은 대략 이 크기 + 샘플 크기에 비례)
+CHUNK_SIZE = 100_000
+
+# CSV를 Arrow 리더로 파싱할 때 한 번에 읽는 블록 크기 (바이트, 블록 안은 여러 스레드가 나눠 파싱)
+CSV_BLOCK_BYTES = 8 * 1024 ** 2
+
+# 단계별 로딩 해상도 (원본 대비 읽는 비율, 1.0은 전체 데이터)
+RESOLUTIONS = (0.001, 0.01, 1.0)
+
+# 미리보기 단계에서 무작위 위치로 읽는 블록 크기 (바이트)
+BLOCK_BYTES = 256 * 1024
+
+# 월별 Parquet 캐시 위치 (빈 문자열이면 캐시 사용 안 함)
+CACHE_DIR = os.getenv("CARD_CACHE_DIR", os.path.join(".cache", "card_data"))
+
+# 원격 원본의 최신 여부를 다시 확인하기까지의 시간(초). 그 전에는 네트워크 없이 캐시를 그대로 사용
+CACHE_REVALIDATE_SECONDS = int(os.getenv("CARD_CACHE_REVALIDATE_SECONDS", 24 * 60 * 60))
+
+# 원격 원본을 내려받는 임시 위치 (받다 만 파일도 여기 남겨 두었다가 다시 시도할 때 이어 받음)
+DOWNLOAD_DIR = os.getenv("CARD_DOWNLOAD_DIR", os.path.join(tempfile.gettempdir(), "card_downloads"))
+
+# 캐시에 저장할 때 고정하는 컬럼 타입 (나머지 컬럼은 원본에서 추론한 타입 유지)
+CARD_SCHEMA = pa.schema([
+    ("ta_ymd", pa.int64()),
+    ("card_tpbuz_nm_1", pa.string()),
+    ("card_tpbuz_nm_2", pa.string()),
+    ("sex", pa.string()),
+    ("age", pa.int64()),
+    ("day", pa.int64()),
+    ("hour", pa.int64()),
+    ("amt", pa.int64()),
+    ("cnt", pa.int64()),
+])
+
+
+# 페이지가 쓰는 컬럼 (기본으로 이 컬럼만 읽음, 큐브를 만들려면 모두 필요)
+CARD_COLUMNS = CARD_SCHEMA.names
+
+# CSV를 파싱할 때 지정하는 컬럼 타입 (타입 추론을 건너뛰고, 문자열은 사전 인코딩해서 범주형으로 바로 바꿈)
+CSV_COLUMN_TYPES = {
+    field.name: pa.dictionary(pa.int32(), pa.string()) if pa.types.is_string(field.type) else field.type
+    for field in CARD_SCHEMA
+}
+
+# 메모리에 올릴 때 적용하는 컬럼 타입 (업종명/성별은 범주형, 연령대/요일/시간대는 int8)
+CARD_DTYPES = {
+    "card_tpbuz_nm_1": "category",
+    "card_tpbuz_nm_2": "category",
+    "sex": "category",
+    "age": "int8",
+    "day": "int8",
+    "hour": "int8",
+}
+
+# 값 범위에 맞춰 가장 작은 정수 타입으로 줄이는 컬럼
+DOWNCAST_COLUMNS = ["amt", "cnt"]
+
+# 시간대 코드 (hour 컬럼 1~10)
+HOUR_BANDS = range(1, 11)
+
+
+def parse_ymd(values):
+    """
+    20230105 형식의 날짜(정수/실수/문자열)를 datetime64로 바꾸는 함수 (없거나 잘못된 값은 NaT)
+    결측값이 섞인 정수 컬럼은 float64로 들어오므로('20230105.0') 문자열로 바로 바꾸지 않고
+    숫자로 읽은 뒤 값이 있는 행만 변환한다.
+    """
+    numbers = pd.to_numeric(values, errors="coerce")
+    dates = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]", name=values.name)
+    valid = numbers.notna().to_numpy()
+    if valid.any():
+        text = numbers[valid].astype(np.int64).astype(str)
+        dates[valid] = pd.to_datetime(text, format="%Y%m%d", errors="coerce")
+    return dates
+
+
+def apply_card_schema(df):
+    """
+    카드 데이터에 CARD_DTYPES를 적용하는 함수
+    ta_ymd는 날짜(datetime64)로, amt/cnt는 값이 들어가는 가장 작은 정수 타입으로 바꾸고
+    add_time_columns로 시간 파생 컬럼을 한 번에 만들어 둔다.
+    """
+    df = df.copy()
+    if "ta_ymd" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["ta_ymd"]):
+        df["ta_ymd"] = parse_ymd(df["ta_ymd"])
+    for col, dtype in CARD_DTYPES.items():
+        if col not in df.columns:
+            continue
+        if dtype == "int8" and df[col].isna().any():
+            dtype = "Int8"  # 결측값이 있으면 nullable 정수
+        df[col] = df[col].astype(dtype)
+    for col in DOWNCAST_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    return add_time_columns(df)
+
+
+def add_time_columns(df):
+    """
+    날짜(ta_ymd)와 시간대(hour)에서 매출 큐브가 쓰는 파생 컬럼을 만드는 함수 (df를 직접 바꿈)
+      - month: 월 (int8, 날짜가 없는 행은 0)
+      - hour_band: 시간대 코드 (int8, 1~10, 범위 밖이면 0)
+    연-월 표시와 요일은 큐브(aggregate의 year_month, day 축)가 맡으므로 행마다 만들지 않는다.
+    """
+    if "ta_ymd" in df.columns:
+        df["month"] = df["ta_ymd"].dt.month.fillna(0).to_numpy(dtype=np.int64).astype(np.int8)
+
+    if "hour" in df.columns:
+        hours = pd.to_numeric(df["hour"], errors="coerce")
+        df["hour_band"] = hours.where(hours.isin(HOUR_BANDS), 0).fillna(0).astype(np.int8)
+    return df
+
+
+def concat_card_frames(frames):
+    """
+    apply_card_schema를 거친 DataFrame들을 하나로 합치는 함수
+    범주형 컬럼은 범주를 합치고(정렬) 맞춘 뒤 병합해서 범주형을 유지한다.
+    """
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        return pd.DataFrame()
+
+    for col in frames[0].columns:
+        if not isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            continue
+        categories = pd.api.types.union_categoricals(
+            [df[col] for df in frames], sort_categories=True
+        ).categories
+        frames = [df.assign(**{col: df[col].cat.set_categories(categories)}) for df in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def month_file_url(region, month, base_url=DATA_BASE_URL, year=YEAR):
+    """지역/연월에 해당하는 CSV 파일 경로(URL 또는 로컬 경로)를 만드는 함수"""
+    file_name = FILE_NAME_TEMPLATE.format(year=year, month=month, region=region)
+    if "://" in base_url:
+        return f"{base_url.rstrip('/')}/{file_name}"
+    return os.path.join(base_url, file_name)
+
+
+def download_source(path, timeout=30, progress=None, validator=None):
+    """
+    URL이면 임시 파일로 스트리밍해서 내려받고(http_utils 연결 풀, 압축 전송, 이어 받기), 로컬 경로면 그대로 쓰는 함수
+    progress(LoadProgress)를 주면 내려받은 바이트 수를 그때그때 더한다.
+    validator(캐시에 저장된 원본 검증 정보)를 주면 조건부 GET으로 보내 원본이 그대로면 받지 않고 None을 돌려준다.
+    반환값: (로컬 경로, 원본 검증 정보 dict, 임시 파일 여부), 원본이 그대로면 None
+    """
+    if "://" not in path:
+        current = _file_validator(path)
+        if validator is not None and http_utils.same_version(validator, current):
+            return None
+        if progress is not None:
+            progress.add(bytes_read=current["size"])
+        return path, current, False
+
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix=".csv", dir=DOWNLOAD_DIR)
+    os.close(fd)
+    on_bytes = (lambda n: progress.add(bytes_read=n)) if progress is not None else None
+    try:
+        current = http_utils.download(path, tmp_path, validator, timeout, on_bytes,
+                                      part_path=http_utils.partial_path(path, DOWNLOAD_DIR))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    if current is None:
+        os.remove(tmp_path)
+        return None
+    return tmp_path, current, True
+
+
+def _file_validator(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def source_validator(path, timeout=30, validator=None):
+    """
+    원본을 내려받지 않고 현재 검증 정보만 가져오는 함수 (URL이면 HEAD 요청)
+    validator를 주면 조건부 요청으로 보내, 바뀌지 않았으면 validator를 그대로 돌려받는다.
+    """
+    if "://" in path:
+        return http_utils.head(path, validator, timeout)
+    return _file_validator(path)
+
+
+def _cache_paths(cache_dir, region, month, year=YEAR):
+    base = os.path.join(cache_dir, f"{region}_{year}{month:02d}")
+    return base + ".parquet", base + ".json"
+
+
+def _apply_cache_schema(schema):
+    """CARD_SCHEMA에 정의된 컬럼만 지정한 타입으로 바꾼 스키마를 반환"""
+    return pa.schema([
+        CARD_SCHEMA.field(field.name) if field.name in CARD_SCHEMA.names else field
+        for field in schema
+    ])
+
+
+def _read_cache_meta(region, month, source_path, cache_dir, year=YEAR):
+    """이 원본으로 만든 Parquet 캐시가 있으면 (Parquet 경로, 메타 정보), 없으면 (None, None)"""
+    parquet_path, meta_path = _cache_paths(cache_dir, region, month, year)
+    if not (os.path.exists(parquet_path) and os.path.exists(meta_path)):
+        return None, None
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("source") != source_path:
+        return None, None
+    return parquet_path, meta
+
+
+def _needs_revalidation(source_path, meta):
+    """로컬 원본은 항상(stat 한 번), 원격 원본은 마지막 확인 후 CACHE_REVALIDATE_SECONDS가 지났을 때만 확인"""
+    return "://" not in source_path or time.time() - meta.get("checked_at", 0) > CACHE_REVALIDATE_SECONDS
+
+
+def _mark_checked(region, month, meta, cache_dir, year=YEAR):
+    """원격 원본이 그대로임을 확인한 시각을 캐시 메타 정보에 남김"""
+    meta["checked_at"] = time.time()
+    _write_json_atomic(_cache_paths(cache_dir, region, month, year)[1], meta)
+
+
+def cached_month_path(region, month, source_path, cache_dir=CACHE_DIR, timeout=30, year=YEAR):
+    """
+    캐시된 Parquet이 원본과 같으면 그 경로를, 없거나 오래됐으면 None을 반환
+    마지막 확인 후 CACHE_REVALIDATE_SECONDS가 지나지 않았으면 원격 원본은 확인하지 않고,
+    지났으면 조건부 HEAD 요청으로 확인한다.
+    """
+    parquet_path, meta = _read_cache_meta(region, month, source_path, cache_dir, year)
+    if parquet_path is None:
+        return None
+
+    if _needs_revalidation(source_path, meta):
+        try:
+            current = source_validator(source_path, timeout=timeout, validator=meta["validator"])
+        except Exception:
+            # 원본 확인이 안 되면(오프라인 등) 캐시를 그대로 사용
+            current = meta["validator"]
+        if not http_utils.same_version(meta["validator"], current):
+            return None
+        if "://" in source_path:
+            _mark_checked(region, month, meta, cache_dir, year)
+
+    return parquet_path
+
+
+def _write_json_atomic(path, obj):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+    os.replace(tmp_path, path)
+
+
+def _csv_header(path):
+    with open(path, encoding="utf-8-sig") as f:
+        return f.readline().rstrip("\r\n").split(",")
+
+
+def iter_csv_batches(source, columns=None, block_bytes=CSV_BLOCK_BYTES):
+    """
+    CSV(파일 경로나 바이트)를 Arrow 멀티스레드 리더로 블록씩 파싱해 RecordBatch로 돌려주는 제너레이터
+    CARD_SCHEMA 컬럼은 CSV_COLUMN_TYPES로 타입을 정해 두고, 빈 문자열은 pandas처럼 결측값으로 읽는다.
+    columns를 주면 그 컬럼만 파싱한다 (파일에 없는 컬럼은 무시).
+    """
+    if isinstance(source, bytes):
+        header = source.split(b"\n", 1)[0].decode("utf-8-sig").rstrip("\r").split(",")
+        source = pa.BufferReader(source)
+    else:
+        header = _csv_header(source)
+    include = None if columns is None else [col for col in header if col in set(columns)]
+    reader = pa_csv.open_csv(
+        source,
+        read_options=pa_csv.ReadOptions(use_threads=True, block_size=block_bytes),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={col: t for col, t in CSV_COLUMN_TYPES.items() if col in header},
+            strings_can_be_null=True,
+            include_columns=include,
+        ),
+    )
+    for batch in reader:
+        if batch.num_rows:
+            yield batch
+
+
+def batch_to_frame(batch):
+    """RecordBatch를 DataFrame으로 (컬럼마다 따로 두어 숫자 컬럼은 복사 없이, 사전 인코딩 컬럼은 범주형으로)"""
+    return batch.to_pandas(split_blocks=True)
+
+
+class _ParquetCacheWriter:
+    """CSV에서 파싱한 RecordBatch를 받는 대로 Parquet 캐시에 이어 쓰고, 끝까지 쓴 경우에만 캐시로 확정"""
+
+    def __init__(self, region, month, source_path, validator, cache_dir, year=YEAR):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.parquet_path, self.meta_path = _cache_paths(cache_dir, region, month, year)
+        self.tmp_path = f"{self.parquet_path}.{os.getpid()}.{id(self)}.tmp"
+        self.meta = {"source": source_path, "validator": validator}
+        self.writer = None
+        self.failed = False
+
+    def write(self, batch):
+        if self.failed:
+            return
+        try:
+            table = pa.Table.from_batches([batch])
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.tmp_path, _apply_cache_schema(table.schema))
+            self.writer.write_table(table.cast(self.writer.schema))
+        except Exception:
+            # 캐시 저장 실패는 데이터 로드에 영향 주지 않음
+            self.failed = True
+
+    def close(self, completed):
+        if self.writer is not None:
+            self.writer.close()
+        if completed and not self.failed and self.writer is not None:
+            os.replace(self.tmp_path, self.parquet_path)
+            _write_json_atomic(self.meta_path, {**self.meta, "checked_at": time.time()})
+        elif os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def months_in_range(date_range, months=MONTHS, year=YEAR):
+    """date_range(시작일, 종료일, 양 끝 포함)와 겹치는 달만 남긴 목록 (date_range가 None이면 months 그대로)"""
+    months = list(months)
+    if date_range is None:
+        return months
+    start, end = (pd.Timestamp(date) for date in date_range)
+    return [
+        month for month in months
+        if pd.Timestamp(year, month, 1) <= end and pd.Timestamp(year, month, 1) + pd.offsets.MonthEnd(0) >= start
+    ]
+
+
+def _date_bounds(date_range):
+    """date_range를 ta_ymd와 비교할 수 있는 (YYYYMMDD, YYYYMMDD) 정수로 바꿈"""
+    start, end = (pd.Timestamp(date) for date in date_range)
+    return int(start.strftime("%Y%m%d")), int(end.strftime("%Y%m%d"))
+
+
+def _as_list(values):
+    return [values] if isinstance(values, str) else list(values)
+
+
+def _row_filter_expression(date_range=None, nm_1=None, nm_2=None):
+    """Parquet 캐시를 읽을 때 넘기는 행 필터 (행 그룹 통계로 필요 없는 행 그룹은 읽지 않음)"""
+    conditions = []
+    if date_range is not None:
+        start, end = _date_bounds(date_range)
+        conditions.append((pc.field("ta_ymd") >= start) & (pc.field("ta_ymd") <= end))
+    if nm_1 is not None:
+        conditions.append(pc.field("card_tpbuz_nm_1").isin(_as_list(nm_1)))
+    if nm_2 is not None:
+        conditions.append(pc.field("card_tpbuz_nm_2").isin(_as_list(nm_2)))
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _filter_columns(date_range=None, nm_1=None, nm_2=None):
+    """행 조건에 쓰이는 컬럼 이름"""
+    used = {"ta_ymd": date_range, "card_tpbuz_nm_1": nm_1, "card_tpbuz_nm_2": nm_2}
+    return {col for col, value in used.items() if value is not None}
+
+
+def filter_rows(df, date_range=None, nm_1=None, nm_2=None):
+    """CSV에서 읽은 원본 청크에 _row_filter_expression과 같은 조건을 적용하는 함수"""
+    if date_range is None and nm_1 is None and nm_2 is None:
+        return df
+    keep = np.ones(len(df), dtype=bool)
+    if date_range is not None:
+        start, end = _date_bounds(date_range)
+        dates = pd.to_numeric(df["ta_ymd"], errors="coerce")
+        keep &= ((dates >= start) & (dates <= end)).to_numpy()
+    if nm_1 is not None:
+        keep &= df["card_tpbuz_nm_1"].isin(_as_list(nm_1)).to_numpy()
+    if nm_2 is not None:
+        keep &= df["card_tpbuz_nm_2"].isin(_as_list(nm_2)).to_numpy()
+    return df[keep]
+
+
+def _select_columns(df, columns):
+    if columns is None:
+        return df
+    return df[[col for col in columns if col in df.columns]]
+
+
+class LoadProgress:
+    """여러 스레드가 함께 갱신하는 로딩 진행 상황 (끝난 달 수, 읽은 바이트 수, 처리한 행 수)"""
+
+    def __init__(self, months_total=len(MONTHS)):
+        self.months_total = months_total
+        self.months_done = 0
+        self.bytes_read = 0
+        self.rows_parsed = 0
+        self._lock = threading.Lock()
+
+    def add(self, months_done=0, bytes_read=0, rows_parsed=0):
+        with self._lock:
+            self.months_done += months_done
+            self.bytes_read += bytes_read
+            self.rows_parsed += rows_parsed
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "months_total": self.months_total,
+                "months_done": self.months_done,
+                "bytes_read": self.bytes_read,
+                "rows_parsed": self.rows_parsed,
+            }
+
+
+def _download_with_retries(path, timeout, retries, backoff, progress, validator=None):
+    """download_source를 retries 횟수만큼 재시도 (원격 원본은 받은 데까지 이어 받음)"""
+    for attempt in range(retries + 1):
+        try:
+            return download_source(path, timeout=timeout, progress=progress, validator=validator)
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * (2 ** attempt))
+
+
+def iter_month_chunks(region, month, base_url=DATA_BASE_URL, timeout=30, retries=2, backoff=0.5,
+                      cache_dir=CACHE_DIR, chunksize=CHUNK_SIZE, progress=None, year=YEAR,
+                      columns=CARD_COLUMNS, date_range=None, nm_1=None, nm_2=None):
+    """
+    한 달치 데이터를 청크(캐시는 chunksize 행, CSV는 CSV_BLOCK_BYTES 블록)씩 DataFrame으로 돌려주는 제너레이터
+    최신 Parquet 캐시가 있으면 CSV 파싱 없이 캐시를 읽고, 없으면 CSV를 Arrow 리더로 파싱하면서 캐시를 채운다.
+    내려받기는 retries 횟수만큼 재시도하고, 끝내 실패하면 마지막 예외를 그대로 올린다.
+    progress(LoadProgress)를 주면 읽은 바이트/행 수와 끝난 달 수를 기록한다.
+
+    columns(None이면 전체), date_range(시작일, 종료일), nm_1/nm_2(업종, 값 하나나 목록)로 읽을 범위를 줄인다.
+    캐시를 읽을 때는 필요한 컬럼만 읽고 행 그룹 통계로 범위 밖의 행 그룹을 건너뛴다.
+    CSV는 캐시를 채우지 않을 때만 필요한 컬럼만 파싱하고, 캐시는 항상 전체 데이터로 채운다.
+    """
+    path = month_file_url(region, month, base_url, year)
+    expression = _row_filter_expression(date_range, nm_1, nm_2)
+    parquet_path, meta, source = None, None, None
+    if cache_dir:
+        try:
+            parquet_path, meta = _read_cache_meta(region, month, path, cache_dir, year)
+        except Exception:
+            parquet_path = None  # 캐시가 깨졌으면 새로 받기
+        if parquet_path is not None and _needs_revalidation(path, meta):
+            # 조건부 GET 한 번으로 확인: 그대로면(304) 캐시 사용, 바뀌었으면 받은 새 원본을 바로 읽음
+            try:
+                source = _download_with_retries(path, timeout, retries, backoff, progress, meta["validator"])
+            except Exception:
+                source = None  # 원본 확인이 안 되면(오프라인 등) 캐시를 그대로 사용
+            else:
+                if source is None and "://" in path:
+                    _mark_checked(region, month, meta, cache_dir, year)
+            if source is not None:
+                parquet_path = None
+        count("parquet_cache.miss" if parquet_path is None else "parquet_cache.hit")
+        if parquet_path is not None:
+            if progress is not None:
+                progress.add(bytes_read=os.path.getsize(parquet_path))
+            dataset = ds.dataset(parquet_path, format="parquet")
+            if columns is not None:
+                columns = [col for col in columns if col in dataset.schema.names]
+            for batch in dataset.to_batches(columns=columns, filter=expression, batch_size=chunksize):
+                if progress is not None:
+                    progress.add(rows_parsed=batch.num_rows)
+                if batch.num_rows:
+                    yield batch_to_frame(batch)
+            if progress is not None:
+                progress.add(months_done=1)
+            return
+
+    if source is None:
+        source = _download_with_retries(path, timeout, retries, backoff, progress)
+    local_path, validator, is_temp = source
+
+    cache_writer = _ParquetCacheWriter(region, month, path, validator, cache_dir, year) if cache_dir else None
+    parse_columns = None
+    if columns is not None and cache_writer is None:
+        # 필요한 컬럼(조건에 쓰는 컬럼 포함)만 파싱
+        parse_columns = set(columns) | _filter_columns(date_range, nm_1, nm_2)
+    completed = False
+    try:
+        for batch in iter_csv_batches(local_path, parse_columns):
+            if cache_writer is not None:
+                cache_writer.write(batch)
+            if progress is not None:
+                progress.add(rows_parsed=batch.num_rows)
+            chunk = _select_columns(filter_rows(batch_to_frame(batch), date_range, nm_1, nm_2), columns)
+            if len(chunk):
+                yield chunk
+        completed = True
+        if progress is not None:
+            progress.add(months_done=1)
+    finally:
+        if cache_writer is not None:
+            cache_writer.close(completed)
+        if is_temp:
+            os.remove(local_path)
+
+
+def _cube_columns(columns):
+    """큐브를 만들 때 읽을 컬럼 (CARD_COLUMNS는 항상 포함, None이면 전체)"""
+    return None if columns is None else list(dict.fromkeys([*CARD_COLUMNS, *columns]))
+
+
+def ingest_month(region, month, sample_frac, seed=42, year=YEAR, columns=CARD_COLUMNS, **kwargs):
+    """
+    한 달치 데이터를 한 번만 훑으면서 샘플과 매출 큐브를 함께 만드는 함수
+    샘플은 각 행을 sample_frac 확률로 뽑고(난수는 (seed, month)로 고정해 스레드 순서나 캐시 사용과 관계없이 같은 행),
+    큐브에는 전체 행(필터를 줬으면 조건에 맞는 행)이 합산된다.
+    큐브 합계는 청크마다 큐브를 새로 만들지 않고 달 하나짜리 누적기에 제자리에서 더한다.
+    반환값: (샘플 DataFrame, CubeAccumulator)
+    """
+    rng = np.random.default_rng([seed, month])
+    samples, cube = [], CubeAccumulator(year)
+    # 읽기(내려받기/CSV 파싱 또는 캐시 읽기)를 기다린 시간은 read, 달 전체는 ingest_month로 기록
+    chunks = timed_iter("read", iter_month_chunks(region, month, year=year, columns=_cube_columns(columns), **kwargs),
+                        region=region, month=month)
+    with span("ingest_month", region=region, month=month):
+        for chunk in chunks:
+            keep = rng.random(len(chunk)) < sample_frac
+            chunk = apply_card_schema(chunk)
+            samples.append(chunk[keep])
+            cube.add(chunk)
+        return concat_card_frames(samples), cube
+
+
+def map_region_months(func, region, months=MONTHS, max_workers=12, **kwargs):
+    """
+    func(region, month, **kwargs)를 여러 달에 대해 스레드 풀로 동시에 실행하는 함수
+    kwargs에 date_range가 있으면 그 기간과 겹치지 않는 달은 읽지 않는다.
+
+    반환값: (results, failed)
+      - results: {월: func 결과} (성공한 달만, 월 순서대로)
+      - failed: {월: 에러 메시지}
+    """
+    months = months_in_range(kwargs.get("date_range"), months, kwargs.get("year", YEAR))
+    results, failed = {}, {}
+    if not months:
+        return results, failed
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(months))) as executor:
+        futures = {month: executor.submit(func, region, month, **kwargs) for month in months}
+        for month, future in futures.items():
+            try:
+                results[month] = future.result()
+            except Exception as e:
+                failed[month] = f"{type(e).__name__}: {e}"
+
+    return results, failed
+
+
+def ingest_region(region, months=MONTHS, max_workers=12, sample_frac=0.01, seed=42, year=YEAR, **kwargs):
+    """
+    지역의 여러 달을 동시에 읽어 샘플 DataFrame과 전체 데이터 매출 큐브를 만드는 함수
+    반환값: (샘플 DataFrame, SalesCube, {실패한 월: 에러 메시지})
+    """
+    with span("ingest_region", region=region):
+        results, failed = map_region_months(ingest_month, region, months, max_workers,
+                                            sample_frac=sample_frac, seed=seed, year=year, **kwargs)
+        with span("concat", region=region):
+            sample = concat_card_frames(sample for sample, _ in results.values())
+        with span("cube_merge", region=region):
+            # 성공한 달의 누적기만 합쳐서 조밀 큐브는 지역마다 한 번만 만듦
+            accumulator = CubeAccumulator(year)
+            for _, month_cube in results.values():
+                accumulator.update(month_cube)
+            cube = accumulator.to_cube()
+    return sample, cube, failed
+
+
+def read_range(path, start, length, timeout=30):
+    """원본의 start 위치부터 length 바이트만 읽는 함수 (URL이면 연결 풀에서 Range 요청)"""
+    if "://" in path:
+        return http_utils.read_range(path, start, length, timeout)
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(length)
+
+
+def month_file_size(region, month, base_url=DATA_BASE_URL, timeout=30, year=YEAR, **_):
+    """월 파일 크기 (바이트, URL이면 HEAD 요청)"""
+    return int(source_validator(month_file_url(region, month, base_url, year), timeout=timeout)["size"])
+
+
+def block_count(size, frac, block_bytes=BLOCK_BYTES):
+    """크기가 size인 파일에서 frac 비율의 블록 표본을 만들 때 읽는 블록 수"""
+    n_slots = math.ceil(size / block_bytes)
+    return min(n_slots, max(1, math.ceil(frac * size / block_bytes)))
+
+
+def _empty_card_frame(columns=None):
+    """행이 없는 카드 데이터 DataFrame (컬럼과 타입은 CARD_SCHEMA)"""
+    return _select_columns(CARD_SCHEMA.empty_table().to_pandas(), columns)
+
+
+def sample_month_blocks(region, month, frac, seed=42, block_bytes=BLOCK_BYTES,
+                        base_url=DATA_BASE_URL, timeout=30, year=YEAR, columns=CARD_COLUMNS,
+                        date_range=None, nm_1=None, nm_2=None, sizes=None, **_):
+    """
+    월 파일의 무작위 위치에서 block_bytes씩, 전체의 frac 비율만큼만 읽어 만든 블록 표본
+    파일 전체를 받지 않으므로 읽는 양과 시간이 frac에 비례한다. 블록 양 끝의 잘린 줄은 버린다.
+    컬럼/기간/업종 조건은 iter_month_chunks와 같다 (배율은 조건을 거르기 전 표본 기준이라 그대로 맞음).
+    sizes({월: 파일 크기})에 이 달이 있으면 크기를 다시 묻지 않는다.
+    반환값: (표본 DataFrame, 전체 규모로 추정하기 위한 배율), 데이터 줄이 없으면 빈 DataFrame(CARD_SCHEMA)
+    """
+    path = month_file_url(region, month, base_url, year)
+    size = (sizes or {}).get(month)
+    if size is None:
+        size = month_file_size(region, month, base_url, timeout, year)
+    header = read_range(path, 0, min(size, 64 * 1024), timeout).split(b"\n", 1)[0] + b"\n"
+
+    n_slots = math.ceil(size / block_bytes)
+    n_blocks = block_count(size, frac, block_bytes)
+    rng = np.random.default_rng([seed, month])
+    starts = sorted(rng.choice(n_slots, n_blocks, replace=False) * block_bytes)
+
+    lines = []
+    for start in starts:
+        block = read_range(path, int(start), block_bytes, timeout)
+        block_lines = block.split(b"\n")
+        # 앞쪽 줄은 헤더(파일 시작)이거나 잘린 줄, 뒤쪽 줄은 파일 끝이 아니면 잘린 줄
+        block_lines = block_lines[1:] if start + len(block) >= size else block_lines[1:-1]
+        lines.extend(line for line in block_lines if line.strip())
+
+    if not lines:
+        return _empty_card_frame(columns), 1.0
+    body = b"\n".join(lines) + b"\n"
+    parse_columns = None if columns is None else set(columns) | _filter_columns(date_range, nm_1, nm_2)
+    df = concat_card_frames(batch_to_frame(batch) for batch in iter_csv_batches(header + body, parse_columns))
+    if df.empty:
+        return _empty_card_frame(columns), 1.0
+    df = _select_columns(filter_rows(df, date_range, nm_1, nm_2), columns)
+    return df, (size - len(header)) / len(body)
+
+
+def ingest_region_blocks(region, frac, months=MONTHS, max_workers=12, seed=42, year=YEAR,
+                         columns=CARD_COLUMNS, **kwargs):
+    """
+    블록 표본으로 지역 데이터를 빠르게 추정하는 함수 (단계별 로딩의 미리보기 단계)
+    반환값: ingest_region과 같은 (표본 DataFrame, 전체 규모로 늘린 SalesCube, 실패 목록)
+    """
+    with span("ingest_region_blocks", region=region, frac=frac):
+        results, failed = map_region_months(sample_month_blocks, region, months, max_workers, frac=frac,
+                                            seed=seed, year=year, columns=_cube_columns(columns), **kwargs)
+        samples, cubes = [], []
+        for df, scale in results.values():
+            if df.empty:
+                continue  # 데이터 줄이 없는 달
+            df = apply_card_schema(df)
+            samples.append(df)
+            cubes.append(SalesCube.from_frame(df, year).scaled(scale))
+        return concat_card_frames(samples), SalesCube.merge(cubes, year), failed
+
+
+def region_cache_is_warm(region, months=MONTHS, base_url=DATA_BASE_URL, cache_dir=CACHE_DIR, year=YEAR):
+    """모든 달의 Parquet 캐시가 최신이면 True (이때는 전체 데이터도 빠르게 읽힘)"""
+    return region_data_version(region, months, base_url, cache_dir, year) is not None
+
+
+def region_data_version(region, months=MONTHS, base_url=DATA_BASE_URL, cache_dir=CACHE_DIR, year=YEAR):
+    """
+    지역 원본 데이터의 버전 (월별 원본 검증 정보의 해시)
+    모든 달의 Parquet 캐시가 최신일 때만 알 수 있으며, 아니면 None을 반환한다.
+    """
+    if not cache_dir:
+        return None
+    validators = []
+    try:
+        for month in months:
+            source_path = month_file_url(region, month, base_url, year)
+            if cached_month_path(region, month, source_path, cache_dir, year=year) is None:
+                return None
+            _, meta = _read_cache_meta(region, month, source_path, cache_dir, year)
+            validators.append([month, source_path, meta["validator"]])
+    except Exception:
+        return None
+    text = json.dumps([region, year, validators], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class ProgressiveLoad:
+    """
+    백그라운드 스레드에서 해상도를 올려가며 (RESOLUTIONS 순서) 지역 데이터를 만드는 작업
+    각 단계가 끝날 때마다 latest(RegionDataset)가 바뀌고,
+    전체 데이터 단계가 끝나면 on_complete(RegionDataset)를 호출한다.
+    Parquet 캐시가 모두 최신이면 미리보기 단계를 건너뛰고 바로 전체 데이터를 읽는다.
+    store(ResultStore)를 주면 전체 데이터 단계 결과를 데이터 버전과 인자로 저장해 두고,
+    같은 버전이면 (서버를 다시 시작한 뒤에도) 다시 읽지 않고 저장된 결과를 쓴다.
+    """
+
+    def __init__(self, region, resolutions=RESOLUTIONS, sample_frac=0.01, seed=42,
+                 on_complete=None, store=None, **kwargs):
+        self.region = region
+        self.resolutions = sorted(resolutions)
+        self.sample_frac = sample_frac
+        self.seed = seed
+        self.on_complete = on_complete
+        self.store = store
+        self.kwargs = kwargs
+        self.latest = None  # 가장 최근 단계의 RegionDataset
+        # 전체 데이터 단계의 진행 상황 (기간 밖의 달은 읽지 않으므로 세지 않음)
+        self.progress = LoadProgress(len(months_in_range(
+            kwargs.get("date_range"), kwargs.get("months", MONTHS), kwargs.get("year", YEAR))))
+        self.error = None
+        self.done = False
+        self._changed = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f"load-{region}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _publish(self, resolution, data, version=None):
+        dataset = RegionDataset(self.region, *data, resolution=resolution, version=version)
+        with self._changed:
+            self.latest = dataset
+            self._changed.notify_all()
+        return dataset
+
+    def _run(self):
+        try:
+            resolutions = self.resolutions
+            cache_kwargs = {k: v for k, v in self.kwargs.items() if k in ("base_url", "cache_dir", "year")}
+            months = months_in_range(self.kwargs.get("date_range"), self.kwargs.get("months", MONTHS),
+                                     self.kwargs.get("year", YEAR))
+            version = region_data_version(self.region, months, **cache_kwargs)
+            if version is not None:
+                resolutions = [r for r in resolutions if r >= 1.0]
+            params = {"region": self.region, "sample_frac": self.sample_frac, "seed": self.seed, **self.kwargs}
+            if self.store is not None and version is not None:
+                data = self.store.get("region", version, params)
+                if data is not None:
+                    self.progress.add(months_done=len(months))
+                    dataset = self._publish(1.0, data, version)
+                    if self.on_complete is not None:
+                        self.on_complete(dataset)
+                    return
+            sizes, previous_counts = None, None
+            for resolution in resolutions:
+                if resolution >= 1.0:
+                    data = ingest_region(self.region, sample_frac=self.sample_frac, seed=self.seed,
+                                         progress=self.progress, **self.kwargs)
+                    # 모든 달을 읽었으면 캐시가 최신이 되었으므로 읽은 원본의 버전으로 저장
+                    version = None if data[2] else region_data_version(self.region, months, **cache_kwargs)
+                    if self.store is not None and version is not None:
+                        self.store.put("region", version, params, data)
+                    dataset = self._publish(1.0, data, version)
+                    if self.on_complete is not None:
+                        self.on_complete(dataset)
+                    continue
+                try:
+                    if sizes is None:
+                        sizes, _ = map_region_months(month_file_size, self.region, **self.kwargs)
+                    # 파일이 작아 앞 단계와 같은 블록을 읽게 되는 단계는 건너뜀 (같은 결과를 다시 그리지 않게)
+                    counts = {month: block_count(size, resolution) for month, size in sizes.items()}
+                    if counts == previous_counts:
+                        continue
+                    previous_counts = counts
+                    data = ingest_region_blocks(self.region, resolution, seed=self.seed, sizes=sizes, **self.kwargs)
+                except Exception:
+                    continue  # 미리보기 실패는 다음 단계로 넘어감
+                if not data[1].empty:
+                    self._publish(resolution, data)
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    def wait(self, final=False, timeout=None):
+        """
+        결과가 나올 때까지 기다렸다가 RegionDataset을 반환하는 함수 (모두 실패하면 None)
+        final=False면 첫 단계 결과가 나오는 즉시, final=True면 전체 데이터 단계까지 기다린다.
+        """
+        with self._changed:
+            self._changed.wait_for(
+                lambda: self.done or (self.latest is not None and (not final or self.latest.resolution >= 1.0)),
+                timeout=timeout,
+            )
+            if self.latest is None and self.error is not None:
+                raise self.error
+            return self.latest
+
+    def join(self, timeout=None):
+        """작업 스레드가 끝날 때까지(on_complete 포함) 기다리고, 끝났으면 True"""
+        self._thread.join(timeout)
+        return self.done
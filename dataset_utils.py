@@ -0,0 +1,116 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from cube_utils import CATEGORY_COLUMNS, MEASURES, SalesCube
+
+# 메모리 매핑용 지역 데이터 파일 위치
+DATASET_DIR = os.getenv("REGION_DATASET_DIR", os.path.join(".cache", "datasets"))
+
+
+class RegionDataset:
+    """
+    한 지역의 샘플/매출 큐브를 담는 읽기 전용 공유 핸들
+    프로세스 안의 모든 세션이 같은 객체를 쓰며, 파일로 저장한 뒤 open_dataset으로 열면
+    샘플(Arrow IPC)과 큐브 배열(.npy)을 메모리 매핑해서 복사 없이 읽는다.
+    """
+
+    def __init__(self, region, sample, cube, failed=None, resolution=1.0, version=None):
+        self.region = region
+        self.sample = sample
+        self.cube = cube
+        self.failed = failed or {}
+        self.resolution = resolution
+        self.version = version  # 원본 데이터 버전 (data_utils.region_data_version, 모르면 None)
+
+    @property
+    def nbytes(self):
+        return int(self.sample.memory_usage(deep=True).sum()) + self.cube.nbytes
+
+
+def _dataset_paths(dataset_dir, region):
+    base = os.path.join(dataset_dir, region)
+    return {
+        "sample": base + "_sample.arrow",
+        "meta": base + "_meta.json",
+        **{measure: f"{base}_cube_{measure}.npy" for measure in MEASURES},
+    }
+
+
+def _replace_atomic(path, write):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save_dataset(dataset, dataset_dir=DATASET_DIR):
+    """지역 데이터를 메모리 매핑할 수 있는 파일(Arrow IPC, .npy, JSON)로 저장"""
+    os.makedirs(dataset_dir, exist_ok=True)
+    paths = _dataset_paths(dataset_dir, dataset.region)
+
+    def write_sample(path):
+        table = pa.Table.from_pandas(dataset.sample, preserve_index=False)
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    _replace_atomic(paths["sample"], write_sample)
+    for measure in MEASURES:
+        _replace_atomic(paths[measure], lambda path, m=measure: _save_npy(path, dataset.cube.data[m]))
+
+    meta = {
+        "pairs": [list(pair) for pair in dataset.cube.pairs],
+        "year": dataset.cube.year,
+        "failed": {str(month): error for month, error in dataset.failed.items()},
+        "resolution": dataset.resolution,
+        "version": dataset.version,
+    }
+
+    def write_meta(path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    _replace_atomic(paths["meta"], write_meta)
+
+
+def _save_npy(path, array):
+    with open(path, "wb") as f:
+        np.save(f, array)
+
+
+def open_dataset(region, dataset_dir=DATASET_DIR):
+    """save_dataset으로 저장한 지역 데이터를 메모리 매핑으로 여는 함수 (없으면 None)"""
+    paths = _dataset_paths(dataset_dir, region)
+    if not all(os.path.exists(path) for path in paths.values()):
+        return None
+
+    with open(paths["meta"], encoding="utf-8") as f:
+        meta = json.load(f)
+
+    # Arrow IPC 파일을 메모리 매핑해서 열면 숫자 컬럼은 복사 없이 pandas로 넘어간다
+    with pa.memory_map(paths["sample"], "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    sample = table.to_pandas(split_blocks=True)
+
+    pairs = pd.MultiIndex.from_tuples([tuple(pair) for pair in meta["pairs"]], names=CATEGORY_COLUMNS)
+    data = {measure: np.load(paths[measure], mmap_mode="r") for measure in MEASURES}
+    cube = SalesCube(pairs, data, meta["year"])
+    failed = {int(month): error for month, error in meta["failed"].items()}
+    return RegionDataset(region, sample, cube, failed, meta["resolution"], meta.get("version"))
+
+
+def share_dataset(dataset, dataset_dir=DATASET_DIR):
+    """
+    지역 데이터를 파일로 저장하고 메모리 매핑으로 다시 연 핸들을 돌려주는 함수
+    저장에 실패하면(디스크 문제 등) 메모리에 있는 핸들을 그대로 돌려준다.
+    """
+    if not dataset_dir:
+        return dataset
+    try:
+        save_dataset(dataset, dataset_dir)
+        return open_dataset(dataset.region, dataset_dir) or dataset
+    except Exception:
+        return dataset
@@ -0,0 +1,215 @@
+"""
+카드 데이터 원본(S3 버킷 등)을 받아 오는 HTTP 계층
+
+- 프로세스에 하나인 httpx 연결 풀을 모든 스레드가 함께 써서 keep-alive 연결(TLS 핸드셰이크)을 재사용
+- 인증서는 certifi(또는 CARD_HTTP_CA_BUNDLE)로 검증
+- 조건부 요청(If-None-Match / If-Modified-Since): 바뀌지 않은 원본은 304로 끝나 다시 받지 않음
+- 압축 전송(Accept-Encoding)과 Range/If-Range로 받다 만 파일 이어 받기
+"""
+import hashlib
+import json
+import os
+import threading
+
+import httpx
+
+from metrics_utils import count, span
+
+# 연결 풀 크기, 쉬는 연결을 유지하는 시간(초), 연결 제한 시간(초)
+HTTP_MAX_CONNECTIONS = int(os.getenv("CARD_HTTP_MAX_CONNECTIONS", 32))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("CARD_HTTP_KEEPALIVE_SECONDS", 60))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("CARD_HTTP_CONNECT_TIMEOUT", 5))
+
+# 인증서 검증에 쓸 CA 번들 경로 (사내 프록시 등, 기본은 certifi)
+HTTP_CA_BUNDLE = os.getenv("CARD_HTTP_CA_BUNDLE") or None
+
+BLOCK_SIZE = 64 * 1024
+
+_client = None
+_client_lock = threading.Lock()
+# 같은 URL을 동시에 받지 않도록 (받다 만 파일을 함께 쓰지 않게) URL별 잠금
+_url_locks = {}
+_url_locks_lock = threading.Lock()
+
+
+def get_http_client():
+    """프로세스에 하나인 httpx.Client (스레드 안전, keep-alive 연결 풀 공유)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+                    keepalive_expiry=HTTP_KEEPALIVE_SECONDS,
+                ),
+                timeout=httpx.Timeout(30, connect=HTTP_CONNECT_TIMEOUT),
+                verify=HTTP_CA_BUNDLE or True,
+                follow_redirects=True,
+            )
+        return _client
+
+
+def close_http_client():
+    """연결 풀을 닫음 (다음 요청 때 새로 만듦)"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def response_validator(headers, size=None):
+    """응답 헤더에서 ETag / Last-Modified / 크기를 뽑아내는 함수"""
+    size = size if size is not None else headers.get("Content-Length")
+    return {
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "size": int(size) if size is not None else None,
+    }
+
+
+def same_version(old, new):
+    """
+    두 검증 정보가 같은 원본을 가리키면 True
+    ETag가 양쪽에 있으면 ETag로, 없으면 Last-Modified로, 그것도 없으면 크기로 비교한다
+    (압축 전송으로 받은 크기와 HEAD의 크기는 다를 수 있으므로 크기는 마지막 수단).
+    """
+    for key in ("etag", "last_modified"):
+        if old.get(key) and new.get(key):
+            return old[key] == new[key]
+    return old.get("size") == new.get("size") and old.get("mtime") == new.get("mtime")
+
+
+def _conditional_headers(validator):
+    headers = {}
+    if validator:
+        if validator.get("etag"):
+            headers["If-None-Match"] = validator["etag"]
+        if validator.get("last_modified"):
+            headers["If-Modified-Since"] = validator["last_modified"]
+    return headers
+
+
+def head(url, validator=None, timeout=30):
+    """
+    HEAD 요청으로 원본의 검증 정보를 가져오는 함수
+    validator를 주면 조건부 요청으로 보내, 바뀌지 않았으면(304) validator를 그대로 돌려준다.
+    """
+    headers = {"Accept-Encoding": "identity", **_conditional_headers(validator)}
+    response = get_http_client().head(url, headers=headers, timeout=timeout)
+    if response.status_code == 304 and validator:
+        count("http.not_modified")
+        return validator
+    response.raise_for_status()
+    return response_validator(response.headers)
+
+
+def read_range(url, start, length, timeout=30):
+    """url의 start 위치부터 length 바이트만 받는 함수 (Range 요청, 압축 없이)"""
+    headers = {"Range": f"bytes={start}-{start + length - 1}", "Accept-Encoding": "identity"}
+    response = get_http_client().get(url, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    if response.status_code != 206 and start > 0:
+        raise OSError("원본이 Range 요청을 지원하지 않습니다")
+    return response.content[:length]
+
+
+def partial_path(url, download_dir):
+    """url을 받다 만 내용을 두는 경로 (같은 URL이면 다시 시도할 때 이어 받음)"""
+    return os.path.join(download_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".part")
+
+
+def _url_lock(url):
+    with _url_locks_lock:
+        return _url_locks.setdefault(url, threading.Lock())
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _remove(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def download(url, dest, validator=None, timeout=30, on_bytes=None, part_path=None):
+    """
+    url을 dest 파일로 내려받는 함수
+    - validator(전에 받은 원본의 검증 정보)를 주면 조건부 GET으로 보내고, 바뀌지 않았으면(304) 받지 않고 None을 돌려준다.
+    - 압축 전송을 허용하며 받는 대로 풀어서 쓴다.
+    - part_path를 주면 받는 동안 그 파일에 쓰고, 중간에 끊기면 남겨 두었다가 다음 호출 때 Range/If-Range로 이어 받는다
+      (압축된 응답은 위치를 맞출 수 없으므로 이어 받지 않음).
+    on_bytes(n)는 파일에 쓴 바이트 수를 그때그때 받는다.
+    반환값: 받은 원본의 검증 정보 dict (크기는 푼 뒤의 크기), 바뀌지 않았으면 None
+    """
+    resumable = part_path is not None
+    part_path = part_path or f"{dest}.part"
+    meta_path = f"{part_path}.json"
+    headers = _conditional_headers(validator)
+
+    with _url_lock(url):
+        offset = 0
+        part_meta = _read_json(meta_path) if resumable else None
+        if part_meta and part_meta.get("url") == url and os.path.exists(part_path):
+            offset = os.path.getsize(part_path)
+            # 원본이 그 사이 바뀌었으면 서버가 Range를 무시하고 전체(200)를 보냄
+            headers.update({
+                "Range": f"bytes={offset}-",
+                "If-Range": part_meta.get("etag") or part_meta["last_modified"],
+                "Accept-Encoding": "identity",
+            })
+
+        completed = False
+        keep_part = False
+        try:
+            with span("download", url=url, offset=offset), \
+                    get_http_client().stream("GET", url, headers=headers, timeout=timeout) as response:
+                if response.status_code == 304:
+                    count("http.not_modified")
+                    completed = True
+                    return None
+                if response.status_code == 416:
+                    # 받다 만 파일이 원본보다 길면 처음부터 다시
+                    _remove(part_path, meta_path)
+                    raise OSError("이어 받을 위치가 원본 크기를 벗어났습니다")
+                response.raise_for_status()
+
+                resumed = response.status_code == 206 and offset > 0
+                if resumed and not response.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+                    _remove(part_path, meta_path)
+                    raise OSError("원본이 요청한 위치부터 보내지 않았습니다")
+                if resumed:
+                    count("http.resumed")
+
+                result = response_validator(response.headers)
+                encoded = response.headers.get("Content-Encoding", "identity") != "identity"
+                keep_part = resumable and not encoded and bool(result["etag"] or result["last_modified"])
+                if keep_part:
+                    with open(meta_path, "w", encoding="utf-8") as f:
+                        json.dump({"url": url, "etag": result["etag"], "last_modified": result["last_modified"]}, f)
+                else:
+                    _remove(meta_path)
+
+                with open(part_path, "ab" if resumed else "wb") as f:
+                    for block in response.iter_bytes(BLOCK_SIZE):
+                        f.write(block)
+                        if on_bytes is not None:
+                            on_bytes(len(block))
+                    result["size"] = f.tell()
+                count("http.bytes_received", response.num_bytes_downloaded)
+            os.replace(part_path, dest)
+            _remove(meta_path)
+            completed = True
+            return result
+        finally:
+            if not completed and not keep_part:
+                _remove(part_path, meta_path)
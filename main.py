@@ -7,12 +7,18 @@ from io import BytesIO
 import pandas as pd
 import os
 import plotly.express as px
-from openai_utils import fetch_region_info
+from openai_utils import RegionInfoWorker
+from data_utils import MONTHS, REGION_MAPPING, ProgressiveLoad
+from dataset_utils import RegionDataset, share_dataset
+from cache_utils import LRUCache
+from cube_utils import SalesCube
+from chart_utils import figure_from_json, figure_to_json
+from metrics_utils import ADMIN_PANEL_ENABLED, begin_rerun, process_memory, rerun_spans, snapshot, span
+from store_utils import get_result_store
+from warmup_utils import CACHE_WARMUP_ENABLED, CacheWarmer, warmup_order
 from dotenv import load_dotenv
-import ssl
 import threading
-# SSL 인증서 검증 비활성화
-ssl._create_default_https_context = ssl._create_unverified_context
+import time
 
 # 페이지 설정
 st.set_page_config(page_title="창업 정보 플랫폼", layout="wide", page_icon="🏢")
@@ -71,20 +77,8 @@ st.sidebar.header("지역 선택")
 
 
 
-# 한글 지역명과 URL에 사용될 영문명을 매핑한 딕셔너리
-region_mapping = {
-    "포천시": "pochun",
-#     "수원시": "suwon",
-#     '광명시' : 'kwangmyeong',
-# '부천시':'bucheon',
-
-# '시흥시' : 'siheung',
-# '안산시' : 'ansan',
-# '용인시' : 'yongin',
-# '포천시' : 'pochun',
-# '하남시' : 'hanam',
-# '화성시' : 'hwasung'
-}
+# 한글 지역명과 URL에 사용될 영문명을 매핑한 딕셔너리 (data_utils에서 관리, 배치 리포트와 공유)
+region_mapping = REGION_MAPPING
 
 
 selected_region = st.sidebar.selectbox("창업 예정 지역을 선택하세요", list(region_mapping.keys()))
@@ -97,111 +91,298 @@ st.session_state["region_url"] = region_url
 
 
 
-# 파일 읽기 함수 (캐싱)
-@st.cache_data
-def load_csv_file(file_path):
-    """CSV 파일을 읽어오는 함수"""
-    try:
-        df = pd.read_csv(file_path, encoding="utf-8")
-        return df
-    except Exception as e:
-        st.write("에러 발생:")
-        return None
+# 지역별 데이터 캐시의 메모리 예산 (바이트, 기본 1GB)
+REGION_CACHE_MAX_BYTES = int(os.getenv("REGION_CACHE_MAX_BYTES", 1024 ** 3))
+
+# 지역별 데이터 캐시 (프로세스에 하나, 모든 세션이 공유)
+@st.cache_resource
+def get_region_cache():
+    """예산을 넘으면 가장 오래 안 쓴 지역부터 내보내는 지역별 LRU 캐시"""
+    return LRUCache(max_bytes=REGION_CACHE_MAX_BYTES, sizeof=lambda dataset: dataset.nbytes)
 
-# 데이터 병합 및 샘플링 함수 (캐싱)
-@st.cache_data
+# 진행 중인 단계별 로딩 작업 (지역 -> ProgressiveLoad, 프로세스에 하나)
+@st.cache_resource
+def get_region_loads():
+    return {}, threading.Lock()
+
+# 지역 데이터 로드 함수 (읽기 전용 핸들을 모든 세션이 공유, 복사하지 말 것)
+def get_region_data(region, final=False):
+    """
+    지역 데이터 핸들(RegionDataset: 1% 샘플, 매출 큐브, 실패한 월, 해상도)을 반환
+    final=False면 지금까지 준비된 가장 정밀한 단계를(처음이면 첫 미리보기를 기다려) 돌려주고,
+    final=True면 전체 데이터 단계까지 기다린다.
+    """
+    cache = get_region_cache()
+    # 확인과 꺼내기 사이에 내보내질 수 있으므로 한 번에 꺼내고 None이면 캐시 실패로 봄
+    dataset = cache.get(region)
+    if dataset is not None:
+        return dataset
+
+    load = start_region_load(region)
+    while load is None:
+        # 방금 다른 스레드의 로딩이 끝나 캐시에 들어감 (그 사이 다시 내보내졌으면 새로 로딩)
+        dataset = cache.get(region)
+        if dataset is not None:
+            return dataset
+        load = start_region_load(region)
+
+    with span("wait_region_data", region=region, final=final):
+        dataset = load.wait(final=final)
+    if dataset is None:
+        # 모든 단계 실패
+        return RegionDataset(region, pd.DataFrame(), SalesCube.zero(), {m: str(load.error) for m in MONTHS})
+    return dataset
+
+def start_region_load(region, cache=None, loads=None):
+    """
+    지역 데이터 로딩을 백그라운드에서 시작(이미 진행 중이면 그 작업을 그대로)하고 ProgressiveLoad를 반환
+    이미 지역 캐시에 있으면 None을 반환한다.
+    """
+    if cache is None:
+        cache = get_region_cache()
+    loads, lock = loads if loads is not None else get_region_loads()
+
+    def on_complete(dataset):
+        # 전체 데이터가 준비되면 메모리 매핑 파일로 옮겨 지역 캐시에 넣음
+        # (아무것도 못 읽었으면 다음 요청 때 다시 시도)
+        if not dataset.cube.empty:
+            with span("share_dataset", region=region):
+                cache.put(region, share_dataset(dataset))
+        with lock:
+            loads.pop(region, None)
+
+    with lock:
+        load = loads.get(region)
+        if load is None:
+            # 잠금을 잡기 전에 끝난 로딩이 이미 캐시에 넣었으면 다시 읽지 않음 (적중/실패는 꺼내는 쪽에서 기록)
+            if region in cache:
+                return None
+            # 12개월 파일을 동시에 읽으면서 1%씩 샘플링 (전체 데이터를 메모리에 올리지 않음)
+            sample_ratio = 0.01  # 샘플링 비율 (1%)
+            load = ProgressiveLoad(region, sample_frac=sample_ratio, seed=42, on_complete=on_complete,
+                                   store=get_result_store())
+            loads[region] = load.start()
+        return load
+
+# 서버 시작 때 모든 지역을 미리 준비하는 캐시 워머 (CACHE_WARMUP=1, 프로세스에 하나)
+@st.cache_resource
+def get_cache_warmer():
+    """우선순위 순서로 모든 지역을 지역 캐시에 미리 올리는 워머 (첫 스크립트 실행 때 시작)"""
+    cache = get_region_cache()
+    loads = get_region_loads()
+    # 워머 스레드에서는 캐시 함수 대신 이미 만든 객체를 씀
+    return CacheWarmer(warmup_order(region_mapping), lambda region: start_region_load(region, cache, loads),
+                       cache=cache).start()
+
+if CACHE_WARMUP_ENABLED:
+    get_cache_warmer()
+
+# 데이터 병합 및 샘플링 함수
 def get_combined_sampled_data(region):
-    """2023년 데이터를 병합하고 샘플링"""
-    # 파일 경로 템플릿
-    base_url = f'https://woori-fisa-bucket.s3.ap-northeast-2.amazonaws.com/fisa04-card/tbsh_gyeonggi_day_2023{{}}_{region}.csv'
-
-    combined_df = pd.DataFrame()
-
-    # 202301부터 202312까지 반복 처리
-    for month in range(1, 13):
-        month_str = f"{month:02d}"  # 월을 두 자리로 포맷팅
-        file_path = base_url.format(month_str)
-
-        df = load_csv_file(file_path)
-        if df is not None:
-            combined_df = pd.concat([combined_df, df], ignore_index=True)
-
-    # 데이터 샘플링
-    if not combined_df.empty:
-        sample_ratio = 0.01  # 샘플링 비율 (1%)
-        sampled_df = combined_df.sample(frac=sample_ratio, random_state=42)
-        return sampled_df
-    else:
-        return pd.DataFrame()  # 빈 데이터프레임 반환
+    """데이터 연도(YEAR)의 데이터를 병합하고 샘플링 (지역 캐시에서 가져오며, 읽기 전용으로 사용)"""
+    dataset = get_region_data(region, final=True)
+    if dataset.failed:
+        st.warning(f"일부 월 데이터를 불러오지 못했습니다: {', '.join(f'{m}월' for m in dataset.failed)}")
+    return dataset.sample
 
-def clear_cache_on_region_change(selected_region):
+def get_sales_cube(region):
     """
-    지역이 변경되었는지 확인하고, 변경되었으면 캐시를 초기화
+    매출 큐브 (월 × 요일 × 시간대 × 성별 × 연령대 × 업종)와 그 해상도
+    전체 데이터가 아직 준비 중이면 미리보기 단계 큐브(전체 규모로 추정한 값)를 먼저 돌려준다.
     """
-    if "previous_region" not in st.session_state:
-        st.session_state["previous_region"] = selected_region
+    dataset = get_region_data(region)
+    # 이 큐브로 계산한 결과를 디스크에 저장할 때 쓰는 데이터 버전 (cached_result 참고)
+    st.session_state["data_version"] = dataset.version
+    return dataset.cube, dataset.resolution
 
-    # 지역이 변경된 경우
-    if st.session_state["previous_region"] != selected_region:
-        st.cache_data.clear()  # 캐시 초기화
-        st.session_state["previous_region"] = selected_region
+def cached_result(name, params, compute, resolution):
+    """
+    지역의 전체 데이터로 계산한 결과를 (데이터 버전, 지역, params) 키로 디스크 결과 저장소에 저장해 두고,
+    같은 키면 (서버를 다시 시작한 뒤에도) compute()를 다시 실행하지 않고 저장된 결과를 돌려준다.
+    미리보기 단계 결과나 버전을 모르는 데이터는 저장하지 않는다. get_sales_cube를 먼저 호출해야 한다.
+    """
+    store = get_result_store()
+    version = st.session_state.get("data_version")
+    if store is None or version is None or resolution < 1.0:
+        return compute()
+    return store.get_or_compute(name, version, {"region": st.session_state["region_url"], **params}, compute)
+
+# 차트 캐시의 메모리 예산 (바이트, 기본 64MB)
+FIGURE_CACHE_MAX_BYTES = int(os.getenv("FIGURE_CACHE_MAX_BYTES", 64 * 1024 ** 2))
+
+# 직렬화한 차트 캐시 (프로세스에 하나, 모든 세션이 공유)
+@st.cache_resource
+def get_figure_cache():
+    return LRUCache(max_bytes=FIGURE_CACHE_MAX_BYTES, sizeof=len)
+
+def cached_figure(page, chart_id, selection, build, resolution):
+    """
+    (지역, 데이터 버전, 페이지, 업종 선택, 차트 id, 해상도)로 캐시한 차트 Figure를 반환 (그릴 데이터가 없으면 None)
+    차트 id("monthly" 등)는 페이지마다 겹치므로 page("page01" 등)로 구분한다.
+    캐시에 없을 때만 build()로 집계하고 차트를 만들어 JSON으로 저장하므로, 같은 선택의 재실행은 복원만 한다.
+    원본이 바뀌면 데이터 버전이 달라져 예전 차트는 쓰이지 않는다. get_sales_cube를 먼저 호출해야 한다.
+    """
+    version = st.session_state.get("data_version")
+    key = (st.session_state["region_url"], version, page, selection, chart_id, resolution)
+
+    def load():
+        with span("figure.build", chart_id=chart_id):
+            fig = build()
+        if fig is None:
+            return ""
+        with span("figure.serialize", chart_id=chart_id):
+            return figure_to_json(fig)
+
+    def load_result():
+        return cached_result("figure", {"page": page, "selection": selection, "chart_id": chart_id}, load, resolution)
+
+    if version is None and resolution >= 1.0:
+        # 버전을 모르는 전체 데이터(일부 월 실패 등)는 다시 받으면 내용이 바뀔 수 있으므로 캐시하지 않음
+        fig_json = load_result()
+    else:
+        fig_json = get_figure_cache().get_or_load(key, load_result)
+    if not fig_json:
+        return None
+    with span("figure.restore", chart_id=chart_id):
+        return figure_from_json(fig_json)
+
+def resolution_label(resolution):
+    """해상도를 화면 표시용 문구로 바꿈"""
+    if resolution >= 1.0:
+        return "전체 데이터 기준"
+    return f"{resolution:.1%} 표본 기준 추정치 (전체 데이터 로드 중)"
+
+def show_chart(fig, resolution):
+    """차트를 그리고 어떤 해상도의 데이터로 그렸는지 표시"""
+    with span("chart.render"):
+        st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"📐 {resolution_label(resolution)}")
+
+def show_admin_panel():
+    """
+    APP_METRICS=1, APP_ADMIN_PANEL=1일 때 사이드바에 성능 패널을 보여줌
+    이번 재실행의 단계별 시간, 캐시 적중/실패, 누적 단계 통계, 프로세스 메모리를 표시한다.
+    """
+    if not ADMIN_PANEL_ENABLED:
+        return
+    with st.sidebar.expander("⚙️ 성능 (관리자)"):
+        memory = process_memory()
+        st.metric("프로세스 메모리 (RSS)", format_bytes(memory["rss"]) if memory["rss"] else "알 수 없음")
+        if memory["max_rss"] is not None:
+            st.caption(f"최대 RSS: {format_bytes(memory['max_rss'])}")
+
+        st.markdown("**이번 재실행**")
+        spans = rerun_spans()
+        if spans:
+            st.dataframe(pd.DataFrame(spans).drop(columns=["event", "thread"]), hide_index=True)
+            st.caption(f"합계 {sum(entry['ms'] for entry in spans):,.1f} ms")
+
+        st.markdown("**캐시**")
+        stats = snapshot()
+        caches = {"지역 데이터": get_region_cache().stats(), "차트": get_figure_cache().stats()}
+        st.dataframe(pd.DataFrame([
+            {"캐시": name, "적중": c["hits"], "실패": c["misses"], "항목": len(c["keys"]),
+             "사용량": format_bytes(c["current_bytes"])}
+            for name, c in caches.items()
+        ]), hide_index=True)
+        store = get_result_store()
+        if store is not None:
+            store_stats = store.stats()
+            st.caption(f"결과 저장소: 파일 {store_stats['files']}개, "
+                       f"{format_bytes(store_stats['current_bytes'])} / {format_bytes(store_stats['max_bytes'])}")
+        dropped = stats["counters"].get("cube.dropped_rows")
+        if dropped:
+            st.warning(f"큐브에 넣지 못한 행 (업종 없음/날짜·성별·연령대·시간대 범위 밖): {dropped:,}")
+        if stats["counters"]:
+            st.json(stats["counters"])
+
+        if CACHE_WARMUP_ENABLED:
+            st.markdown("**캐시 워머**")
+            warmer = get_cache_warmer().status()
+            finished = len(warmer["done"]) + len(warmer["cached"]) + len(warmer["failed"])
+            st.progress(finished / max(warmer["total"], 1),
+                        text=f"{finished}/{warmer['total']} 지역 ({warmer['state']}, {warmer['elapsed']:.0f}초)")
+            if warmer["stop_reason"]:
+                st.caption(f"중단: {warmer['stop_reason']} (건너뛴 지역 {len(warmer['skipped'])}개)")
+            if warmer["failed"]:
+                st.json(warmer["failed"])
+
+        st.markdown("**누적 단계 통계**")
+        if stats["spans"]:
+            st.dataframe(pd.DataFrame.from_dict(stats["spans"], orient="index").round(1))
+
+def rerun_until_complete(resolution, interval=1.0):
+    """미리보기 단계로 그렸으면 잠시 뒤 다시 실행해서 더 정밀한 단계로 다시 그림"""
+    if resolution < 1.0:
+        time.sleep(interval)
+        st.rerun()
+
+def format_bytes(size):
+    """바이트 수를 화면 표시용 문구로 바꿈"""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+def wait_for_load(load, poll_interval=0.5, info_interval=3.0):
+    """
+    전체 데이터 로드가 끝날 때까지 실제 진행 상황(끝난 월 수, 읽은 바이트, 처리한 행 수)을 보여주는 함수
+    기다리는 동안에만 '요건 몰랐지?' 특색 정보를 하나씩 가져와 채우고, 로드가 끝나면 바로 돌아온다.
+    """
+    progress_bar = st.progress(0.0)
+    worker = RegionInfoWorker(selected_region, interval=info_interval)
+    cnt = 1
+    info_box = None
+    try:
+        while not load.done:
+            snapshot = load.progress.snapshot()
+            progress_bar.progress(
+                snapshot["months_done"] / max(snapshot["months_total"], 1),
+                text=f"{snapshot['months_done']}/{snapshot['months_total']}개월 · "
+                     f"{format_bytes(snapshot['bytes_read'])} 읽음 · {snapshot['rows_parsed']:,}행 처리",
+            )
+
+            # 특색 정보는 작업자가 큐로 넘겨준 것만 스크립트 스레드에서 그림 (만들어지는 중인 문장도 바로 표시)
+            for kind, region_info in worker.poll():
+                if info_box is None:
+                    # UI 개선: 그거 아셨나요? 부분
+                    col1, col2 = st.columns([0.1, 0.9])
+                    with col1:
+                        st.write("📌"*cnt)
+                    with col2:
+                        info_box = st.empty()
+                info_box.write(f"**No.{cnt} 요건 몰랐지?** \n\n{region_info}")
+                if kind == "fact":
+                    cnt += 1
+                    info_box = None
+
+            try:
+                load.wait(final=True, timeout=poll_interval)
+            except Exception:
+                break  # 로드 실패는 아래 get_combined_sampled_data에서 처리
+    finally:
+        # 데이터 로드가 끝나면 특색 정보 호출도 멈춤
+        worker.stop()
+    progress_bar.empty()
 
 # 메인 함수
 def main():
+    begin_rerun()
 
     st.subheader("📊 지역별 데이터 로드")
     st.write(f"선택된 지역: {selected_region}")
-    
-    clear_cache_on_region_change(selected_region)
-     # 특색 정보 표시 컨테이너
-    info_container = st.empty()
-
-    # 특색 정보를 갱신하는 쓰레드 시뮬레이션
-    data_loaded = False  # 데이터 로드 상태 플래그
-    import time
-    def update_region_info():
-        """
-        3초마다 특색 정보를 갱신
-        """
-        while not data_loaded:
-            region_info = fetch_region_info(selected_region)
-            info_container.info(f"그거 아셨나요? {region_info}")
-            time.sleep(3)
-
-    if "region_url" in st.session_state:    # 병렬적으로 특색 정보 갱신 시작
-        
-        info_thread = threading.Thread(target=update_region_info)
-        info_thread.start()
-            
-        # 병합 및 샘플링된 데이터 가져오기
+
+    if "region_url" in st.session_state:
+        # 데이터 로드는 바로 백그라운드에서 시작하고, 기다리는 동안만 진행 상황과 특색 정보를 보여줌
+        load = start_region_load(region_url)
         with st.spinner("데이터 로드 중..."):
-            start_time = time.time()
-            cnt=1
-            while True:
-                elapsed_time = time.time() - start_time
-                # 데이터 로드가 완료되었는지 확인
-                if elapsed_time > 10:  # 데이터 로드 시간 (10초) 기준
-                    break
-                
-                # 지역 특색 정보 갱신
-                region_info = fetch_region_info(selected_region)
-
-                # UI 개선: 그거 아셨나요? 부분
-                col1, col2 = st.columns([0.1, 0.9])
-                with col1:
-                    st.write("📌"*cnt)
-                    
-                with col2:
-                    st.write(f"**No.{cnt} 요건 몰랐지?** \n\n{region_info}")
-                    cnt+=1
-                time.sleep(3)  # 3초 대기
+            if load is not None:
+                wait_for_load(load)
 
             # 데이터 로드 완료 후 데이터 병합 및 샘플링
             sampled_df = get_combined_sampled_data(region_url)
 
-        # 특색 정보 갱신 종료
-        info_thread.join()
-
         # 데이터 표시
         if not sampled_df.empty:
             st.write(f"**{selected_region} 지역 데이터 로드 완료!**")
@@ -211,6 +392,7 @@ def main():
         st.success("모든 작업 완료! 이제 좌측 상단 원하는 카테로 이동해주세요")
     else:
         st.info("좌측 사이드바에서 지역을 먼저 선택하세요.")
+    show_admin_panel()
 
 
 if __name__ == "__main__":
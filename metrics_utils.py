@@ -0,0 +1,164 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+try:
+    import resource
+except ImportError:  # 윈도우
+    resource = None
+
+
+# 계측 켜기 (APP_METRICS=1), 켜져 있으면 관리자 패널도 보기 (APP_ADMIN_PANEL=1)
+# 꺼져 있으면 span()/count()는 아무것도 하지 않는 객체/함수 호출 한 번으로 끝난다.
+METRICS_ENABLED = os.getenv("APP_METRICS", "0") == "1"
+ADMIN_PANEL_ENABLED = METRICS_ENABLED and os.getenv("APP_ADMIN_PANEL", "0") == "1"
+
+# 최근 기록을 남겨 두는 개수 (관리자 패널용)
+RECENT_SPANS = 200
+
+logger = logging.getLogger("card_app.metrics")
+if METRICS_ENABLED and not logger.handlers:
+    # 한 줄에 JSON 하나씩 (로그 수집기가 바로 읽을 수 있게)
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_lock = threading.Lock()
+_counters = Counter()
+_span_stats = {}  # 이름 -> [횟수, 합계(초), 최대(초)]
+_recent = []
+# 지금 실행 중인 스크립트(재실행 한 번)의 span 목록 (begin_rerun으로 시작, 다른 스레드로는 넘어가지 않음)
+_rerun_spans = contextvars.ContextVar("rerun_spans", default=None)
+
+
+def _record(name, seconds, fields):
+    entry = {"event": "span", "name": name, "ms": round(seconds * 1000, 3),
+             "thread": threading.current_thread().name, **fields}
+    with _lock:
+        stats = _span_stats.setdefault(name, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] = max(stats[2], seconds)
+        _recent.append(entry)
+        del _recent[:-RECENT_SPANS]
+    spans = _rerun_spans.get()
+    if spans is not None:
+        spans.append(entry)
+    logger.info(json.dumps(entry, ensure_ascii=False, default=str))
+
+
+class _Span:
+    __slots__ = ("name", "fields", "started")
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.fields["error"] = exc_type.__name__
+        _record(self.name, time.perf_counter() - self.started, self.fields)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, **fields):
+    """
+    with 블록의 실행 시간을 기록하는 컨텍스트 매니저
+    기록은 이름별 누적 통계, 현재 재실행의 목록, JSON 한 줄 로그로 남는다.
+    """
+    if not METRICS_ENABLED:
+        return _NULL_SPAN
+    return _Span(name, fields)
+
+
+def timed_iter(name, iterable, **fields):
+    """
+    iterable에서 다음 값을 기다린 시간의 합을 span 하나로 기록하는 이터레이터
+    (청크를 읽어 오는 시간과 받은 쪽에서 처리하는 시간을 나눠 볼 때 사용)
+    """
+    if not METRICS_ENABLED:
+        return iterable
+    return _timed_iter(name, iterable, fields)
+
+
+def _timed_iter(name, iterable, fields):
+    waited = 0.0
+    iterator = iter(iterable)
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                waited += time.perf_counter() - started
+            yield item
+    finally:
+        _record(name, waited, fields)
+
+
+def count(name, n=1):
+    """이름별 카운터 증가 (캐시 적중/실패 등)"""
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        _counters[name] += n
+
+
+def begin_rerun():
+    """스크립트 재실행 한 번의 span 수집을 시작 (페이지 맨 앞에서 호출)"""
+    if METRICS_ENABLED:
+        _rerun_spans.set([])
+
+
+def rerun_spans():
+    """begin_rerun 이후 이 스크립트 실행에서 기록된 span 목록"""
+    return list(_rerun_spans.get() or [])
+
+
+def process_memory():
+    """현재/최대 RSS (바이트, 현재 값은 리눅스의 /proc에서만, 최대 값은 resource가 없으면 None)"""
+    memory = {"max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if resource else None}
+    try:
+        with open("/proc/self/statm") as f:
+            memory["rss"] = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        memory["rss"] = None
+    return memory
+
+
+def snapshot():
+    """누적 통계 (카운터, 이름별 span 횟수/합계/최대, 최근 span 목록)"""
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "spans": {
+                name: {"count": c, "total_ms": total * 1000, "max_ms": peak * 1000}
+                for name, (c, total, peak) in _span_stats.items()
+            },
+            "recent": list(_recent),
+        }
@@ -1,7 +1,18 @@
 import openai
 from dotenv import load_dotenv
+import hashlib
+import json
+import asyncio
+import httpx
 import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
+import metrics_utils
+from metrics_utils import span
 # .env 파일 로드
 load_dotenv()
 
@@ -9,23 +20,291 @@ load_dotenv()
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
+# 프로세스 전체에서 동시에 진행되는 fetch_region_info 호출 수 상한 (접속자 수와 무관하게 스레드 수 고정)
+REGION_INFO_MAX_CONCURRENT = int(os.getenv("REGION_INFO_MAX_CONCURRENT", 4))
+# 페이지 로드(세션) 한 번에 허용하는 최대 호출 수
+REGION_INFO_MAX_CALLS = int(os.getenv("REGION_INFO_MAX_CALLS", 5))
 
+# 지역 특색 정보 캐시: 지역마다 미리 만들어 둘 정보 수, 보관 기간(초), 저장 위치, 생성 백엔드(openai/stub)
+REGION_INFO_POOL_SIZE = int(os.getenv("REGION_INFO_POOL_SIZE", 10))
+REGION_INFO_TTL = int(os.getenv("REGION_INFO_TTL", 7 * 24 * 60 * 60))
+REGION_INFO_CACHE_DIR = os.getenv("REGION_INFO_CACHE_DIR", os.path.join(".cache", "region_info"))
+REGION_INFO_BACKEND = os.getenv("REGION_INFO_BACKEND", "openai")
 
-def fetch_region_info(region):
+REGION_INFO_MODEL = "gpt-4o"
+REGION_INFO_SYSTEM_PROMPT = "지역 정보를 제공하는 전문가 역할입니다."
+REGION_INFO_PROMPT = (
+    "'{region}' 지역의 특색 있는 정보를 서로 겹치지 않게 {count}개 작성해 주세요. "
+    "한 줄에 간결한 한 문장씩, 구체적이고 흥미로운 내용을 포함해주세요."
+)
+
+# 비동기 LLM 클라이언트: 동시 요청 수, HTTP 연결 수, 요청 제한 시간(초), 재시도 횟수
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 20))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+
+_region_info_executor = ThreadPoolExecutor(max_workers=REGION_INFO_MAX_CONCURRENT,
+                                           thread_name_prefix="region-info")
+
+# 지역별 정보 목록 (메모리), 다음에 보여줄 위치, 같은 지역을 동시에 생성하지 않도록 하는 잠금
+_pools = {}
+_rotation = {}
+_pool_lock = threading.Lock()
+_pool_key_locks = {}
+
+
+class AsyncLLMClient:
     """
-    특정 지역의 특색 정보를 OpenAI GPT-4로 가져오는 함수
+    프로세스에 하나 두고 쓰는 비동기 OpenAI 클라이언트
+    전용 스레드 하나의 이벤트 루프에서 모든 요청을 처리하고, HTTP 연결 풀(keep-alive)을 함께 쓴다.
+    동시에 진행되는 요청은 max_concurrency개로 제한하며, 요청마다 timeout초 제한을 두고
+    연결 오류/429/5xx는 max_retries번까지 지수 백오프로 다시 시도한다(openai 클라이언트 기본 동작).
+    base_url로 로컬 가짜 서버를 가리키면 네트워크 없이 쓸 수 있다.
+    """
+
+    def __init__(self, base_url=None, api_key=None, max_concurrency=LLM_MAX_CONCURRENCY,
+                 max_connections=LLM_MAX_CONNECTIONS, timeout=LLM_TIMEOUT, max_retries=LLM_MAX_RETRIES):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._client = None
+        self._semaphore = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True)
+        self._thread.start()
+
+    def _ensure_client(self):
+        # 이벤트 루프 안에서 처음 쓸 때 만듦 (httpx 연결 풀과 세마포어는 루프에 묶임)
+        if self._client is None:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+            )
+            self._client = openai.AsyncOpenAI(
+                api_key=self.api_key or os.getenv("OPENAI_API_KEY") or "missing",
+                base_url=self.base_url,
+                timeout=self.timeout,
+                max_retries=self.max_retries,
+                http_client=http_client,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def stream_chat(self, messages, on_token=None, **params):
+        """
+        채팅 응답을 스트리밍으로 받으며 조각이 올 때마다 on_token(지금까지의 전체 문자열)을 부르고,
+        완성된 문자열을 돌려주는 코루틴
+        """
+        client = self._ensure_client()
+        async with self._semaphore:
+            stream = await client.chat.completions.create(messages=messages, stream=True, **params)
+            text = ""
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    text += chunk.choices[0].delta.content
+                    if on_token is not None:
+                        on_token(text)
+            return text
+
+    def submit(self, messages, on_token=None, **params):
+        """다른 스레드에서 요청을 넣는 함수 (concurrent.futures.Future 반환)"""
+        return asyncio.run_coroutine_threadsafe(self.stream_chat(messages, on_token, **params), self._loop)
+
+    def close(self):
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_llm_client = None
+
+
+def get_llm_client():
+    """프로세스 공용 AsyncLLMClient (처음 쓸 때 만듦)"""
+    global _llm_client
+    with _pool_lock:
+        if _llm_client is None:
+            _llm_client = AsyncLLMClient(base_url=os.getenv("OPENAI_BASE_URL"))
+        return _llm_client
+
+
+def _clean_fact(line):
+    # "1. ", "- " 같은 목록 기호를 떼어냄
+    return re.sub(r"^\s*(?:\d+[.)]|[-•*])\s*", "", line).strip()
+
+
+def openai_backend(region, count, on_token=None):
+    """
+    정보 count개를 OpenAI에 한 번의 요청으로 만들어 목록으로 돌려주는 백엔드
+    on_token을 주면 첫 번째 정보가 만들어지는 대로 그때까지의 문장을 넘겨준다.
+    """
+    def first_line(text):
+        if on_token is not None and "\n" not in text.lstrip() and _clean_fact(text):
+            on_token(_clean_fact(text))
+
+    text = get_llm_client().submit(
+        [
+            {"role": "system", "content": REGION_INFO_SYSTEM_PROMPT},
+            {"role": "user", "content": REGION_INFO_PROMPT.format(region=region, count=count)},
+        ],
+        on_token=first_line,
+        model=REGION_INFO_MODEL,
+        temperature=0.7,
+        max_tokens=100 * count,
+    ).result()
+    facts = [_clean_fact(line) for line in text.splitlines()]
+    return [fact for fact in facts if fact][:count]
+
+
+def stub_backend(region, count, on_token=None):
+    """네트워크 없이 쓰는 오프라인 백엔드 (테스트/개발용 고정 문구)"""
+    return [f"{region} 지역 특색 정보 예시 {i + 1}" for i in range(count)]
+
+
+REGION_INFO_BACKENDS = {"openai": openai_backend, "stub": stub_backend}
+
+
+def _pool_path(region, cache_dir):
+    # 프롬프트나 모델이 바뀌면 다른 파일에 저장되도록 키에 함께 넣음
+    key = hashlib.sha256(
+        json.dumps([region, REGION_INFO_MODEL, REGION_INFO_SYSTEM_PROMPT, REGION_INFO_PROMPT],
+                   ensure_ascii=False).encode("utf-8")
+    ).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def _read_pool(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_pool(path, pool):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(pool, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def get_region_facts(region, count=REGION_INFO_POOL_SIZE, backend=None,
+                     cache_dir=REGION_INFO_CACHE_DIR, ttl=REGION_INFO_TTL, on_token=None):
+    """
+    지역 특색 정보 목록을 돌려주는 함수
+    메모리나 디스크(cache_dir)에 ttl초가 지나지 않은 목록이 있으면 그대로 쓰고,
+    없으면 backend로 count개를 한 번에 만들어 저장한다. 생성에 실패하면 기간이 지난 목록이라도 쓴다.
+    on_token은 새로 만들 때 첫 번째 정보가 만들어지는 과정을 받는 콜백이다(백엔드가 지원할 때).
+    """
+    backend = backend or REGION_INFO_BACKENDS[REGION_INFO_BACKEND]
+    path = _pool_path(region, cache_dir)
+
+    def fresh(pool):
+        return pool is not None and pool["facts"] and time.time() - pool["created"] < ttl
+
+    with _pool_lock:
+        pool = _pools.get(path)
+        if fresh(pool):
+            metrics_utils.count("region_info.pool_hit")
+            return pool["facts"]
+        key_lock = _pool_key_locks.setdefault(path, threading.Lock())
+
+    with key_lock:
+        stale = _pools.get(path) or _read_pool(path)
+        if fresh(stale):
+            pool = stale
+        else:
+            try:
+                with span("region_info.generate", region=region):
+                    facts = backend(region, count, on_token)
+                pool = {"region": region, "created": time.time(), "facts": facts}
+            except Exception:
+                if not stale or not stale["facts"]:
+                    raise
+                pool = stale
+            else:
+                if pool["facts"]:
+                    _write_pool(path, pool)
+        with _pool_lock:
+            _pools[path] = pool
+        return pool["facts"]
+
+
+def fetch_region_info(region, on_token=None):
+    """
+    특정 지역의 특색 정보를 하나 돌려주는 함수
+    미리 만들어 둔 목록(get_region_facts)을 차례로 돌려가며 보여주므로, 캐시가 있으면 API를 부르지 않는다.
+    목록을 새로 만들어야 하면 on_token으로 첫 번째 정보가 만들어지는 과정을 스트리밍한다.
     """
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "지역 정보를 제공하는 전문가 역할입니다."},
-                {"role": "user", "content":f"'{region}' 지역의 특색 있는 정보를 간결하게 한 문장으로 작성해 주세요. "
-                        "구체적이고 흥미로운 내용을 포함해주세요."}
-            ],
-            temperature=0.7,
-            max_tokens=100,
-        )
-        return response.choices[0].message.content.strip()
+        facts = get_region_facts(region, on_token=on_token)
+        if not facts:
+            raise ValueError("빈 응답")
+        with _pool_lock:
+            position = _rotation.get(region, 0)
+            _rotation[region] = position + 1
+        return facts[position % len(facts)]
     except Exception as e:
         return f"정보를 가져오는 데 실패했습니다: {e}"
+
+
+class RegionInfoWorker:
+    """
+    데이터를 기다리는 동안 fetch_region_info를 백그라운드에서 부르는 작업자 (세션마다 하나)
+    호출은 프로세스 공용 스레드 풀에서 한 번에 하나씩, 최소 interval초 간격으로 최대 max_calls번까지만 한다.
+    결과는 큐로 넘기며, Streamlit 화면은 스크립트 스레드가 poll()로 꺼내서 그린다.
+    큐에는 ("token", 만들어지는 중인 문장)과 ("fact", 완성된 문장)이 순서대로 들어간다.
+    stop()을 부르면(데이터 로드가 끝나면) 더 이상 호출하지 않고 대기 중인 호출도 취소한다.
+    """
+
+    def __init__(self, region, max_calls=REGION_INFO_MAX_CALLS, interval=3.0, fetch=fetch_region_info):
+        self.region = region
+        self.max_calls = max_calls
+        self.interval = interval
+        self.fetch = fetch
+        self.calls = 0
+        self.results = queue.Queue()
+        self._stop = threading.Event()
+        self._future = None
+        self._next_at = 0.0
+
+    def poll(self):
+        """
+        스크립트 스레드에서 호출: 새로 도착한 (종류, 문장) 목록을 돌려주고, 때가 됐으면 다음 호출을 예약한다.
+        """
+        results = []
+        while True:
+            try:
+                results.append(self.results.get_nowait())
+            except queue.Empty:
+                break
+
+        idle = self._future is None or self._future.done()
+        if (idle and not self._stop.is_set() and self.calls < self.max_calls
+                and time.monotonic() >= self._next_at):
+            self.calls += 1
+            self._future = _region_info_executor.submit(self._run)
+        return results
+
+    def _run(self):
+        if self._stop.is_set():
+            return
+        result = self.fetch(self.region, on_token=self._on_token)
+        self._next_at = time.monotonic() + self.interval
+        if not self._stop.is_set():
+            self.results.put(("fact", result))
+
+    def _on_token(self, text):
+        if not self._stop.is_set():
+            self.results.put(("token", text))
+
+    def stop(self):
+        self._stop.set()
+        if self._future is not None:
+            self._future.cancel()
@@ -1,20 +1,14 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from main import get_combined_sampled_data
-from fpdf import FPDF
-import base64
-import os
-from io import BytesIO
-import plotly.io as pio
-from fpdf.enums import XPos, YPos
+from main import begin_rerun, cached_figure, cached_result, get_sales_cube, rerun_until_complete, resolution_label, show_admin_panel, show_chart
+from metrics_utils import span
+from report_utils import CHART_IDS, DAY_LABELS, build_report_figures, build_report_pdf, compute_report, pdf_export_unavailable
 
 
 
 
 # 페이지 설정
 st.set_page_config(page_title="창업 보고서 생성", layout="wide")
+begin_rerun()
 st.title("📊 창업 보고서 생성 도구")
 st.markdown("---")
 
@@ -23,16 +17,14 @@ if "region_url" not in st.session_state:
     st.stop()  # 이후 코드를 실행하지 않음
 
 region_url = st.session_state["region_url"]
-sampled_df = get_combined_sampled_data(region_url)
+# 전체 데이터로 미리 집계한 매출 큐브 (인사이트와 차트는 큐브를 잘라 합치기만 함)
+sales_cube, resolution = get_sales_cube(region_url)
 
-if not sampled_df.empty:
+if not sales_cube.empty:
     pass
 else:
     st.error("데이터를 불러올 수 없습니다.")
-df = sampled_df.copy()
-
-# 날짜 변환
-df['ta_ymd'] = pd.to_datetime(df['ta_ymd'], format='%Y%m%d')
+    st.stop()
 
 
 
@@ -40,14 +32,18 @@ df['ta_ymd'] = pd.to_datetime(df['ta_ymd'], format='%Y%m%d')
 # 업종 선택 섹션
 st.sidebar.header("📂 업종 선택")
 st.sidebar.markdown("원하는 업종 대분류와 소분류를 선택하세요.")
-selected_category_1 = st.sidebar.selectbox("대분류 업종", df["card_tpbuz_nm_1"].unique())
+selected_category_1 = st.sidebar.selectbox("대분류 업종", sales_cube.main_categories())
 
 # 대분류에 따른 소분류 선택
-subcategories = df[df["card_tpbuz_nm_1"] == selected_category_1]["card_tpbuz_nm_2"].unique()
+subcategories = sales_cube.subcategories(selected_category_1)
 selected_category_2 = st.sidebar.selectbox("소분류 업종", subcategories)
 
-# 관련 데이터 필터링
-filtered_df = df[(df["card_tpbuz_nm_1"] == selected_category_1) & (df["card_tpbuz_nm_2"] == selected_category_2)]
+# 선택한 업종의 인사이트와 차트 (배치 리포트와 같은 계산, 전체 데이터 결과는 디스크에 저장해 재시작 후에도 재사용)
+with span("report.compute"):
+    report = cached_result(
+        "report", {"nm_1": selected_category_1, "nm_2": selected_category_2},
+        lambda: compute_report(sales_cube, selected_category_1, selected_category_2), resolution,
+    )
 
 # 보고서 생성 섹션
 st.write(f"## 📄 {selected_category_1} > {selected_category_2} 업종 창업 보고서")
@@ -57,105 +53,46 @@ st.markdown("---")
 
 
 
-if not filtered_df.empty:
-    # 주요 인사이트 대시보드
-    st.subheader("🌟 주요 인사이트")
-    # 최고 매출 시간대와 요일 정보를 매핑
-    hour_mapping = {
-        1: "00:00 ~ 06:59", 2: "07:00 ~ 08:59", 3: "09:00 ~ 10:59",
-        4: "11:00 ~ 12:59", 5: "13:00 ~ 14:59", 6: "15:00 ~ 16:59",
-        7: "17:00 ~ 18:59", 8: "19:00 ~ 20:59", 9: "21:00 ~ 22:59",
-        10: "23:00 ~ 23:59"
-    }
-
-    day_mapping = {
-        1: "월요일", 2: "화요일", 3: "수요일",
-        4: "목요일", 5: "금요일", 6: "토요일", 7: "일요일"
+if report is not None:
+    # 차트는 (지역, 페이지, 업종 선택, 차트 id)별로 캐시해서 같은 선택이면 다시 만들지 않음
+    selection = (selected_category_1, selected_category_2)
+    figures = {
+        chart_id: cached_figure(
+            "page03", chart_id, selection,
+            lambda chart_id=chart_id: build_report_figures(report, [chart_id]).get(chart_id), resolution,
+        )
+        for chart_id in CHART_IDS
     }
+    figures = {chart_id: fig for chart_id, fig in figures.items() if fig is not None}
+    peak_hour = report["peak_hour"]
+    peak_day = report["peak_day"]
+    total_sales = report["total_sales"]
+    avg_sales = report["avg_sales"]
 
-    # 최고 매출 시간대 및 요일
-    peak_hour = filtered_df.groupby("hour")["amt"].sum().idxmax()
-    peak_day = filtered_df.groupby("day")["amt"].sum().idxmax()
-
-    # 매핑 적용
-    peak_hour_label = hour_mapping.get(peak_hour, "정보 없음")
-    peak_day_label = day_mapping.get(peak_day, "정보 없음")
-
-    total_sales = filtered_df["amt"].sum()
-    avg_sales = filtered_df["amt"].mean()
-    peak_hour = filtered_df.groupby("hour")["amt"].sum().idxmax()
-    peak_day = filtered_df.groupby("day")["amt"].sum().idxmax()
-
-    # 주요 인사이트 출력
+    # 주요 인사이트 대시보드
+    st.subheader("🌟 주요 인사이트")
     col1, col2, col3, col4 = st.columns(4)
     with col1:
         st.metric(label="총 매출 (원)", value=f"{total_sales:,.0f}")
     with col2:
         st.metric(label="평균 매출 (원)", value=f"{avg_sales:,.0f}")
     with col3:
-        st.metric(label="최고 매출 시간대", value=f"{peak_hour_label}")
+        st.metric(label="최고 매출 시간대", value=f"{report['peak_hour_label']}")
     with col4:
-        st.metric(label="최고 매출 요일", value=f"{peak_day_label}")
+        st.metric(label="최고 매출 요일", value=f"{report['peak_day_label']}")
+    st.caption(f"📐 {resolution_label(resolution)}")
 
 
     st.markdown("---")
 
     # 시간대별 매출 강조 차트
     st.subheader("⏰ 시간대별 매출 분석")
-    hour_sales = filtered_df.groupby("hour")["amt"].sum().reset_index()
-    peak_hour_value = hour_sales[hour_sales["hour"] == peak_hour]["amt"].values[0]
-
-    fig = px.bar(hour_sales, x="hour", y="amt", title="시간대별 매출", labels={"amt": "매출 (원)", "hour": "시간대"})
-    fig.add_trace(
-        go.Scatter(
-            x=[peak_hour], y=[peak_hour_value],
-            mode="markers+text",
-            text=["최고 매출 시간대"],
-            textposition="top center",
-            marker=dict(color="red", size=12)
-        )
-    )
-    st.plotly_chart(fig, use_container_width=True)
+    show_chart(figures["hour"], resolution)
     st.divider()
     # 요일별 매출 분석
     st.subheader("📅 요일별 매출 분석")
-
-    # Ensure 'day' column is properly mapped
-    day_mapping = {
-        1: "월요일", 2: "화요일", 3: "수요일", 4: "목요일",
-        5: "금요일", 6: "토요일", 7: "일요일"
-    }
-
-    filtered_df["day_name"] = filtered_df["day"].map(day_mapping)
-    day_sales = filtered_df.groupby("day_name")["amt"].sum().reset_index()
-
-    # Handle empty or mismatched data
-    if not day_sales.empty:
-        peak_day_name = day_mapping.get(peak_day, "N/A")
-        peak_day_value = day_sales.loc[day_sales["day_name"] == peak_day_name, "amt"].values
-        peak_day_value = peak_day_value[0] if len(peak_day_value) > 0 else 0
-
-        # Create bar chart
-        fig2 = px.bar(
-            day_sales,
-            x="day_name",
-            y="amt",
-            title="요일별 매출",
-            labels={"amt": "매출 (원)", "day_name": "요일"},
-        )
-
-        if peak_day_value > 0:
-            fig2.add_trace(
-                go.Scatter(
-                    x=[peak_day_name],
-                    y=[peak_day_value],
-                    mode="markers+text",
-                    text=["최고 매출 요일"],
-                    textposition="top center",
-                    marker=dict(color="red", size=12),
-                )
-            )
-        st.plotly_chart(fig2, use_container_width=True)
+    if "day" in figures:
+        show_chart(figures["day"], resolution)
     else:
         st.warning("요일별 매출 데이터가 없습니다.")
 
@@ -163,54 +100,18 @@ if not filtered_df.empty:
     st.divider()
     # 요일 및 시간대 교차 분석
     st.subheader("📊 요일 및 시간대 교차 분석")
-
-    # Group data for heatmap
-    cross_analysis = filtered_df.groupby(["day", "hour"])["amt"].sum().reset_index()
-    cross_analysis["day_name"] = cross_analysis["day"].map(day_mapping)
-
-    if not cross_analysis.empty:
-        heatmap = px.density_heatmap(
-            cross_analysis,
-            x="hour",
-            y="day_name",
-            z="amt",
-            title="요일 및 시간대별 매출 히트맵",
-            labels={"hour": "시간대", "day_name": "요일", "amt": "매출 (원)"},
-            color_continuous_scale="Viridis",
-        )
-        st.plotly_chart(heatmap, use_container_width=True)
+    if "heatmap" in figures:
+        show_chart(figures["heatmap"], resolution)
     else:
         st.warning("요일 및 시간대 교차 데이터가 없습니다.")
     st.divider()
     # 장기 소비 트렌드 분석
     st.subheader("📅 장기 소비 트렌드 분석")
-    monthly_sales = filtered_df.groupby(filtered_df['ta_ymd'].dt.to_period('M'))["amt"].sum().reset_index()
-    monthly_sales['ta_ymd'] = monthly_sales['ta_ymd'].astype(str)
-
-    line_chart = px.line(
-        monthly_sales, x="ta_ymd", y="amt",
-        title="월별 매출 트렌드",
-        labels={"ta_ymd": "월", "amt": "매출 (원)"},
-        markers=True
-    )
-    st.plotly_chart(line_chart, use_container_width=True)
+    show_chart(figures["monthly"], resolution)
 
     # 성수기/비수기 강조
-    avg_monthly_sales = monthly_sales["amt"].mean()
-    monthly_sales["seasonality"] = monthly_sales["amt"].apply(
-        lambda x: "성수기" if x > avg_monthly_sales else "비수기"
-    )
+    show_chart(figures["seasonality"], resolution)
 
-    seasonality_chart = px.bar(
-        monthly_sales, x="ta_ymd", y="amt", color="seasonality",
-        title="성수기와 비수기 분석",
-        labels={"ta_ymd": "월", "amt": "매출 (원)", "seasonality": "구분"},
-        color_discrete_map={"성수기": "blue", "비수기": "gray"}
-    )
-    st.plotly_chart(seasonality_chart, use_container_width=True)
-
-    # 안전한 매핑 처리
-    peak_day_name = day_mapping.get(str(peak_day).zfill(2), "알 수 없음")  # 기본값을 '알 수 없음'으로 설정
     st.divider()
     # 마케팅 전략 제안
     st.subheader("📈 마케팅 전략 제안")
@@ -218,7 +119,7 @@ if not filtered_df.empty:
     st.write("### 캠페인 아이디어")
 
     # 안전한 매핑 처리
-    peak_day_name = day_mapping.get(str(peak_day).zfill(2), "알 수 없음")  # 기본값을 '알 수 없음'으로 설정
+    peak_day_name = DAY_LABELS.get(peak_day, "알 수 없음")  # 기본값을 '알 수 없음'으로 설정
 
     # 마케팅 전략 제안 작성
     st.markdown(f"- **특정 시간대 할인**: {peak_hour}시대에 맞춘 할인 캠페인 진행.")
@@ -234,69 +135,35 @@ if not filtered_df.empty:
     st.info(
         "장기 트렌드와 성수기 데이터를 활용하여, 특정 시점에 맞춘 전략을 수립하고 매출을 극대화하세요."
     )
+
+    # PDF 다운로드 (차트 이미지는 메모리에서 동시에 렌더링하고, 같은 보고서는 캐시에서 바로 꺼냄)
+    st.divider()
+    st.subheader("📄 보고서 다운로드")
+    st.markdown("작성된 보고서를 PDF로 다운로드하세요.")
+    pdf_title = f"{selected_category_1} > {selected_category_2} 업종 창업 보고서"
+    pdf_key = (region_url, selected_category_1, selected_category_2, resolution)
+    # 폰트나 kaleido가 없으면 누를 때마다 실패하지 않도록 버튼을 끄고 이유를 보여줌
+    pdf_unavailable = pdf_export_unavailable()
+    if pdf_unavailable:
+        st.caption(f"PDF 보고서를 만들 수 없습니다: {pdf_unavailable}")
+    if st.session_state.get("report_pdf", (None,))[0] != pdf_key:
+        if st.button("📄 PDF 보고서 만들기", disabled=pdf_unavailable is not None):
+            with st.spinner("PDF 생성 중..."):
+                try:
+                    st.session_state["report_pdf"] = (pdf_key, build_report_pdf(pdf_title, report, figures))
+                except Exception as e:
+                    st.error(f"PDF를 만들 수 없습니다: {e}")
+    if st.session_state.get("report_pdf", (None,))[0] == pdf_key:
+        st.download_button(
+            "📄 PDF 다운로드",
+            data=st.session_state["report_pdf"][1],
+            file_name=f"report_{region_url}.pdf",
+            mime="application/pdf",
+        )
 else:
     st.error("선택된 업종에 대한 데이터가 없습니다. 다른 업종을 선택해 보세요.")
 
-def generate_pdf(title, insights, charts):
-    pdf = FPDF(orientation="P", unit="mm", format="A4")
-    pdf.add_page()
-    pdf.set_auto_page_break(auto=True, margin=15)
-
-    # 폰트 경로 지정 (fonts 디렉토리에 저장된 경우)
-    font_path = os.path.abspath("fonts/NotoSans-Regular.ttf")
-    pdf.add_font("NotoSans", "", font_path, uni=True)
-    pdf.set_font("NotoSans", size=12)
-
-    # 제목 추가
-    pdf.set_font("NotoSans", size=16, style="B")
-    pdf.cell(0, 10, title, ln=True, align="C")
-    pdf.ln(10)
-
-    # 주요 인사이트 추가
-    pdf.set_font("NotoSans", size=12)
-    pdf.multi_cell(0, 10, "주요 인사이트:")
-    for insight in insights:
-        pdf.multi_cell(0, 10, f" - {insight}")
-    pdf.ln(10)
-
-    # 차트 이미지 추가
-    for chart_path in charts:
-        pdf.add_page()
-        pdf.image(chart_path, x=10, y=30, w=180)
-
-    return pdf.output(dest="S").encode("utf-8")
-
-# # PDF 다운로드 링크 생성 함수
-# def download_pdf_link(pdf_content, filename="report.pdf"):
-#     b64 = base64.b64encode(pdf_content).decode()
-#     href = f'<a href="data:application/octet-stream;base64,{b64}" download="{filename}">📄 PDF 다운로드</a>'
-#     return href
-
-# # PDF 생성 버튼과 다운로드 링크
-# st.subheader("📄 보고서 다운로드")
-# st.markdown("작성된 보고서를 PDF로 다운로드하세요.")
-
-# # 차트 저장
-# chart_files = []
-# for i, chart in enumerate([fig, fig2, heatmap, line_chart, seasonality_chart]):
-#     chart_path = f"chart_{i}.png"
-#     pio.write_image(chart, chart_path)
-#     chart_files.append(chart_path)
-
-# # PDF 생성
-# pdf_title = f"{selected_category_1} > {selected_category_2} 업종 창업 보고서"
-# insight_texts = [
-#     f"총 매출: {total_sales:,.0f} 원",
-#     f"평균 매출: {avg_sales:,.0f} 원",
-#     f"최고 매출 시간대: {peak_hour}시대",
-#     f"최고 매출 요일: {peak_day}요일",
-#     "성수기/비수기 분석 및 장기 소비 트렌드 포함"
-# ]
-# pdf_content = generate_pdf(pdf_title, insight_texts, chart_files)
-
-# # PDF 다운로드 링크 표시
-# st.markdown(download_pdf_link(pdf_content), unsafe_allow_html=True)
-
-# # 정리: 생성된 차트 이미지 삭제
-# for file in chart_files:
-#     os.remove(file)
\ No newline at end of file
+show_admin_panel()
+
+# 미리보기 단계로 그렸으면 전체 데이터가 준비될 때까지 다시 그리기
+rerun_until_complete(resolution)
@@ -0,0 +1,324 @@
+import functools
+import hashlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+from fpdf import FPDF
+
+from cache_utils import LRUCache
+
+
+# 시간대/요일 코드 -> 화면 표시용 이름
+HOUR_LABELS = {
+    1: "00:00 ~ 06:59", 2: "07:00 ~ 08:59", 3: "09:00 ~ 10:59",
+    4: "11:00 ~ 12:59", 5: "13:00 ~ 14:59", 6: "15:00 ~ 16:59",
+    7: "17:00 ~ 18:59", 8: "19:00 ~ 20:59", 9: "21:00 ~ 22:59",
+    10: "23:00 ~ 23:59"
+}
+
+DAY_LABELS = {
+    1: "월요일", 2: "화요일", 3: "수요일",
+    4: "목요일", 5: "금요일", 6: "토요일", 7: "일요일"
+}
+
+# 리포트 차트 id (build_report_figures가 돌려주는 순서)
+CHART_IDS = ("hour", "day", "heatmap", "monthly", "seasonality")
+
+# PDF 보고서: 한글 폰트 경로(지정하지 않으면 REPORT_FONT_CANDIDATES에서 찾음),
+# 차트 이미지 크기(px), 렌더링한 이미지/PDF 캐시의 메모리 예산(바이트)
+REPORT_FONT_PATH = os.getenv("REPORT_FONT_PATH")
+# 한글 글리프가 있는 폰트 후보 (저장소의 fonts/ 아래에 두면 그 폰트를 먼저 씀, 없으면 운영체제 폰트)
+REPORT_FONT_CANDIDATES = (
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts", "NotoSansKR-Regular.ttf"),
+    "/usr/share/fonts/truetype/nanum/NanumGothic.ttf",
+    "/usr/share/fonts/nanum/NanumGothic.ttf",
+    "/System/Library/Fonts/Supplemental/AppleGothic.ttf",
+    "/Library/Fonts/AppleGothic.ttf",
+    "C:/Windows/Fonts/malgun.ttf",
+)
+CHART_IMAGE_SIZE = (1000, 500)
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", 64 * 1024 ** 2))
+
+# 차트 데이터 해시 -> PNG, 보고서 내용 해시 -> PDF (프로세스에 하나, 모든 세션이 공유)
+_report_cache = LRUCache(max_bytes=REPORT_CACHE_MAX_BYTES, sizeof=len)
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+
+def compute_report(cube, nm_1, nm_2):
+    """
+    맞춤 리포트의 인사이트(총/평균 매출, 최고 매출 시간대/요일, 요일×시간대, 월별 추이와 성수기)를
+    매출 큐브에서 계산하는 함수 (Streamlit 없이도 쓸 수 있음)
+    선택한 업종에 데이터가 없으면 None을 돌려준다.
+    """
+    selected_filter = dict(nm_1=nm_1, nm_2=nm_2)
+    total = cube.total(**selected_filter)
+    if total["rows"] == 0:
+        return None
+
+    # 최고 매출 시간대 및 요일
+    hour_sales = cube.aggregate(["hour"], **selected_filter)[["hour", "amt"]]
+    day_sales = cube.aggregate(["day"], **selected_filter)[["day", "amt"]]
+    peak_hour = int(hour_sales.loc[hour_sales["amt"].idxmax(), "hour"])
+    peak_day = int(day_sales.loc[day_sales["amt"].idxmax(), "day"])
+    day_sales["day_name"] = day_sales["day"].map(DAY_LABELS)
+
+    cross_analysis = cube.aggregate(["day", "hour"], **selected_filter)[["day", "hour", "amt"]]
+    cross_analysis["day_name"] = cross_analysis["day"].map(DAY_LABELS)
+
+    # 월별 추이와 성수기/비수기 (월 평균보다 높으면 성수기)
+    monthly_sales = cube.aggregate(["month"], **selected_filter)
+    monthly_sales = monthly_sales[["year_month", "amt"]].rename(columns={"year_month": "ta_ymd"})
+    avg_monthly_sales = monthly_sales["amt"].mean()
+    monthly_sales["seasonality"] = monthly_sales["amt"].apply(
+        lambda x: "성수기" if x > avg_monthly_sales else "비수기"
+    )
+
+    return {
+        "nm_1": nm_1,
+        "nm_2": nm_2,
+        "total_sales": total["amt"],
+        "avg_sales": total["amt"] / total["rows"],
+        "peak_hour": peak_hour,
+        "peak_day": peak_day,
+        "peak_hour_label": HOUR_LABELS.get(peak_hour, "정보 없음"),
+        "peak_day_label": DAY_LABELS.get(peak_day, "정보 없음"),
+        "hour_sales": hour_sales,
+        "day_sales": day_sales,
+        "cross_analysis": cross_analysis,
+        "monthly_sales": monthly_sales,
+    }
+
+
+def report_summary(report):
+    """compute_report 결과를 JSON으로 저장할 수 있는 dict로 바꾸는 함수"""
+    return {
+        "nm_1": report["nm_1"],
+        "nm_2": report["nm_2"],
+        "total_sales": int(report["total_sales"]),
+        "avg_sales": float(report["avg_sales"]),
+        "peak_hour": report["peak_hour"],
+        "peak_hour_label": report["peak_hour_label"],
+        "peak_day": report["peak_day"],
+        "peak_day_label": report["peak_day_label"],
+        "hour_sales": report["hour_sales"].to_dict("records"),
+        "day_sales": report["day_sales"][["day", "day_name", "amt"]].to_dict("records"),
+        "monthly_sales": report["monthly_sales"].to_dict("records"),
+    }
+
+
+def build_report_figures(report, chart_ids=CHART_IDS):
+    """
+    리포트 차트(plotly Figure)를 CHART_IDS 순서의 dict로 만드는 함수 (데이터가 없는 차트는 빠짐)
+    chart_ids를 주면 그 차트만 만든다.
+    """
+    figures = {}
+
+    # 시간대별 매출 (최고 매출 시간대 강조)
+    hour_sales, peak_hour = report["hour_sales"], report["peak_hour"]
+    if "hour" in chart_ids:
+        peak_hour_value = hour_sales[hour_sales["hour"] == peak_hour]["amt"].values[0]
+        fig = px.bar(hour_sales, x="hour", y="amt", title="시간대별 매출", labels={"amt": "매출 (원)", "hour": "시간대"})
+        fig.add_trace(
+            go.Scatter(
+                x=[peak_hour], y=[peak_hour_value],
+                mode="markers+text",
+                text=["최고 매출 시간대"],
+                textposition="top center",
+                marker=dict(color="red", size=12)
+            )
+        )
+        figures["hour"] = fig
+
+    # 요일별 매출 (최고 매출 요일 강조)
+    day_sales = report["day_sales"]
+    if "day" in chart_ids and not day_sales.empty:
+        peak_day_name = DAY_LABELS.get(report["peak_day"], "N/A")
+        peak_day_value = day_sales.loc[day_sales["day_name"] == peak_day_name, "amt"].values
+        peak_day_value = peak_day_value[0] if len(peak_day_value) > 0 else 0
+
+        fig2 = px.bar(
+            day_sales,
+            x="day_name",
+            y="amt",
+            title="요일별 매출",
+            labels={"amt": "매출 (원)", "day_name": "요일"},
+        )
+        if peak_day_value > 0:
+            fig2.add_trace(
+                go.Scatter(
+                    x=[peak_day_name],
+                    y=[peak_day_value],
+                    mode="markers+text",
+                    text=["최고 매출 요일"],
+                    textposition="top center",
+                    marker=dict(color="red", size=12),
+                )
+            )
+        figures["day"] = fig2
+
+    # 요일 및 시간대 교차 분석
+    cross_analysis = report["cross_analysis"]
+    if "heatmap" in chart_ids and not cross_analysis.empty:
+        figures["heatmap"] = px.density_heatmap(
+            cross_analysis,
+            x="hour",
+            y="day_name",
+            z="amt",
+            title="요일 및 시간대별 매출 히트맵",
+            labels={"hour": "시간대", "day_name": "요일", "amt": "매출 (원)"},
+            color_continuous_scale="Viridis",
+        )
+
+    # 월별 추이와 성수기/비수기
+    monthly_sales = report["monthly_sales"]
+    if "monthly" in chart_ids:
+        figures["monthly"] = px.line(
+            monthly_sales, x="ta_ymd", y="amt",
+            title="월별 매출 트렌드",
+            labels={"ta_ymd": "월", "amt": "매출 (원)"},
+            markers=True
+        )
+    if "seasonality" in chart_ids:
+        figures["seasonality"] = px.bar(
+            monthly_sales, x="ta_ymd", y="amt", color="seasonality",
+            title="성수기와 비수기 분석",
+            labels={"ta_ymd": "월", "amt": "매출 (원)", "seasonality": "구분"},
+            color_discrete_map={"성수기": "blue", "비수기": "gray"}
+        )
+    return figures
+
+
+def _render_png(fig_json, width, height):
+    # 렌더링 프로세스에서 실행 (kaleido는 프로세스마다 렌더러 하나를 순서대로 쓰므로 프로세스를 나눠 병렬화)
+    return pio.from_json(fig_json).to_image(format="png", width=width, height=height)
+
+
+def _get_render_pool():
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            # 스레드가 도는 서버 프로세스를 fork하지 않도록 spawn으로 띄움
+            _render_pool = ProcessPoolExecutor(
+                max_workers=min(len(CHART_IDS), os.cpu_count() or 1),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _render_pool
+
+
+def render_chart_images(figures, size=CHART_IMAGE_SIZE):
+    """
+    차트(plotly Figure) dict를 PNG 바이트 dict로 바꾸는 함수 (디스크에 쓰지 않음)
+    차트 데이터의 해시로 캐시하며, 캐시에 없는 차트만 렌더링 프로세스들에서 동시에 그린다.
+    """
+    payloads = {chart_id: fig.to_json() for chart_id, fig in figures.items()}
+    keys = {
+        chart_id: ("png", hashlib.sha256(payload.encode("utf-8")).hexdigest(), size)
+        for chart_id, payload in payloads.items()
+    }
+
+    images = {chart_id: _report_cache.get(key) for chart_id, key in keys.items()}
+    missing = [chart_id for chart_id, image in images.items() if image is None]
+    if missing:
+        pool = _get_render_pool()
+        futures = {chart_id: pool.submit(_render_png, payloads[chart_id], *size) for chart_id in missing}
+        for chart_id, future in futures.items():
+            images[chart_id] = future.result()
+            _report_cache.put(keys[chart_id], images[chart_id])
+    return images
+
+
+def _has_hangul(font_path):
+    """TTF 폰트에 한글 글리프가 있으면 True"""
+    try:
+        from fontTools.ttLib import TTFont
+
+        with TTFont(font_path, lazy=True) as font:
+            return ord("가") in font.getBestCmap()
+    except Exception:
+        return False
+
+
+@functools.lru_cache(maxsize=None)
+def find_report_font(font_path=REPORT_FONT_PATH):
+    """PDF에 쓸 한글 폰트 경로 (font_path를 주면 그 폰트만 확인, 쓸 수 있는 폰트가 없으면 None)"""
+    candidates = [font_path] if font_path else REPORT_FONT_CANDIDATES
+    for path in candidates:
+        if os.path.isfile(path) and _has_hangul(path):
+            return os.path.abspath(path)
+    return None
+
+
+def pdf_export_unavailable():
+    """PDF 보고서를 만들 수 없는 이유 (만들 수 있으면 None)"""
+    if importlib.util.find_spec("kaleido") is None:
+        return "차트 이미지를 그리는 kaleido 패키지가 설치되어 있지 않습니다."
+    if find_report_font() is None:
+        return "한글 폰트가 없습니다. fonts/NotoSansKR-Regular.ttf를 두거나 REPORT_FONT_PATH를 지정하세요."
+    return None
+
+
+def generate_pdf(title, insights, images, font_path=None):
+    """제목, 인사이트 문장 목록, 차트 PNG 바이트 목록으로 PDF 바이트를 만드는 함수"""
+    font_path = font_path or find_report_font()
+    if font_path is None:
+        raise FileNotFoundError("PDF에 쓸 한글 폰트를 찾을 수 없습니다")
+
+    pdf = FPDF(orientation="P", unit="mm", format="A4")
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+
+    # 한글을 쓰려면 한글 글리프가 있는 유니코드 TTF 폰트가 필요함
+    pdf.add_font("Report", "", font_path)
+
+    # 제목 추가
+    pdf.set_font("Report", size=16)
+    pdf.cell(0, 10, title, new_x="LMARGIN", new_y="NEXT", align="C")
+    pdf.ln(10)
+
+    # 주요 인사이트 추가
+    pdf.set_font("Report", size=12)
+    pdf.multi_cell(0, 10, "주요 인사이트:", new_x="LMARGIN", new_y="NEXT")
+    for insight in insights:
+        pdf.multi_cell(0, 10, f" - {insight}", new_x="LMARGIN", new_y="NEXT")
+    pdf.ln(10)
+
+    # 차트 이미지 추가
+    for image in images:
+        pdf.add_page()
+        pdf.image(BytesIO(image), x=10, y=30, w=180)
+
+    return bytes(pdf.output())
+
+
+def report_insights(report):
+    """PDF 보고서에 넣을 인사이트 문장 목록"""
+    return [
+        f"총 매출: {report['total_sales']:,.0f} 원",
+        f"평균 매출: {report['avg_sales']:,.0f} 원",
+        f"최고 매출 시간대: {report['peak_hour_label']}",
+        f"최고 매출 요일: {report['peak_day_label']}",
+        "성수기/비수기 분석 및 장기 소비 트렌드 포함",
+    ]
+
+
+def build_report_pdf(title, report, figures):
+    """
+    리포트 PDF 바이트를 만드는 함수
+    차트 이미지와 완성된 PDF 모두 내용 해시로 캐시하므로 같은 보고서를 다시 받으면 바로 돌려준다.
+    """
+    insights = report_insights(report)
+    images = render_chart_images(figures)
+    key = ("pdf", hashlib.sha256(json.dumps(
+        [title, insights, [hashlib.sha256(images[chart_id]).hexdigest() for chart_id in figures]],
+        ensure_ascii=False,
+    ).encode("utf-8")).hexdigest())
+    return _report_cache.get_or_load(key, lambda: generate_pdf(title, insights, [images[c] for c in figures]))
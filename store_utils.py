@@ -0,0 +1,259 @@
+"""
+서버를 다시 시작해도 남는 계산 결과 저장소 (디스크)
+
+지역 샘플/매출 큐브, 차트(집계 결과), 맞춤 리포트 인사이트처럼 원본 데이터에서 계산한 결과를
+(이름, 데이터 버전, 인자)의 해시를 키로 RESULT_STORE_DIR 아래에 파일 하나씩 저장한다.
+- 쓰기는 임시 파일에 쓴 뒤 os.replace로 바꿔서, 읽는 쪽은 항상 완성된 파일만 본다.
+- 같은 키를 여러 프로세스가 동시에 계산하지 않도록 키별 파일 잠금(fcntl, 윈도우는 msvcrt)을 건다.
+- 전체 크기가 RESULT_STORE_MAX_BYTES를 넘으면 가장 오래 안 쓴(mtime) 파일부터 지운다.
+값은 pickle로 저장하므로 이 디렉터리는 앱만 쓸 수 있어야 한다.
+"""
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # 윈도우
+    fcntl = None
+    import msvcrt
+
+from metrics_utils import count, span
+
+# 결과 저장소 위치 (빈 문자열이면 끔)와 크기 예산 (바이트, 기본 2GB)
+RESULT_STORE_DIR = os.getenv("RESULT_STORE_DIR", os.path.join(".cache", "results"))
+RESULT_STORE_MAX_BYTES = int(os.getenv("RESULT_STORE_MAX_BYTES", 2 * 1024 ** 3))
+
+# 키별 잠금 파일 수 (키 해시로 나눠 쓰므로 잠금 파일이 끝없이 늘지 않음)
+LOCK_STRIPES = 256
+# 이보다 오래된 임시 파일은 쓰다 죽은 프로세스가 남긴 것으로 보고 지움 (초)
+STALE_TMP_SECONDS = 60 * 60
+
+_store = None
+_store_lock = threading.Lock()
+_MISSING = object()
+
+
+def result_key(name, version, params):
+    """(이름, 데이터 버전, 인자)로 만든 키 (인자는 JSON으로 바꿀 수 없으면 문자열로)"""
+    text = json.dumps([name, version, params], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _lock_fd(fd, blocking):
+    """열린 잠금 파일에 배타 잠금을 검 (blocking이 아니고 이미 잠겨 있으면 BlockingIOError)"""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        return
+    # msvcrt.locking은 첫 바이트 범위 잠금이며, 기다리는 모드도 10초 뒤 포기하므로 직접 다시 시도
+    os.lseek(fd, 0, os.SEEK_SET)
+    while True:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return
+        except OSError:
+            if not blocking:
+                raise BlockingIOError
+            time.sleep(0.05)
+
+
+def _unlock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        return
+    os.lseek(fd, 0, os.SEEK_SET)
+    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class _FileLock:
+    """파일 잠금 (다른 프로세스와 같은 프로세스의 다른 스레드 모두 막음)"""
+
+    def __init__(self, path, blocking=True):
+        self.path = path
+        self.blocking = blocking
+        self.fd = None
+
+    def __enter__(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            _lock_fd(self.fd, self.blocking)
+        except BlockingIOError:
+            os.close(self.fd)
+            self.fd = None
+        return self.fd is not None
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.fd is not None:
+            _unlock_fd(self.fd)
+            os.close(self.fd)
+        return False
+
+
+class ResultStore:
+    """
+    디스크에 저장하는 계산 결과 캐시 (여러 프로세스가 같은 디렉터리를 함께 써도 안전)
+    get/put/get_or_compute에 (이름, 데이터 버전, 인자 dict)를 주면 그 해시로 파일을 찾는다.
+    데이터 버전이 바뀌면 키가 달라지므로 예전 결과는 쓰이지 않다가 크기 예산에 밀려 지워진다.
+    """
+
+    def __init__(self, root=RESULT_STORE_DIR, max_bytes=RESULT_STORE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock_dir = os.path.join(root, ".locks")
+        os.makedirs(self._lock_dir, exist_ok=True)
+        self._written = None  # 마지막으로 크기를 잰 뒤 이 프로세스가 쓴 바이트 수 (None이면 아직 안 잼)
+        self._written_lock = threading.Lock()
+
+    def _path(self, name, key):
+        return os.path.join(self.root, name, key[:2], key + ".pkl")
+
+    def _key_lock(self, key):
+        return _FileLock(os.path.join(self._lock_dir, f"{int(key[:8], 16) % LOCK_STRIPES:03d}.lock"))
+
+    def _read(self, path):
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return _MISSING
+        except Exception:
+            # 깨진 파일(디스크 문제, 버전이 다른 라이브러리 등)은 지우고 다시 계산
+            _remove(path)
+            return _MISSING
+        try:
+            os.utime(path)  # 최근에 쓴 파일은 나중에 지움
+        except OSError:
+            pass
+        return value
+
+    def get(self, name, version, params, default=None):
+        """저장된 결과 (없으면 default)"""
+        with span("store.get", result=name):
+            value = self._read(self._path(name, result_key(name, version, params)))
+        count("store.hit" if value is not _MISSING else "store.miss")
+        return default if value is _MISSING else value
+
+    def put(self, name, version, params, value):
+        """결과를 저장 (저장에 실패해도 예외를 올리지 않음)"""
+        self._write(self._path(name, result_key(name, version, params)), value)
+
+    def _write(self, path, value):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with span("store.put"):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(tmp_path, "wb") as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    size = f.tell()
+                os.replace(tmp_path, path)
+        except Exception:
+            _remove(tmp_path)
+            count("store.write_failed")
+            return
+        count("store.write")
+        self._account(size)
+
+    def get_or_compute(self, name, version, params, compute):
+        """
+        저장된 결과가 있으면 돌려주고, 없으면 compute()로 계산해 저장한 뒤 돌려주는 함수
+        같은 키를 여러 프로세스/스레드가 동시에 요청해도 계산은 한 번만 한다.
+        """
+        key = result_key(name, version, params)
+        path = self._path(name, key)
+        value = self._read(path)
+        if value is not _MISSING:
+            count("store.hit")
+            return value
+        with self._key_lock(key):
+            # 기다리는 동안 다른 프로세스가 이미 저장했을 수 있음
+            value = self._read(path)
+            if value is not _MISSING:
+                count("store.hit")
+                return value
+            count("store.miss")
+            value = compute()
+            self._write(path, value)
+        return value
+
+    def _account(self, size):
+        with self._written_lock:
+            due = self._written is None or self._written + size > self.max_bytes // 10
+            self._written = 0 if due else self._written + size
+        if due:
+            self.evict()
+
+    def usage(self):
+        """저장된 결과 파일 목록 [(mtime, 크기, 경로)]과 임시 파일 목록"""
+        files, tmp_files = [], []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d != ".locks"]
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if filename.endswith(".pkl"):
+                    files.append((stat.st_mtime, stat.st_size, path))
+                elif filename.endswith(".tmp"):
+                    tmp_files.append((stat.st_mtime, stat.st_size, path))
+        return files, tmp_files
+
+    def evict(self, target=0.9):
+        """
+        전체 크기가 max_bytes를 넘으면 가장 오래 안 쓴 파일부터 max_bytes * target 아래로 지우는 함수
+        다른 프로세스가 이미 지우고 있으면 그냥 돌아간다. 지운 파일 수를 돌려준다.
+        """
+        with _FileLock(os.path.join(self._lock_dir, "evict.lock"), blocking=False) as locked:
+            if not locked:
+                return 0
+            with span("store.evict"):
+                files, tmp_files = self.usage()
+                now = time.time()
+                for mtime, _, path in tmp_files:
+                    if now - mtime > STALE_TMP_SECONDS:
+                        _remove(path)
+                total = sum(size for _, size, _ in files)
+                if total <= self.max_bytes:
+                    return 0
+                removed = 0
+                for _, size, path in sorted(files):
+                    if total <= self.max_bytes * target:
+                        break
+                    _remove(path)
+                    total -= size
+                    removed += 1
+            count("store.evict", removed)
+            return removed
+
+    def stats(self):
+        """저장소 상태 (dict)"""
+        files, _ = self.usage()
+        return {
+            "root": self.root,
+            "files": len(files),
+            "current_bytes": sum(size for _, size, _ in files),
+            "max_bytes": self.max_bytes,
+        }
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass  # 이미 지워졌거나, 윈도우에서 다른 프로세스가 열어 둔 파일
+
+
+def get_result_store():
+    """프로세스에 하나인 ResultStore (RESULT_STORE_DIR가 비어 있거나 만들 수 없으면 None)"""
+    global _store
+    with _store_lock:
+        if _store is None and RESULT_STORE_DIR:
+            try:
+                _store = ResultStore(RESULT_STORE_DIR, RESULT_STORE_MAX_BYTES)
+            except OSError:
+                return None
+        return _store
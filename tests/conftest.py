@@ -0,0 +1,42 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# 앱 모듈은 저장소 최상위에 있으므로 어디서 pytest를 실행해도 import되게 함
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_utils import CARD_COLUMNS  # noqa: E402
+
+# 시험용 업종 (대분류, 소분류)
+CATEGORY_PAIRS = [
+    ("음식", "한식"), ("음식", "카페"), ("음식", "분식"),
+    ("소매", "편의점"), ("소매", "슈퍼마켓"),
+    ("서비스", "미용실"),
+]
+
+
+def make_card_rows(rows, seed=0, months=range(1, 13), year=2023):
+    """원본 CSV와 같은 컬럼/값 범위의 카드 데이터 (apply_card_schema 전)"""
+    rng = np.random.default_rng(seed)
+    months = np.asarray(list(months))
+    pairs = rng.integers(0, len(CATEGORY_PAIRS), rows)
+    days = rng.integers(1, 29, rows)
+    return pd.DataFrame({
+        "ta_ymd": year * 10000 + rng.choice(months, rows) * 100 + days,
+        "card_tpbuz_nm_1": [CATEGORY_PAIRS[i][0] for i in pairs],
+        "card_tpbuz_nm_2": [CATEGORY_PAIRS[i][1] for i in pairs],
+        "sex": rng.choice(["M", "F"], rows),
+        "age": rng.integers(1, 8, rows),
+        "day": rng.integers(1, 8, rows),
+        "hour": rng.integers(1, 11, rows),
+        "amt": rng.integers(1_000, 200_000, rows),
+        "cnt": rng.integers(1, 5, rows),
+    })[CARD_COLUMNS]
+
+
+@pytest.fixture
+def card_rows():
+    return make_card_rows(5_000)
@@ -0,0 +1,68 @@
+import threading
+
+from cache_utils import LRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(max_bytes=10, sizeof=len)
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    assert cache.get("a") == "aaaa"  # a가 최근에 쓴 항목이 됨
+    cache.put("c", "cccc")
+
+    assert "b" not in cache
+    assert cache.get("a") == "aaaa"
+    assert cache.get("c") == "cccc"
+    stats = cache.stats()
+    assert stats["keys"] == ["a", "c"]
+    assert stats["current_bytes"] == 8
+    assert stats["evictions"] == 1
+
+
+def test_replacing_key_updates_size():
+    cache = LRUCache(max_bytes=10, sizeof=len)
+    cache.put("a", "aaaa")
+    cache.put("a", "aaaaaaaa")
+    assert cache.stats()["current_bytes"] == 8
+    assert cache.stats()["evictions"] == 0
+
+
+def test_oversized_item_is_kept_alone():
+    cache = LRUCache(max_bytes=10, sizeof=len)
+    cache.put("a", "aaaa")
+    cache.put("big", "x" * 20)
+    assert cache.stats()["keys"] == ["big"]
+    assert cache.get("big") == "x" * 20
+
+
+def test_hits_and_misses():
+    cache = LRUCache(max_bytes=10, sizeof=len)
+    assert cache.get("a") is None
+    cache.put("a", "aa")
+    assert cache.get("a") == "aa"
+    assert cache.get("b", "없음") == "없음"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_get_or_load_loads_once():
+    cache = LRUCache(max_bytes=100, sizeof=len)
+    calls = []
+    barrier = threading.Barrier(4)
+
+    def loader():
+        calls.append(1)
+        return "value"
+
+    def worker(results):
+        barrier.wait()
+        results.append(cache.get_or_load("key", loader))
+
+    results = []
+    threads = [threading.Thread(target=worker, args=(results,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["value"] * 4
+    assert len(calls) == 1
@@ -0,0 +1,113 @@
+import pandas as pd
+import pytest
+
+from conftest import make_card_rows
+from cube_utils import MEASURES, CubeAccumulator, SalesCube
+from data_utils import apply_card_schema
+
+
+def expected_aggregate(df, by, nm_1=None, nm_2=None):
+    """같은 집계를 pandas groupby로 직접 계산 (큐브 축 이름에 맞춰 hour는 hour_band로)"""
+    if nm_1 is not None:
+        df = df[df["card_tpbuz_nm_1"] == nm_1]
+    if nm_2 is not None:
+        df = df[df["card_tpbuz_nm_2"].isin([nm_2] if isinstance(nm_2, str) else nm_2)]
+    df = df.assign(hour=df["hour_band"]) if "hour" in by else df
+    df = df.assign(**{col: df[col].astype(str) for col in by if isinstance(df[col].dtype, pd.CategoricalDtype)})
+    result = df.groupby(by, observed=True).agg(amt=("amt", "sum"), cnt=("cnt", "sum"), rows=("amt", "size"))
+    return result.reset_index().sort_values(by).reset_index(drop=True)
+
+
+def normalize(result, by):
+    result = result[list(by) + list(MEASURES)].copy()
+    for col in by:
+        if result[col].dtype == object:
+            result[col] = result[col].astype(str)
+    return result.sort_values(list(by)).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("by, selection", [
+    (["month"], {}),
+    (["sex", "age"], {"nm_1": "음식"}),
+    (["day"], {"nm_1": "소매"}),
+    (["hour"], {}),
+    (["month", "card_tpbuz_nm_2"], {"nm_1": "음식", "nm_2": ["한식", "카페"]}),
+    (["card_tpbuz_nm_1"], {}),
+])
+def test_aggregate_matches_pandas(card_rows, by, selection):
+    df = apply_card_schema(card_rows)
+    cube = SalesCube.from_frame(df)
+    result = normalize(cube.aggregate(by, **selection), by)
+    expected = expected_aggregate(df, by, **selection)
+    for col in by:
+        expected[col] = expected[col].astype(result[col].dtype)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_total_matches_pandas(card_rows):
+    df = apply_card_schema(card_rows)
+    cube = SalesCube.from_frame(df)
+    assert cube.total() == {"amt": df["amt"].sum(), "cnt": df["cnt"].sum(), "rows": len(df)}
+    sub = df[(df["card_tpbuz_nm_1"] == "음식") & (df["card_tpbuz_nm_2"] == "카페")]
+    assert cube.total(nm_1="음식", nm_2="카페") == {"amt": sub["amt"].sum(), "cnt": sub["cnt"].sum(), "rows": len(sub)}
+
+
+def test_accumulator_chunks_match_single_frame():
+    df = apply_card_schema(make_card_rows(3_000, seed=1))
+    accumulator = CubeAccumulator(capacity=1)  # 업종 쌍이 늘 때마다 자리를 늘리는 경로
+    for start in range(0, len(df), 700):
+        accumulator.add(df.iloc[start:start + 700])
+    accumulator.add(df.iloc[:0])  # 빈 청크는 무시
+
+    by = ["card_tpbuz_nm_1", "card_tpbuz_nm_2", "month", "hour"]
+    chunked = accumulator.to_cube()
+    whole = SalesCube.from_frame(df)
+    assert list(chunked.pairs) == list(whole.pairs)
+    pd.testing.assert_frame_equal(chunked.aggregate(by), whole.aggregate(by))
+
+
+def test_accumulator_update_and_merge_agree():
+    # 달마다 따로 쌓은 뒤 합친 결과와 큐브끼리 merge한 결과가 같아야 함
+    frames = [apply_card_schema(make_card_rows(1_000, seed=month, months=[month])) for month in (1, 2, 3)]
+    total = CubeAccumulator()
+    for df in frames:
+        part = CubeAccumulator()
+        part.add(df)
+        total.update(part)
+    merged = SalesCube.merge([SalesCube.from_frame(df) for df in frames])
+
+    by = ["card_tpbuz_nm_1", "card_tpbuz_nm_2", "month"]
+    pd.testing.assert_frame_equal(total.to_cube().aggregate(by), merged.aggregate(by))
+    assert merged.total()["rows"] == sum(len(df) for df in frames)
+
+
+def test_empty_frame_gives_empty_cube():
+    cube = SalesCube.from_frame(apply_card_schema(make_card_rows(0)))
+    assert cube.empty
+    assert cube.total() == {m: 0 for m in MEASURES}
+    assert cube.aggregate(["month"]).empty
+
+
+def test_accumulator_counts_dropped_rows():
+    raw = make_card_rows(1_000, seed=4)
+    raw.loc[0, "sex"] = "X"
+    raw.loc[1, "age"] = 9
+    raw.loc[2, "hour"] = 0
+    raw.loc[3, "ta_ymd"] = 20231301  # 없는 날짜
+    raw.loc[4, "card_tpbuz_nm_1"] = None
+    accumulator = CubeAccumulator()
+    accumulator.add(apply_card_schema(raw))
+    assert accumulator.dropped == 5
+    assert accumulator.to_cube().total()["rows"] == len(raw) - 5
+
+    total = CubeAccumulator()
+    total.update(accumulator)
+    assert total.dropped == 5
+
+
+def test_scaled_counts_do_not_overflow():
+    df = apply_card_schema(make_card_rows(100, seed=5))
+    df["cnt"] = 2 ** 31 // 100  # 합계가 int32 한계 근처
+    cube = SalesCube.from_frame(df).scaled(100)
+    assert cube.total()["cnt"] == (2 ** 31 // 100) * 100 * 100
+    assert cube.total()["rows"] == 100 * 100
@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import COLUMNS, write_region
+from conftest import make_card_rows
+from cube_utils import SalesCube
+from data_utils import (
+    CARD_COLUMNS, FILE_NAME_TEMPLATE, YEAR, ProgressiveLoad, apply_card_schema, ingest_region, ingest_region_blocks,
+    sample_month_blocks,
+)
+
+EMPTY_MONTH = 3
+
+
+@pytest.fixture(scope="module")
+def region_dir(tmp_path_factory):
+    """12개월 합성 데이터 중 한 달은 헤더만 있는 지역"""
+    root = str(tmp_path_factory.mktemp("bucket"))
+    write_region(root, "testregion", 24_000, seed=0)
+    path = os.path.join(root, FILE_NAME_TEMPLATE.format(year=YEAR, month=EMPTY_MONTH, region="testregion"))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(",".join(COLUMNS) + "\n")
+    return root
+
+
+def test_sample_month_blocks_empty_month(region_dir):
+    df, scale = sample_month_blocks("testregion", EMPTY_MONTH, 0.5, base_url=region_dir)
+    assert df.empty
+    assert list(df.columns) == list(CARD_COLUMNS)
+    assert scale == 1.0
+
+
+def test_sample_month_blocks_scale(region_dir):
+    df, scale = sample_month_blocks("testregion", 1, 0.1, base_url=region_dir, block_bytes=16 * 1024)
+    assert not df.empty
+    assert scale > 1.0
+
+
+def test_ingest_region_blocks_skips_empty_month(region_dir):
+    sample, cube, failed = ingest_region_blocks("testregion", 1.0, base_url=region_dir)
+    assert failed == {}
+    months = set(cube.aggregate(["month"])["month"])
+    assert EMPTY_MONTH not in months
+    assert months == set(range(1, 13)) - {EMPTY_MONTH}
+
+
+def test_ingest_region_with_empty_month(region_dir, tmp_path):
+    sample, cube, failed = ingest_region("testregion", base_url=region_dir, cache_dir=str(tmp_path))
+    assert failed == {}
+    assert cube.total()["rows"] == 24_000 - 2_000  # 달마다 2,000행, 한 달은 비어 있음
+    assert EMPTY_MONTH not in set(cube.aggregate(["month"])["month"])
+
+
+def test_progressive_load_with_empty_month(region_dir, tmp_path):
+    load = ProgressiveLoad("testregion", base_url=region_dir, cache_dir=str(tmp_path)).start()
+    assert load.join(60)
+    assert load.error is None
+    assert load.latest.resolution == 1.0
+    assert load.latest.cube.total()["rows"] == 22_000
+
+
+def test_apply_card_schema_nullable_dates():
+    # 결측값이 하나라도 있으면 Arrow의 정수 컬럼은 float64로 들어옴
+    df = apply_card_schema(pd.DataFrame({"ta_ymd": [20230105.0, np.nan, 20230210.0], "hour": [1, 2, 3]}))
+    assert list(df["ta_ymd"]) == [pd.Timestamp("2023-01-05"), pd.NaT, pd.Timestamp("2023-02-10")]
+    assert list(df["month"]) == [1, 0, 2]
+
+    df = apply_card_schema(pd.DataFrame({"ta_ymd": ["20230105", "잘못된 값", None]}))
+    assert list(df["month"]) == [1, 0, 0]
+
+
+def test_cube_keeps_rows_of_chunk_with_null_date():
+    raw = make_card_rows(1_000, seed=3)
+    raw["ta_ymd"] = raw["ta_ymd"].astype("float64")
+    raw.loc[0, "ta_ymd"] = np.nan
+    cube = SalesCube.from_frame(apply_card_schema(raw))
+    assert cube.total()["rows"] == len(raw) - 1
@@ -0,0 +1,82 @@
+import os
+
+import httpx
+import pytest
+
+import http_utils
+from benchmarks.fake_services import FakeBucket
+
+FILE_SIZE = 300_000
+
+
+@pytest.fixture
+def bucket_dir(tmp_path):
+    root = tmp_path / "bucket"
+    root.mkdir()
+    (root / "data.csv").write_bytes(os.urandom(FILE_SIZE))
+    return root
+
+
+@pytest.fixture(autouse=True)
+def fresh_client():
+    # 테스트마다 서버가 새로 뜨므로 연결 풀을 공유하지 않음
+    yield
+    http_utils.close_http_client()
+
+
+def test_download_and_reuse_validator(bucket_dir, tmp_path):
+    dest = tmp_path / "data.csv"
+    with FakeBucket(str(bucket_dir)) as bucket:
+        url = f"{bucket.url}/data.csv"
+        validator = http_utils.download(url, str(dest))
+        assert dest.read_bytes() == (bucket_dir / "data.csv").read_bytes()
+        assert validator["etag"] and validator["size"] == FILE_SIZE
+
+        # 같은 검증 정보로 다시 요청하면 304로 받지 않음
+        assert http_utils.download(url, str(tmp_path / "again.csv"), validator=validator) is None
+        assert not (tmp_path / "again.csv").exists()
+        assert bucket.requests["304"] == 1
+
+        # 원본이 바뀌면 다시 받음
+        (bucket_dir / "data.csv").write_bytes(b"new,data\n")
+        os.utime(bucket_dir / "data.csv", (0, 0))
+        changed = http_utils.download(url, str(dest), validator=validator)
+        assert changed is not None and not http_utils.same_version(validator, changed)
+        assert dest.read_bytes() == b"new,data\n"
+
+
+def test_download_resumes_with_range(bucket_dir, tmp_path):
+    dest = tmp_path / "data.csv"
+    part_path = str(tmp_path / "partial" / "data.part")
+    os.makedirs(os.path.dirname(part_path))
+    with FakeBucket(str(bucket_dir), drop_after=100_000) as bucket:
+        url = f"{bucket.url}/data.csv"
+        with pytest.raises((httpx.HTTPError, OSError)):
+            http_utils.download(url, str(dest), part_path=part_path)
+        # 받은 만큼은 남겨 둠 (끊길 때 버퍼에 있던 부분은 못 받을 수 있음)
+        received = os.path.getsize(part_path)
+        assert 0 < received <= 100_000
+        assert not dest.exists()
+
+        validator = http_utils.download(url, str(dest), part_path=part_path)
+        assert dest.read_bytes() == (bucket_dir / "data.csv").read_bytes()
+        assert validator["size"] == FILE_SIZE
+        # 두 번째 요청은 받은 위치부터 나머지만 보냄
+        assert bucket.bytes_sent - 100_000 == FILE_SIZE - received
+        assert not os.path.exists(part_path) and not os.path.exists(part_path + ".json")
+
+
+def test_resume_restarts_when_source_changed(bucket_dir, tmp_path):
+    dest = tmp_path / "data.csv"
+    part_path = str(tmp_path / "data.part")
+    with FakeBucket(str(bucket_dir), drop_after=100_000) as bucket:
+        url = f"{bucket.url}/data.csv"
+        with pytest.raises((httpx.HTTPError, OSError)):
+            http_utils.download(url, str(dest), part_path=part_path)
+
+        # 받다 만 사이 원본이 바뀌면 If-Range가 맞지 않아 처음부터 받음
+        new_data = os.urandom(FILE_SIZE // 2)
+        (bucket_dir / "data.csv").write_bytes(new_data)
+        os.utime(bucket_dir / "data.csv", (0, 0))
+        http_utils.download(url, str(dest), part_path=part_path)
+        assert dest.read_bytes() == new_data
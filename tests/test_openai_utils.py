@@ -0,0 +1,163 @@
+import functools
+import threading
+import time
+
+import pytest
+
+import openai_utils
+from benchmarks.fake_services import FakeOpenAI
+from openai_utils import AsyncLLMClient, fetch_region_info, get_region_facts, openai_backend, stub_backend
+
+
+@pytest.fixture(autouse=True)
+def empty_pools(monkeypatch):
+    # 메모리의 지역별 목록/순번은 프로세스 전역이므로 테스트마다 비움
+    monkeypatch.setattr(openai_utils, "_pools", {})
+    monkeypatch.setattr(openai_utils, "_rotation", {})
+    monkeypatch.setattr(openai_utils, "_pool_key_locks", {})
+
+
+class CountingBackend:
+    """stub_backend를 부르면서 호출 수를 세는 백엔드 (fail이면 실패)"""
+
+    def __init__(self, fail=False, delay=0.0):
+        self.calls = 0
+        self.fail = fail
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def __call__(self, region, count, on_token=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("백엔드 실패")
+        return stub_backend(region, count, on_token)
+
+
+def test_pool_is_generated_once_and_kept_on_disk(tmp_path, monkeypatch):
+    backend = CountingBackend()
+    facts = get_region_facts("포천", count=3, backend=backend, cache_dir=str(tmp_path))
+    assert facts == stub_backend("포천", 3)
+    assert get_region_facts("포천", count=3, backend=backend, cache_dir=str(tmp_path)) == facts
+    assert backend.calls == 1
+    assert len(list(tmp_path.glob("*.json"))) == 1
+
+    # 서버를 다시 시작해도(메모리가 비어도) 디스크의 목록을 씀
+    monkeypatch.setattr(openai_utils, "_pools", {})
+    assert get_region_facts("포천", count=3, backend=backend, cache_dir=str(tmp_path)) == facts
+    assert backend.calls == 1
+
+
+def test_expired_pool_is_regenerated(tmp_path):
+    backend = CountingBackend()
+    get_region_facts("포천", count=2, backend=backend, cache_dir=str(tmp_path))
+    get_region_facts("포천", count=2, backend=backend, cache_dir=str(tmp_path), ttl=0)
+    assert backend.calls == 2
+
+
+def test_stale_pool_is_used_when_generation_fails(tmp_path):
+    get_region_facts("포천", count=2, backend=CountingBackend(), cache_dir=str(tmp_path))
+    failing = CountingBackend(fail=True)
+    facts = get_region_facts("포천", count=2, backend=failing, cache_dir=str(tmp_path), ttl=0)
+    assert facts == stub_backend("포천", 2)
+    assert failing.calls == 1
+
+
+def test_generation_failure_without_pool_raises(tmp_path):
+    with pytest.raises(RuntimeError):
+        get_region_facts("포천", count=2, backend=CountingBackend(fail=True), cache_dir=str(tmp_path))
+    assert list(tmp_path.glob("*.json")) == []
+
+
+def test_concurrent_requests_generate_once(tmp_path):
+    backend = CountingBackend(delay=0.2)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(
+            get_region_facts("포천", count=2, backend=backend, cache_dir=str(tmp_path))))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [stub_backend("포천", 2)] * 4
+    assert backend.calls == 1
+
+
+def test_fetch_region_info_rotates_through_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(openai_utils, "get_region_facts", functools.partial(
+        get_region_facts, count=3, backend=stub_backend, cache_dir=str(tmp_path)))
+    shown = [fetch_region_info("포천") for _ in range(4)]
+    facts = stub_backend("포천", 3)
+    assert shown == facts + facts[:1]
+
+
+def test_fetch_region_info_reports_failure(tmp_path, monkeypatch):
+    monkeypatch.setattr(openai_utils, "get_region_facts", functools.partial(
+        get_region_facts, backend=CountingBackend(fail=True), cache_dir=str(tmp_path)))
+    assert fetch_region_info("포천").startswith("정보를 가져오는 데 실패했습니다")
+
+
+@pytest.fixture
+def llm():
+    with FakeOpenAI(first_token_delay=0.3, token_interval=0.0) as server:
+        yield server
+
+
+@pytest.fixture
+def make_client(llm):
+    clients = []
+
+    def make(**kwargs):
+        client = AsyncLLMClient(base_url=llm.url, api_key="test", max_retries=0, **kwargs)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+def _ask(client, count, on_token=None):
+    return client.submit([{"role": "user", "content": f"{count}개"}], on_token=on_token, model="test")
+
+
+def test_client_streams_tokens(make_client):
+    tokens = []
+    text = _ask(make_client(), 2, tokens.append).result(timeout=10)
+    assert text.splitlines() == ["1. 오프라인 테스트용 지역 정보 1번입니다.", "2. 오프라인 테스트용 지역 정보 2번입니다."]
+    assert len(tokens) > 1 and tokens[-1] == text
+    assert all(text.startswith(token) for token in tokens)
+
+
+def test_client_reuses_connections(llm, make_client):
+    client = make_client()
+    for _ in range(3):
+        _ask(client, 1).result(timeout=10)
+    assert llm.requests["chat.completions"] == 3
+    assert llm.requests["connections"] == 1
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 4])
+def test_client_bounds_concurrent_requests(make_client, max_concurrency):
+    # 요청 하나가 첫 토큰까지 0.3초 걸리므로, 동시에 1개씩이면 4개에 1.2초 이상 걸림
+    client = make_client(max_concurrency=max_concurrency)
+    started = time.perf_counter()
+    futures = [_ask(client, 1) for _ in range(4)]
+    for future in futures:
+        future.result(timeout=10)
+    elapsed = time.perf_counter() - started
+    if max_concurrency == 1:
+        assert elapsed >= 1.2
+    else:
+        assert elapsed < 1.0
+
+
+def test_openai_backend_parses_facts(make_client, monkeypatch):
+    monkeypatch.setattr(openai_utils, "_llm_client", make_client())
+    first = []
+    facts = openai_backend("포천", 3, on_token=first.append)
+    assert facts == [f"오프라인 테스트용 지역 정보 {i}번입니다." for i in range(1, 4)]
+    assert first and facts[0].startswith(first[-1])
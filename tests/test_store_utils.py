@@ -0,0 +1,101 @@
+import os
+import pickle
+import threading
+
+import pytest
+
+from store_utils import ResultStore, result_key
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(str(tmp_path / "results"), max_bytes=10 * 1024 ** 2)
+
+
+def stored_files(store, suffix):
+    return [name for _, _, names in os.walk(store.root) for name in names if name.endswith(suffix)]
+
+
+def test_put_and_get(store):
+    store.put("chart", "v1", {"region": "pochun", "chart_id": "hour"}, {"value": [1, 2, 3]})
+    assert store.get("chart", "v1", {"chart_id": "hour", "region": "pochun"}) == {"value": [1, 2, 3]}
+    # 데이터 버전이나 인자가 다르면 다른 결과
+    assert store.get("chart", "v2", {"region": "pochun", "chart_id": "hour"}) is None
+    assert store.get("chart", "v1", {"region": "pochun", "chart_id": "day"}, default="없음") == "없음"
+
+
+def test_write_is_atomic(store, monkeypatch):
+    params = {"region": "pochun"}
+    store.put("report", "v1", params, "예전 결과")
+
+    def broken_dump(value, f, protocol=None):
+        f.write(b"partial")
+        raise RuntimeError("쓰다가 죽음")
+
+    monkeypatch.setattr(pickle, "dump", broken_dump)
+    store.put("report", "v1", params, "새 결과")  # 예외를 올리지 않음
+    monkeypatch.undo()
+
+    # 반쯤 쓴 파일은 보이지 않고 예전 결과가 그대로 남음
+    assert store.get("report", "v1", params) == "예전 결과"
+    assert stored_files(store, ".tmp") == []
+
+
+def test_corrupt_file_is_recomputed(store):
+    params = {"region": "pochun"}
+    store.put("report", "v1", params, "결과")
+    key = result_key("report", "v1", params)
+    with open(store._path("report", key), "wb") as f:
+        f.write(b"not a pickle")
+    assert store.get("report", "v1", params) is None
+    assert store.get_or_compute("report", "v1", params, lambda: "다시 계산") == "다시 계산"
+
+
+def test_get_or_compute_runs_once(store):
+    calls = []
+    barrier = threading.Barrier(4)
+
+    def compute():
+        calls.append(1)
+        return sum(range(1000))
+
+    def worker(results):
+        barrier.wait()
+        results.append(store.get_or_compute("cube", "v1", {"region": "pochun"}, compute))
+
+    results = []
+    threads = [threading.Thread(target=worker, args=(results,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [499500] * 4
+    assert len(calls) == 1
+
+
+def test_evict_removes_least_recently_used(tmp_path):
+    # 쓰는 동안은 정리가 돌지 않게 예산을 넉넉히 두고, 다 쓴 뒤 줄여서 직접 evict를 부름
+    store = ResultStore(str(tmp_path / "results"), max_bytes=10 * 1024 ** 2)
+    payload = b"x" * 2_000
+    for i in range(8):
+        store.put("chart", "v1", {"i": i}, payload)
+        path = store._path("chart", result_key("chart", "v1", {"i": i}))
+        os.utime(path, (1_000 + i, 1_000 + i))
+    # 가장 오래된 결과를 읽으면 최근에 쓴 것으로 바뀜
+    assert store.get("chart", "v1", {"i": 0}) == payload
+
+    store.max_bytes = 10_000
+    removed = store.evict()
+    stats = store.stats()
+    assert removed > 0
+    assert stats["current_bytes"] <= 10_000 * 0.9
+    assert store.get("chart", "v1", {"i": 0}) == payload
+    assert store.get("chart", "v1", {"i": 1}) is None
+    assert store.get("chart", "v1", {"i": 7}) == payload
+
+
+def test_evict_under_budget_keeps_everything(store):
+    for i in range(3):
+        store.put("chart", "v1", {"i": i}, i)
+    assert store.evict() == 0
+    assert store.stats()["files"] == 3
@@ -0,0 +1,220 @@
+"""
+서버 시작 때 설정된 모든 지역의 데이터를 미리 준비해 두는 캐시 워머
+
+- 앱 프로세스 안(CacheWarmer): 첫 스크립트 실행 때 백그라운드로 지역마다 내려받기/파싱/집계를 끝내
+  지역 캐시(메모리 매핑 핸들)에 넣어 둔다. 사용자가 고른 지역이 진행 중이면 그 작업에 합류한다.
+- 배포 스크립트(python -m warmup_utils): 서버를 띄우기 전에 모든 지역의 Parquet 캐시를 채워 둔다.
+
+우선순위(CACHE_WARMUP_REGIONS에 적은 지역 먼저, 나머지는 REGION_MAPPING 순서) 순으로
+동시에 CACHE_WARMUP_CONCURRENCY개씩 준비하고, 메모리 예산을 넘으면 남은 지역은 건너뛰고 멈춘다.
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+
+from data_utils import CACHE_DIR, DATA_BASE_URL, REGION_MAPPING, ingest_region, region_cache_is_warm
+from metrics_utils import count, process_memory, span
+
+# 앱 프로세스 시작 때 워머 켜기 (CACHE_WARMUP=1)
+CACHE_WARMUP_ENABLED = os.getenv("CACHE_WARMUP", "0") == "1"
+# 먼저 준비할 지역 영문명 (쉼표로 구분, 적은 순서대로)
+CACHE_WARMUP_REGIONS = [r.strip() for r in os.getenv("CACHE_WARMUP_REGIONS", "").split(",") if r.strip()]
+# 동시에 준비하는 지역 수 (지역마다 12개월을 다시 동시에 읽음)
+CACHE_WARMUP_CONCURRENCY = int(os.getenv("CACHE_WARMUP_CONCURRENCY", 2))
+# 프로세스 RSS가 이 값(바이트)을 넘으면 멈춤 (기본 2GB)
+CACHE_WARMUP_MAX_RSS = int(os.getenv("CACHE_WARMUP_MAX_RSS", 2 * 1024 ** 3))
+
+logger = logging.getLogger("card_app.warmup")
+
+
+def warmup_order(region_mapping=REGION_MAPPING, priority=CACHE_WARMUP_REGIONS):
+    """준비할 지역 영문명 목록 (priority에 있는 지역 먼저, 나머지는 region_mapping 순서)"""
+    regions = list(dict.fromkeys(region_mapping.values()))
+    first = [region for region in priority if region in regions]
+    return first + [region for region in regions if region not in first]
+
+
+class CacheWarmer:
+    """
+    지역 목록을 차례로 준비하는 백그라운드 작업
+    start_load(region)은 로딩 작업(ProgressiveLoad)을 시작해 돌려주고, 이미 캐시에 있으면 None을 돌려준다.
+    cache(LRUCache)를 주면 지역 하나를 더 넣었을 때 예산을 넘겨 먼저 준비한 지역을 내보내게 되면 멈춘다.
+    진행 상황은 status()로 본다.
+    """
+
+    def __init__(self, regions, start_load, cache=None, concurrency=CACHE_WARMUP_CONCURRENCY,
+                 max_rss=CACHE_WARMUP_MAX_RSS, poll_interval=1.0):
+        self.regions = list(regions)
+        self.start_load = start_load
+        self.cache = cache
+        self.concurrency = max(1, concurrency)
+        self.max_rss = max_rss
+        self.poll_interval = poll_interval
+        self.done = []
+        self.cached = []  # 이미 캐시에 있어서 건너뛴 지역
+        self.failed = {}
+        self.running = []
+        self.stop_reason = None
+        self.started = None
+        self.finished = None
+        self._next = 0
+        self._largest = 0  # 지금까지 준비한 지역 중 가장 큰 크기 (다음 지역 크기 추정)
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        self.started = time.time()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"warmup-{i}", daemon=True)
+            for i in range(min(self.concurrency, len(self.regions)))
+        ]
+        logger.info("캐시 워머 시작: 지역 %d개, 동시 %d개", len(self.regions), len(self._threads))
+        for thread in self._threads:
+            thread.start()
+        if not self._threads:
+            self.finished = self.started
+        return self
+
+    def stop(self, reason="중지 요청"):
+        """남은 지역을 시작하지 않음 (이미 준비 중인 지역은 끝까지 진행)"""
+        with self._lock:
+            if self.stop_reason is None:
+                self.stop_reason = reason
+                logger.warning("캐시 워머 중단: %s", reason)
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def memory_pressure(self):
+        """더 준비하면 안 되는 이유 (괜찮으면 None)"""
+        rss = process_memory()["rss"]
+        if rss is not None and rss > self.max_rss:
+            return f"프로세스 메모리 {rss / 1024 ** 2:,.0f}MB가 예산 {self.max_rss / 1024 ** 2:,.0f}MB를 넘음"
+        if self.cache is not None:
+            stats = self.cache.stats()
+            if stats["current_bytes"] + self._largest > stats["max_bytes"]:
+                return "지역 캐시 예산이 가득 참"
+        return None
+
+    def _take(self):
+        with self._lock:
+            if self.stop_reason is not None or self._next >= len(self.regions):
+                return None
+            region = self.regions[self._next]
+            self._next += 1
+            self.running.append(region)
+            return region
+
+    def _work(self):
+        while True:
+            reason = self.memory_pressure()
+            if reason is not None:
+                self.stop(reason)
+            region = self._take()
+            if region is None:
+                break
+            try:
+                self._warm(region)
+            finally:
+                with self._lock:
+                    self.running.remove(region)
+        with self._lock:
+            if not self.running and self.finished is None and (
+                    self.stop_reason is not None or self._next >= len(self.regions)):
+                self.finished = time.time()
+                logger.info("캐시 워머 끝: 준비 %d, 캐시 적중 %d, 실패 %d, 건너뜀 %d",
+                            len(self.done), len(self.cached), len(self.failed), len(self.regions) - self._next)
+
+    def _warm(self, region):
+        try:
+            with span("warmup.region", region=region):
+                load = self.start_load(region)
+                if load is None:
+                    count("warmup.cached")
+                    with self._lock:
+                        self.cached.append(region)
+                    return
+                # 준비하는 동안에도 메모리를 보며 기다림 (멈추면 이 지역까지만 끝냄)
+                while not load.join(self.poll_interval):
+                    reason = self.memory_pressure()
+                    if reason is not None:
+                        self.stop(reason)
+                dataset = load.latest
+        except Exception as e:
+            dataset, error = None, e
+        else:
+            error = load.error
+        if dataset is None or dataset.cube.empty or dataset.resolution < 1.0:
+            count("warmup.failed")
+            with self._lock:
+                self.failed[region] = str(error or "데이터 없음")
+            logger.warning("캐시 워머: %s 실패 (%s)", region, error or "데이터 없음")
+            return
+        count("warmup.done")
+        with self._lock:
+            self.done.append(region)
+            self._largest = max(self._largest, dataset.nbytes)
+            finished = len(self.done) + len(self.cached) + len(self.failed)
+        logger.info("캐시 워머: %s 준비 (%d/%d)", region, finished, len(self.regions))
+
+    def status(self):
+        """진행 상황 (dict)"""
+        with self._lock:
+            end = self.finished or time.time()
+            return {
+                "state": "done" if self.finished else ("stopping" if self.stop_reason else "running"),
+                "total": len(self.regions),
+                "done": list(self.done),
+                "cached": list(self.cached),
+                "failed": dict(self.failed),
+                "running": list(self.running),
+                "pending": self.regions[self._next:] if self.stop_reason is None else [],
+                "skipped": self.regions[self._next:] if self.stop_reason is not None else [],
+                "stop_reason": self.stop_reason,
+                "elapsed": end - self.started if self.started else 0.0,
+            }
+
+
+def warm_disk_cache(regions, base_url=DATA_BASE_URL, cache_dir=CACHE_DIR, max_rss=CACHE_WARMUP_MAX_RSS, force=False):
+    """
+    지역마다 12개월 원본을 받아 Parquet 캐시를 채우는 함수 (배포 때 서버를 띄우기 전에 실행)
+    지역을 하나씩 순서대로 준비하며, 메모리 예산을 넘으면 남은 지역은 건너뛴다. 실패한 지역과 월을 돌려준다.
+    force가 아니면 모든 달의 캐시가 이미 최신인 지역은 다시 읽지 않는다.
+    """
+    failed = {}
+    for i, region in enumerate(regions, 1):
+        if not force and region_cache_is_warm(region, base_url=base_url, cache_dir=cache_dir):
+            count("warmup.cached")
+            logger.info("[%d/%d] %s 캐시가 이미 최신", i, len(regions), region)
+            continue
+        rss = process_memory()["rss"]
+        if rss is not None and rss > max_rss:
+            logger.warning("메모리 예산을 넘어 중단: 남은 지역 %s", regions[i - 1:])
+            break
+        started = time.perf_counter()
+        _, _, region_failed = ingest_region(region, base_url=base_url, cache_dir=cache_dir)
+        if region_failed:
+            failed[region] = region_failed
+        logger.info("[%d/%d] %s %.1f초%s", i, len(regions), region, time.perf_counter() - started,
+                    f" (실패한 월: {sorted(region_failed)})" if region_failed else "")
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="모든 지역의 Parquet 캐시를 미리 채움 (배포 때 서버 시작 전에 실행)")
+    parser.add_argument("regions", nargs="*", help="준비할 지역 영문명 (기본: 우선순위 순서의 모든 지역)")
+    parser.add_argument("--base-url", default=DATA_BASE_URL)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--force", action="store_true", help="캐시가 최신인 지역도 다시 읽음")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    failed = warm_disk_cache(args.regions or warmup_order(), args.base_url, args.cache_dir, force=args.force)
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()